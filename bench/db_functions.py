@@ -0,0 +1,420 @@
+"""Бенчмарки функций db/controllers.py, db/students.py и db/teachers.py
+
+Каждая публичная функция прогоняется на БД с 1k, 100k и 1M заданий.
+Школа растет числом учеников и учителей, а нагрузка на одного ученика
+(заданий на ученика, учеников в классе) остается прежней. Поэтому время
+функции, которая работает через индекс, почти не меняется с ростом БД,
+а время функции с полным проходом по таблице растет линейно.
+
+Пример:
+    python -m bench.db_functions --sizes 1000 100000 1000000
+
+Результаты сохраняются в bench/results/db_functions_<ревизия>.json.
+"""
+import argparse
+import asyncio
+import contextlib
+import inspect
+import io
+import itertools
+import json
+import logging
+import math
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from bench.loadtest import git_revision
+from bench.synthetic import School, SchoolSpec, generate_school
+from school_bot.db import controllers, database, gradebook, search, students, teachers
+from school_bot.db.files import FileInfo
+from school_bot.db.slow_queries import slow_query_log
+from school_bot.digest import digest_boundaries
+
+
+logger = logging.getLogger(__name__)
+
+ASSIGNMENTS_PER_STUDENT = 20
+STUDENTS_PER_CLASS = 25
+CLASSES_PER_TEACHER = 2
+DIGEST_RATIO = 0.5
+
+# Показатель степени роста времени, начиная с которого функция считается O(n)
+LINEAR_EXPONENT = 0.5
+
+MODULES = (controllers, students, teachers, search, gradebook)
+
+
+@dataclass
+class BenchContext:
+    """Данные, на которых вызываются функции: соединение и образцы записей"""
+    conn: Any
+    school: School
+    teacher: str
+    class_name: str
+    student: str
+    class_id: int
+    active_id: int
+    submitted_id: int
+    queue_after: Optional[tuple[str, int]]  # курсор (submitted_at, id) из середины очереди проверки
+    _counter: itertools.count = field(default_factory=itertools.count)
+
+    def unique(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._counter)}"
+
+
+@dataclass
+class Case:
+    """Как вызвать функцию; rollback - функция пишет в переданное соединение без commit"""
+    call: Callable[[BenchContext], Any]
+    rollback: bool = False
+
+
+def _file(ctx: BenchContext) -> FileInfo:
+    name = ctx.unique("bench_file")
+    return FileInfo(file_unique_id=name, file_id=name, file_type="document", file_name="answer.pdf")
+
+
+CASES: dict[str, Case] = {
+    # controllers
+    "register_user": Case(lambda c: controllers.register_user(c.conn, c.student, c.school.chat_ids[c.student], False)),
+    "get_assignment_info": Case(lambda c: controllers.get_assignment_info(c.conn, c.active_id, c.student)),
+    "get_active_assignments_for_student": Case(lambda c: controllers.get_active_assignments_for_student(c.conn, c.student)),
+    "get_assignment_details": Case(lambda c: controllers.get_assignment_details(c.active_id, c.student)),
+    "update_assignment_response": Case(lambda c: controllers.update_assignment_response(c.submitted_id, "Ответ", [_file(c)])),
+    "claim_submission_notification": Case(lambda c: controllers.claim_submission_notification(c.submitted_id)),
+    "get_response_attachments": Case(lambda c: controllers.get_response_attachments(c.submitted_id)),
+    "get_active_assignments": Case(lambda c: controllers.get_active_assignments(c.student)),
+    "create_individual_assignment": Case(
+        lambda c: controllers.create_individual_assignment(c.conn, c.teacher, c.student, "Задание"),
+        rollback=True
+    ),
+    "create_class_assignment": Case(
+        lambda c: controllers.create_class_assignment(c.conn, c.teacher, c.student, c.class_name, "Задание", None),
+        rollback=True
+    ),
+    "add_class_assignment": Case(
+        lambda c: controllers.add_class_assignment(c.conn, c.teacher, c.class_name, "Задание", _file(c)),
+        rollback=True
+    ),
+    "add_individual_assignment": Case(
+        lambda c: controllers.add_individual_assignment(c.conn, c.teacher, c.student, "Задание"),
+        rollback=True
+    ),
+    "update_assignment_message_id": Case(
+        lambda c: controllers.update_assignment_message_id(c.conn, 1, {
+            "teacher_username": c.teacher, "student_username": c.student, "assignment_text": "Задание 0"
+        }),
+        rollback=True
+    ),
+    "normalize_class_name": Case(lambda c: controllers.normalize_class_name(f" «{c.class_name}» ")),
+    "invalidate_class_cache": Case(lambda c: controllers.invalidate_class_cache(c.teacher)),
+    "resolve_class_name": Case(lambda c: controllers.resolve_class_name(c.teacher, c.class_name.lower())),
+    "get_class_by_name": Case(lambda c: controllers.get_class_by_name(c.teacher, c.class_name)),
+    "get_teacher_classes": Case(lambda c: controllers.get_teacher_classes(c.teacher)),
+    "check_class_exists": Case(lambda c: controllers.check_class_exists(c.teacher, c.class_name)),
+    "check_class_exists_case_insensitive": Case(
+        lambda c: controllers.check_class_exists_case_insensitive(c.teacher, c.class_name.upper())
+    ),
+    "create_new_class": Case(lambda c: controllers.create_new_class(c.teacher, c.unique("bench_class"))),
+    "get_submitted_work_details": Case(lambda c: controllers.get_submitted_work_details(c.submitted_id, c.teacher)),
+    "get_submitted_works": Case(lambda c: controllers.get_submitted_works(c.teacher)),
+    "get_work_details": Case(lambda c: controllers.get_work_details(c.submitted_id)),
+    "grade_assignment_work": Case(lambda c: controllers.grade_assignment_work(c.submitted_id, 5)),
+    "get_grading_queue": Case(lambda c: controllers.get_grading_queue(c.teacher, c.queue_after, 20)),
+    # Повторные вызовы проходят тот же UPDATE по id, но уже ничего не меняют
+    "grade_assignment_works": Case(
+        lambda c: controllers.grade_assignment_works([(5, work_id) for work_id in c.school.ungraded[c.teacher][-5:]])
+    ),
+    "get_class_assignments": Case(lambda c: controllers.get_class_assignments(c.teacher)),
+    "get_class_assignment": Case(lambda c: controllers.get_class_assignment(c.submitted_id, c.teacher)),
+    "bulk_grade_class_assignment": Case(
+        lambda c: controllers.bulk_grade_class_assignment(c.teacher, c.submitted_id, {c.student: 5})
+    ),
+    "get_original_class_name": Case(lambda c: controllers.get_original_class_name(c.teacher, c.class_name)),
+    "update_individual_assignment": Case(
+        lambda c: controllers.update_individual_assignment(c.conn, c.teacher, c.student, "Задание 0", None),
+        rollback=True
+    ),
+    "update_class_assignments": Case(
+        lambda c: controllers.update_class_assignments(c.conn, [c.active_id, c.submitted_id], None),
+        rollback=True
+    ),
+    # students
+    "student_exists": Case(lambda c: students.student_exists(c.conn, c.student)),
+    "is_user_student": Case(lambda c: students.is_user_student(c.student, c.conn)),
+    "get_student_notification_info": Case(lambda c: students.get_student_notification_info(c.student)),
+    "add_student_to_class": Case(lambda c: students.add_student_to_class(c.unique("bench_student"), c.class_name)),
+    "add_new_student": Case(lambda c: students.add_new_student(c.unique("bench_new_student"))),
+    "check_student_exists": Case(lambda c: students.check_student_exists(c.student)),
+    "get_student_chat_id": Case(lambda c: students.get_student_chat_id(c.conn, c.student)),
+    "get_students_in_class": Case(lambda c: students.get_students_in_class(c.conn, c.class_name)),
+    "check_student_in_class": Case(lambda c: students.check_student_in_class(c.student, c.class_name)),
+    "get_completed_assignments_student": Case(lambda c: students.get_completed_assignments_student(c.student)),
+    "get_student_assignments_overview": Case(lambda c: students.get_student_assignments_overview(c.student)),
+    "get_student_class_overview": Case(lambda c: students.get_student_class_overview(c.student, c.conn)),
+    "invalidate_class_overview": Case(lambda c: students.invalidate_class_overview(c.student)),
+    "get_student_display_name": Case(lambda c: students.get_student_display_name(c.conn, c.student)),
+    # teachers
+    "teacher_exists": Case(lambda c: teachers.teacher_exists(c.conn, c.teacher)),
+    "add_teacher": Case(lambda c: teachers.add_teacher(c.conn, c.unique("bench_teacher"))),
+    "is_user_teacher": Case(lambda c: teachers.is_user_teacher(c.teacher, c.conn)),
+    "get_completed_assignments_teacher": Case(lambda c: teachers.get_completed_assignments_teacher(c.teacher)),
+    "get_teacher_class_rosters": Case(lambda c: teachers.get_teacher_class_rosters(c.teacher)),
+    "get_class_students": Case(lambda c: teachers.get_class_students(c.teacher, limit=20)),
+    "get_class_id": Case(lambda c: teachers.get_class_id(c.teacher, c.class_name)),
+    "get_teacher_chat_id": Case(lambda c: teachers.get_teacher_chat_id(c.conn, c.teacher)),
+    "get_submission_notification_info": Case(
+        lambda c: teachers.get_submission_notification_info(c.conn, c.teacher, c.student)
+    ),
+    "get_teacher_notify_mode": Case(lambda c: teachers.get_teacher_notify_mode(c.teacher)),
+    "get_due_digests": Case(lambda c: teachers.get_due_digests(*digest_boundaries(datetime.now()))),
+    # Записи идут после чтений: после них учитель c.teacher уже не ждет сводки
+    "mark_digests_sent": Case(
+        lambda c: teachers.mark_digests_sent([(c.teacher, digest_boundaries(datetime.now())[0])])
+    ),
+    "set_teacher_notify_mode": Case(lambda c: teachers.set_teacher_notify_mode(c.teacher, teachers.NOTIFY_HOURLY)),
+    # search
+    "build_match_query": Case(lambda c: search.build_match_query("задание для класса", c.teacher)),
+    "search_assignments": Case(lambda c: search.search_assignments("ответ задание 3", teacher_username=c.teacher)),
+    # gradebook
+    "invalidate_grade_book": Case(lambda c: gradebook.invalidate_grade_book(c.student)),
+    "get_student_grade_book": Case(lambda c: gradebook.get_student_grade_book(c.student)),
+    "get_class_grades": Case(lambda c: gradebook.get_class_grades(c.teacher, c.class_id)),
+    "get_student_report_rows": Case(lambda c: gradebook.get_student_report_rows(c.student)),
+    "get_class_report_rows": Case(lambda c: gradebook.get_class_report_rows(c.teacher, c.class_name)),
+}
+
+# Обертки над add_*_assignment со своей транзакцией: запись измеряется
+# через add_*_assignment, а рассылку подписчиков - bench.loadtest
+SKIPPED = {
+    "save_assignment_to_db": "commit + AssignmentCreated, запись см. add_*_assignment",
+    "create_individual_assignment_db": "commit + AssignmentCreated, запись см. add_individual_assignment",
+    "create_class_assignment_db": "commit + AssignmentCreated, запись см. add_class_assignment",
+}
+
+
+def public_functions() -> dict[str, Callable]:
+    """Все публичные функции модулей MODULES (только определенные в самом модуле)"""
+    functions = {}
+    for module in MODULES:
+        for name, obj in vars(module).items():
+            if name.startswith("_") or not inspect.isfunction(obj) or obj.__module__ != module.__name__:
+                continue
+            functions[name] = obj
+    return functions
+
+
+def spec_for_size(assignments: int) -> SchoolSpec:
+    students_count = max(1, assignments // ASSIGNMENTS_PER_STUDENT)
+    per_teacher = STUDENTS_PER_CLASS * CLASSES_PER_TEACHER
+    return SchoolSpec(
+        teachers=max(1, math.ceil(students_count / per_teacher)),
+        classes_per_teacher=CLASSES_PER_TEACHER,
+        students_per_class=STUDENTS_PER_CLASS,
+        assignments_per_student=ASSIGNMENTS_PER_STUDENT,
+        digest_ratio=DIGEST_RATIO,
+    )
+
+
+async def _call(case: Case, ctx: BenchContext) -> float:
+    controllers.invalidate_class_cache()
+    students.invalidate_class_overview()
+    gradebook.invalidate_grade_book()
+    start = time.perf_counter()
+    result = case.call(ctx)
+    if inspect.isawaitable(result):
+        await result
+    elapsed = time.perf_counter() - start
+    if case.rollback:
+        await ctx.conn.rollback()
+    return elapsed
+
+
+async def _capture_plans(case: Case, ctx: BenchContext) -> dict:
+    """Первый (прогревочный) вызов с журналом запросов: планы и признаки O(n)"""
+    slow_query_log.reset()
+    slow_query_log.enabled = True
+    try:
+        await _call(case, ctx)
+    finally:
+        slow_query_log.enabled = False
+
+    statements = list(slow_query_log.stats.values())
+    return {
+        "statements": len(statements),
+        "scans": sorted({detail for stats in statements for detail in stats.plan if detail.startswith("SCAN ")}),
+        "full_scan_assignments": any(stats.full_scan_assignments for stats in statements),
+        "lower_predicate": any("LOWER(" in stats.sql.upper() for stats in statements),
+    }
+
+
+async def bench_function(case: Case, ctx: BenchContext, repeat: int, budget: float) -> dict:
+    result = await _capture_plans(case, ctx)
+    timings = []
+    deadline = time.perf_counter() + budget
+    while len(timings) < repeat and (not timings or time.perf_counter() < deadline):
+        timings.append(await _call(case, ctx))
+
+    timings.sort()
+    result.update({
+        "calls": len(timings),
+        "median_ms": round(statistics.median(timings) * 1000, 4),
+        "min_ms": round(timings[0] * 1000, 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))] * 1000, 4),
+    })
+    return result
+
+
+async def _prepare_context(conn, school: School) -> BenchContext:
+    teacher = school.teachers[len(school.teachers) // 2]
+    class_name = school.classes_of(teacher)[0]
+    student = school.classes[class_name][0]
+
+    cursor = await conn.execute(
+        "SELECT id FROM assignments WHERE student_username = ? AND status = 'active' LIMIT 1", (student,)
+    )
+    active_id = (await cursor.fetchone())[0]
+    cursor = await conn.execute(
+        "SELECT id FROM assignments WHERE student_username = ? AND status = 'submitted' LIMIT 1", (student,)
+    )
+    row = await cursor.fetchone()
+    cursor = await conn.execute(
+        "SELECT rowid FROM classes WHERE teacher_username = ? AND name = ?", (teacher, class_name)
+    )
+    class_id = (await cursor.fetchone())[0]
+    ungraded = school.ungraded.get(teacher, [])
+    queue_after = None
+    if ungraded:
+        cursor = await conn.execute(
+            "SELECT submitted_at, id FROM assignments WHERE id = ?", (ungraded[len(ungraded) // 2],)
+        )
+        queue_after = tuple(await cursor.fetchone())
+    return BenchContext(
+        conn=conn, school=school, teacher=teacher, class_name=class_name, student=student,
+        class_id=class_id, active_id=active_id, submitted_id=row[0] if row else active_id,
+        queue_after=queue_after
+    )
+
+
+async def bench_size(size: int, workdir: Path, names: list[str], repeat: int, budget: float) -> dict:
+    database.DB_PATH = workdir / f"bench_{size}.db"
+    await database.init_db()
+
+    spec = spec_for_size(size)
+    started = time.perf_counter()
+    school = await asyncio.to_thread(generate_school, database.DB_PATH, spec)
+    logger.info("Seeded %s assignments in %.1fs", school.assignments, time.perf_counter() - started)
+
+    results = {}
+    async with database.get_db_connection() as conn:
+        ctx = await _prepare_context(conn, school)
+        for name in names:
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[name] = await bench_function(CASES[name], ctx, repeat, budget)
+            except Exception as e:
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+                with contextlib.suppress(Exception):
+                    await conn.rollback()
+
+    database.DB_PATH.unlink(missing_ok=True)
+    return {"assignments": school.assignments, "functions": results}
+
+
+def analyze_scaling(by_size: dict[int, dict]) -> dict:
+    """Оценивает рост времени между наименьшим и наибольшим размером БД
+
+    exponent - показатель k в time ~ n^k: около 0 для индексных запросов,
+    около 1 для полного прохода по таблице.
+    """
+    sizes = sorted(by_size)
+    if len(sizes) < 2:
+        return {}
+    small, large = by_size[sizes[0]], by_size[sizes[-1]]
+    growth = large["assignments"] / small["assignments"]
+
+    scaling = {}
+    for name, result in large["functions"].items():
+        base = small["functions"].get(name, {})
+        if "median_ms" not in result or not base.get("median_ms"):
+            continue
+        ratio = result["median_ms"] / base["median_ms"]
+        exponent = math.log(ratio) / math.log(growth) if ratio > 0 else 0.0
+        scaling[name] = {
+            "ratio": round(ratio, 2),
+            "exponent": round(exponent, 3),
+            "linear": exponent >= LINEAR_EXPONENT,
+            "full_scan_assignments": result.get("full_scan_assignments", False),
+            "lower_predicate": result.get("lower_predicate", False),
+        }
+    return scaling
+
+
+async def run(args: argparse.Namespace) -> dict:
+    functions = public_functions()
+    missing = sorted(set(functions) - set(CASES) - set(SKIPPED))
+    for name in missing:
+        logger.warning("No benchmark case for %s", name)
+
+    names = [name for name in CASES if name in functions and (not args.only or name in args.only)]
+    workdir = Path(tempfile.mkdtemp(prefix="school_bench_db_"))
+    by_size = {}
+    for size in args.sizes:
+        by_size[size] = await bench_size(size, workdir, names, args.repeat, args.budget)
+
+    return {
+        "revision": git_revision(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "sizes": {str(size): result for size, result in by_size.items()},
+        "scaling": analyze_scaling(by_size),
+        "skipped": SKIPPED,
+        "missing_cases": missing,
+    }
+
+
+def _print_summary(report: dict) -> None:
+    scaling = sorted(report["scaling"].items(), key=lambda item: item[1]["exponent"], reverse=True)
+    for name, row in scaling:
+        flags = []
+        if row["linear"]:
+            flags.append("O(n)")
+        if row["full_scan_assignments"]:
+            flags.append("SCAN assignments")
+        if row["lower_predicate"]:
+            flags.append("LOWER()")
+        logger.info("%-40s x%-8s k=%-6s %s", name, row["ratio"], row["exponent"], ", ".join(flags))
+    for size, result in report["sizes"].items():
+        for name, row in result["functions"].items():
+            if "error" in row:
+                logger.warning("%s @%s: %s", name, size, row["error"])
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарки функций БД school_bot")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=30, help="Максимум вызовов на функцию")
+    parser.add_argument("--budget", type=float, default=1.0, help="Секунд на функцию (не меньше одного вызова)")
+    parser.add_argument("--only", nargs="*", default=None, help="Запустить только эти функции")
+    parser.add_argument("--output", type=Path, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    _print_summary(report)
+
+    output = args.output or Path(__file__).parent / "results" / f"db_functions_{report['revision'] or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info("Results saved to %s", output)
+
+
+if __name__ == "__main__":
+    main()
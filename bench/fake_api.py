@@ -0,0 +1,81 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Optional
+
+from aiohttp import web
+
+
+# bench/fake_api.py
+
+# Методы Bot API, которые возвращают True, а не сообщение
+_BOOL_METHODS = {
+    "answercallbackquery", "deletemessage", "deletemessages", "sendchataction",
+    "setmycommands", "deletewebhook", "setwebhook", "close", "logout",
+}
+
+
+class FakeBotAPI:
+    """Локальный HTTP-сервер, отвечающий как Telegram Bot API
+
+    Принимает запросы вида /bot<token>/<method>, отвечает правдоподобными
+    сообщениями и считает вызовы по методам. latency добавляет задержку
+    к каждому ответу, чтобы приблизить время запросов к реальному API.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self._message_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запускает сервер и возвращает базовый URL (порт 0 - любой свободный)"""
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        form = await request.post()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response({"ok": True, "result": self._result(method.lower(), form)})
+
+    def _result(self, method: str, form) -> object:
+        if method in _BOOL_METHODS:
+            return True
+        if method == "getme":
+            return {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        if method == "getfile":
+            return {"file_id": form.get("file_id", "x"), "file_unique_id": "x", "file_path": "bench/x"}
+        if method == "sendmediagroup":
+            media = json.loads(form.get("media", "[]"))
+            return [self._message(form) for _ in media]
+        return self._message(form)
+
+    def _message(self, form) -> dict:
+        chat_id = form.get("chat_id", "1")
+        try:
+            chat_id = int(chat_id)
+        except ValueError:
+            chat_id = 1
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": form.get("text") or "",
+        }
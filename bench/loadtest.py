@@ -0,0 +1,230 @@
+"""Нагрузочный прогон бота против синтетической школы
+
+Пример:
+    python -m bench.loadtest --teachers 20 --students-per-class 25 \\
+        --rate 50 --api-latency-ms 30 --output bench/results/run.json
+
+Бот работает с настоящим диспетчером и хэндлерами, но с временной БД
+и локальным фейковым Bot API. Результат - JSON, который можно сравнивать
+между коммитами.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import platform
+import sqlite3
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from bench.scenarios import SCENARIOS, Session
+from bench.synthetic import SchoolSpec, generate_school
+
+
+# Токен нужного формата; запросы все равно уходят на фейковый API
+BENCH_TOKEN = "123456:" + "A" * 35
+
+# Метки db_statement_seconds, по которым оцениваются ожидания блокировок
+_WRITE_OPERATIONS = ("INSERT", "UPDATE", "DELETE", "COMMIT")
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1] * 1000, 3)}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _lock_waits(metrics) -> dict:
+    """Оценка ожиданий блокировок SQLite по времени пишущих запросов
+
+    SQLite не сообщает, сколько соединение ждало блокировку (busy timeout
+    прячет ожидание внутри execute/commit), поэтому смотрим на распределение
+    времени записей и коммитов: рост хвоста при той же нагрузке означает
+    конкуренцию за блокировку.
+    """
+    samples: list[float] = []
+    total = 0.0
+    count = 0
+    for key, summary in metrics.summaries.get("db_statement_seconds", {}).items():
+        statement = dict(key).get("statement", "")
+        if statement.split(" ", 1)[0] in _WRITE_OPERATIONS:
+            samples.extend(summary.samples)
+            total += summary.total
+            count += summary.count
+    return {
+        "write_statements": count,
+        "write_seconds_total": round(total, 4),
+        "write_latency_ms": _percentiles(samples),
+    }
+
+
+async def run_scenario(dp, bot, sessions: list[Session], rate: float) -> dict:
+    """Запускает сессии с заданной частотой (сессий в секунду) и собирает замеры
+
+    Нагрузка открытая: новые сессии стартуют по расписанию, даже если
+    предыдущие еще не закончились.
+    """
+    latencies: list[float] = []
+    errors: Counter[str] = Counter()
+    locked = 0
+
+    async def run_session(steps: Session) -> None:
+        nonlocal locked
+        for update in steps:
+            start = time.perf_counter()
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                if isinstance(e, sqlite3.OperationalError) and "locked" in str(e):
+                    locked += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    tasks = []
+    for i, steps in enumerate(sessions):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(run_session(steps)))
+    await asyncio.gather(*tasks)
+    duration = time.perf_counter() - started
+
+    return {
+        "sessions": len(sessions),
+        "updates": len(latencies),
+        "target_rate": rate,
+        "duration_s": round(duration, 3),
+        "throughput_ups": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latency_ms": _percentiles(latencies),
+        "errors": dict(errors),
+        "db_locked_errors": locked,
+    }
+
+
+async def run(args: argparse.Namespace, db_path: Path) -> dict:
+    from aiogram.client.telegram import TelegramAPIServer
+
+    from bench.fake_api import FakeBotAPI
+    from school_bot.app import create_app
+    from school_bot.db.database import init_db
+    from school_bot.events import bus
+    from school_bot.metrics import metrics
+
+    logging.getLogger("aiogram").setLevel(logging.WARNING)
+    bot, dp = create_app(token=BENCH_TOKEN)
+
+    spec = SchoolSpec(
+        teachers=args.teachers,
+        classes_per_teacher=args.classes_per_teacher,
+        students_per_class=args.students_per_class,
+        assignments_per_student=args.assignments_per_student,
+        seed=args.seed,
+    )
+    await init_db()
+    generated_at = time.perf_counter()
+    school = await asyncio.to_thread(generate_school, db_path, spec)
+    generate_seconds = time.perf_counter() - generated_at
+
+    api = FakeBotAPI(latency=args.api_latency_ms / 1000)
+    bot.session.api = TelegramAPIServer.from_base(await api.start())
+
+    results = {}
+    try:
+        for name in args.scenarios:
+            sessions = SCENARIOS[name](school, args.limit)
+            metrics.summaries.clear()
+            metrics.counters.clear()
+            api.calls.clear()
+
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                result = await run_scenario(dp, bot, sessions, args.rate)
+                # Уведомления подписчиков шины событий - тоже нагрузка сценария
+                await bus.join()
+            result["api_calls"] = dict(api.calls)
+            result["lock_waits"] = _lock_waits(metrics)
+            results[name] = result
+            logging.info("%s: %s updates, p95=%sms", name, result["updates"], result["latency_ms"]["p95"])
+    finally:
+        await api.stop()
+        await bot.session.close()
+
+    return {
+        "revision": git_revision(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "school": {
+            **asdict(spec),
+            "students": len(school.students),
+            "assignments": school.assignments,
+            "generate_seconds": round(generate_seconds, 2),
+        },
+        "rate": args.rate,
+        "api_latency_ms": args.api_latency_ms,
+        "scenarios": results,
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон school_bot")
+    parser.add_argument("--teachers", type=int, default=20)
+    parser.add_argument("--classes-per-teacher", type=int, default=3)
+    parser.add_argument("--students-per-class", type=int, default=25)
+    parser.add_argument("--assignments-per-student", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rate", type=float, default=50.0, help="Новых сессий в секунду")
+    parser.add_argument("--limit", type=int, default=None, help="Ограничить число сессий в сценарии")
+    parser.add_argument("--api-latency-ms", type=float, default=30.0, help="Задержка фейкового Bot API")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS),
+        help="Какие сценарии запускать (по порядку)"
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Куда сохранить JSON (по умолчанию stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    # Подменяем путь к БД до импорта хэндлеров
+    import school_bot.db.database as database
+    database.DB_PATH = Path(tempfile.mkdtemp(prefix="school_bench_")) / "school_bot.db"
+
+    report = asyncio.run(run(args, database.DB_PATH))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+        logging.info("Report saved to %s", args.output)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import itertools
+import random
+import time
+from typing import Optional
+
+from aiogram.types import Update
+
+from bench.synthetic import School
+from school_bot.callbacks import GradeQueueCallback, QueueAction, WorkAction, WorkCallback, WorkList, WorkListCallback
+
+
+# bench/scenarios.py
+#
+# Сценарий - это список сессий; сессия - последовательность апдейтов
+# одного пользователя, которые отправляются строго по очереди (FSM).
+
+Session = list[Update]
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def _user(username: str, chat_id: int) -> dict:
+    return {"id": chat_id, "is_bot": False, "first_name": username, "username": username}
+
+
+def _message(school: School, username: str, text: Optional[str] = None, **extra) -> dict:
+    chat_id = school.chat_ids[username]
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": _user(username, chat_id),
+        **extra,
+    }
+    if text is not None:
+        message["text"] = text
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return message
+
+
+def message_update(school: School, username: str, text: Optional[str] = None, **extra) -> Update:
+    return Update.model_validate({
+        "update_id": next(_update_ids),
+        "message": _message(school, username, text, **extra),
+    })
+
+
+def document_update(school: School, username: str, name: str = "task.pdf") -> Update:
+    file_id = f"bench_{next(_message_ids)}"
+    return message_update(school, username, document={
+        "file_id": file_id,
+        "file_unique_id": f"u{file_id}",
+        "file_name": name,
+        "mime_type": "application/pdf",
+        "file_size": 120_000,
+    })
+
+
+def callback_update(school: School, username: str, data: str, text: Optional[str] = None) -> Update:
+    """Нажатие inline-кнопки под сообщением бота: с подписью (карточка работы) или с текстом"""
+    chat_id = school.chat_ids[username]
+    bot_message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": 1, "is_bot": True, "first_name": "bench"},
+    }
+    if text is None:
+        bot_message["caption"] = "📄 Подробности работы"
+    else:
+        bot_message["text"] = text
+    return Update.model_validate({
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "chat_instance": str(chat_id),
+            "from": _user(username, chat_id),
+            "message": bot_message,
+            "data": data,
+        },
+    })
+
+
+def start_storm(school: School, limit: Optional[int] = None) -> list[Session]:
+    """Утренний наплыв: каждый ученик отправляет /start"""
+    students = school.students[:limit] if limit else school.students
+    return [[message_update(school, student, "/start")] for student in students]
+
+
+def assignment_fanout(school: School, limit: Optional[int] = None) -> list[Session]:
+    """Учителя выдают задание с файлом целому классу (рассылка всем ученикам)"""
+    sessions = []
+    for teacher in school.teachers[:limit] if limit else school.teachers:
+        class_name = school.classes_of(teacher)[0]
+        sessions.append([
+            message_update(school, teacher, "/give_assignment"),
+            message_update(school, teacher, class_name),
+            message_update(school, teacher, "Контрольная работа к пятнице"),
+            document_update(school, teacher),
+        ])
+    return sessions
+
+
+def deadline_submissions(school: School, limit: Optional[int] = None, seed: int = 1) -> list[Session]:
+    """Последний час перед дедлайном: ученики массово сдают первое активное задание"""
+    students = list(school.students)
+    random.Random(seed).shuffle(students)
+    return [
+        [
+            message_update(school, student, "/submit_assignment"),
+            message_update(school, student, "1"),
+            message_update(school, student, "Мое решение задачи"),
+            message_update(school, student, "/skip"),
+        ]
+        for student in (students[:limit] if limit else students)
+    ]
+
+
+def grading_sprint(
+    school: School,
+    limit: Optional[int] = None,
+    works_per_teacher: int = 10,
+    seed: int = 2
+) -> list[Session]:
+    """Учителя подряд открывают и оценивают присланные работы"""
+    rng = random.Random(seed)
+    sessions = []
+    for teacher in school.teachers[:limit] if limit else school.teachers:
+        steps = [message_update(school, teacher, "/view_completed")]
+        for work_id in school.submitted.get(teacher, [])[:works_per_teacher]:
+            steps += [
+                callback_update(school, teacher, WorkCallback(action=WorkAction.VIEW, work_id=work_id).pack()),
+                callback_update(school, teacher, WorkCallback(action=WorkAction.GRADE, work_id=work_id).pack()),
+                callback_update(school, teacher, WorkCallback(
+                    action=WorkAction.SET_GRADE, work_id=work_id, grade=rng.randint(2, 5)
+                ).pack()),
+            ]
+        sessions.append(steps)
+    return sessions
+
+
+def grading_queue(
+    school: School,
+    limit: Optional[int] = None,
+    works_per_teacher: int = 30,
+    seed: int = 3
+) -> list[Session]:
+    """Учителя проверяют работы в режиме очереди: одна кнопка с оценкой на работу
+
+    Очередь показывает непроверенные работы от старых к новым - в том же
+    порядке, что и School.ungraded, поэтому сценарий должен идти до
+    grading_sprint, который меняет оценки.
+    """
+    rng = random.Random(seed)
+    sessions = []
+    for teacher in school.teachers[:limit] if limit else school.teachers:
+        steps = [message_update(school, teacher, "/grade_queue")]
+        works = school.ungraded.get(teacher, [])[:works_per_teacher]
+        for work_id in works:
+            steps.append(callback_update(
+                school, teacher,
+                GradeQueueCallback(action=QueueAction.GRADE, work_id=work_id, grade=rng.randint(2, 5)).pack(),
+                text="🎯 Проверка по очереди"
+            ))
+        if works:
+            steps.append(callback_update(
+                school, teacher, GradeQueueCallback(action=QueueAction.STOP, work_id=works[-1]).pack(),
+                text="🎯 Проверка по очереди"
+            ))
+        sessions.append(steps)
+    return sessions
+
+
+def page_flipping(school: School, limit: Optional[int] = None, pages: int = 6) -> list[Session]:
+    """Учителя листают список присланных работ вперед и обратно"""
+    sessions = []
+    for teacher in school.teachers[:limit] if limit else school.teachers:
+        steps = [message_update(school, teacher, "/view_completed")]
+        for page in [*range(1, pages), *range(pages - 2, -1, -1)]:
+            steps.append(callback_update(
+                school, teacher, WorkListCallback(list=WorkList.COMPLETED, page=page).pack(),
+                text="📚 Выполненные задания"
+            ))
+        sessions.append(steps)
+    return sessions
+
+
+SCENARIOS = {
+    "start_storm": start_storm,
+    "assignment_fanout": assignment_fanout,
+    "deadline_submissions": deadline_submissions,
+    "grading_queue": grading_queue,
+    "grading_sprint": grading_sprint,
+    "page_flipping": page_flipping,
+}
@@ -0,0 +1,74 @@
+"""Замер времени запуска бота в чистом интерпретаторе
+
+Пример:
+    python -m bench.startup --runs 5 --top 15
+
+Каждый прогон - отдельный процесс с `python -X importtime`, который
+собирает приложение через create_app(). Печатает медиану времени процесса,
+этапы StartupTimer и самые тяжелые импорты.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional
+
+from bench.loadtest import BENCH_TOKEN
+
+
+_PROBE = f"""
+import json
+from school_bot.app import StartupTimer, create_app
+timer = StartupTimer()
+create_app(token={BENCH_TOKEN!r}, timer=timer)
+print(json.dumps({{"total": timer.total, "phases": timer.phases}}))
+"""
+
+
+def _run_once() -> tuple[float, dict, dict[str, int]]:
+    """Возвращает время жизни процесса, замеры StartupTimer и время импорта модулей (мкс)"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - start
+    imports = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        imports[name.strip()] = int(cumulative_us)
+    return wall, json.loads(proc.stdout.strip().splitlines()[-1]), imports
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Время запуска school_bot")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Сколько самых тяжелых импортов показать")
+    args = parser.parse_args(argv)
+
+    walls, totals, phases, imports = [], [], {}, {}
+    for _ in range(args.runs):
+        wall, timings, run_imports = _run_once()
+        walls.append(wall)
+        totals.append(timings["total"])
+        for name, seconds in timings["phases"].items():
+            phases.setdefault(name, []).append(seconds)
+        for name, us in run_imports.items():
+            imports.setdefault(name, []).append(us)
+
+    print(f"process: median {statistics.median(walls) * 1000:.0f}ms (interpreter + imports + create_app)")
+    print(f"create_app: median {statistics.median(totals) * 1000:.0f}ms over {args.runs} runs")
+    for name, values in phases.items():
+        print(f"  {name}: {statistics.median(values) * 1000:.0f}ms")
+    print("Heaviest imports (cumulative, median):")
+    heaviest = sorted(imports.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, values in heaviest[:args.top]:
+        print(f"  {statistics.median(values) / 1000:8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
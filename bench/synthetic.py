@@ -0,0 +1,154 @@
+import random
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+# bench/synthetic.py
+
+# С этого id начинаются chat_id синтетических пользователей
+CHAT_ID_BASE = 10_000_000
+
+
+@dataclass
+class SchoolSpec:
+    """Параметры синтетической школы"""
+    teachers: int = 20
+    classes_per_teacher: int = 3
+    students_per_class: int = 25
+    assignments_per_student: int = 20
+    submitted_ratio: float = 0.3
+    graded_ratio: float = 0.5
+    digest_ratio: float = 0.0  # доля учителей со сводками (hourly / daily) вместо мгновенных уведомлений
+    seed: int = 42
+
+
+@dataclass
+class School:
+    """Сгенерированная школа: кто есть в БД и с какими chat_id"""
+    teachers: list[str] = field(default_factory=list)
+    classes: dict[str, list[str]] = field(default_factory=dict)
+    class_teacher: dict[str, str] = field(default_factory=dict)
+    students: list[str] = field(default_factory=list)
+    chat_ids: dict[str, int] = field(default_factory=dict)
+    assignments: int = 0
+    submitted: dict[str, list[int]] = field(default_factory=dict)  # учитель -> id присланных работ
+    ungraded: dict[str, list[int]] = field(default_factory=dict)  # учитель -> id непроверенных работ, от старых к новым
+
+    def classes_of(self, teacher_username: str) -> list[str]:
+        return [name for name, teacher in self.class_teacher.items() if teacher == teacher_username]
+
+
+def generate_school(db_path: str | Path, spec: SchoolSpec) -> School:
+    """Заполняет БД (схема уже создана init_db) синтетической школой
+
+    Каждому ученику выдается assignments_per_student заданий от учителя
+    его класса; часть из них отправлена (submitted_ratio), часть
+    отправленных оценена (graded_ratio). Все вставки идут пачками
+    в одной транзакции.
+    """
+    rng = random.Random(spec.seed)
+    school = School()
+    now = datetime.now()
+
+    teachers_rows = []
+    classes_rows = []
+    students_rows = []
+    student_classes_rows = []
+
+    for t in range(spec.teachers):
+        teacher = f"teacher_{t}"
+        school.teachers.append(teacher)
+        school.chat_ids[teacher] = CHAT_ID_BASE + len(school.chat_ids)
+        notify_mode = "immediate"
+        if spec.digest_ratio and rng.random() < spec.digest_ratio:
+            notify_mode = rng.choice(("hourly", "daily"))
+        teachers_rows.append((teacher, school.chat_ids[teacher], now.isoformat(), notify_mode))
+
+        for c in range(spec.classes_per_teacher):
+            class_name = f"{t}-{chr(ord('А') + c)}"
+            school.class_teacher[class_name] = teacher
+            school.classes[class_name] = []
+            classes_rows.append((class_name, teacher, class_name.casefold()))
+
+            for s in range(spec.students_per_class):
+                student = f"student_{t}_{c}_{s}"
+                school.classes[class_name].append(student)
+                school.students.append(student)
+                school.chat_ids[student] = CHAT_ID_BASE + len(school.chat_ids)
+                students_rows.append((student, school.chat_ids[student], now.isoformat(), f"Ученик {t}.{c}.{s}"))
+                student_classes_rows.append((student, class_name))
+
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO teachers (username, chat_id, first_seen, notify_mode) VALUES (?, ?, ?, ?)",
+                teachers_rows
+            )
+            conn.executemany(
+                "INSERT INTO classes (name, teacher_username, name_key) VALUES (?, ?, ?)",
+                classes_rows
+            )
+            conn.executemany(
+                "INSERT INTO students (username, chat_id, first_seen, name) VALUES (?, ?, ?, ?)",
+                students_rows
+            )
+            conn.executemany(
+                "INSERT INTO student_classes (student_username, class_name) VALUES (?, ?)",
+                student_classes_rows
+            )
+            cursor = conn.executemany('''
+                INSERT INTO assignments (
+                    teacher_username, student_username, text, assignment_type, class_name,
+                    assigned_at, deadline, status,
+                    response_text, submitted_at, grade, graded_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', _assignment_rows(school, spec, rng, now))
+            school.assignments = cursor.rowcount
+            # Задание класса - все строки с одним текстом, как при add_class_assignment
+            conn.execute("CREATE TEMP TABLE class_assignment_ids (text TEXT PRIMARY KEY, id INTEGER)")
+            conn.execute("INSERT INTO class_assignment_ids SELECT text, MIN(id) FROM assignments GROUP BY text")
+            conn.execute('''
+                UPDATE assignments SET class_assignment_id = g.id
+                FROM class_assignment_ids AS g
+                WHERE assignments.text = g.text
+            ''')
+            conn.execute("DROP TABLE class_assignment_ids")
+            for teacher, work_id in conn.execute(
+                "SELECT teacher_username, id FROM assignments WHERE status = 'submitted' ORDER BY submitted_at DESC"
+            ):
+                school.submitted.setdefault(teacher, []).append(work_id)
+            for teacher, work_id in conn.execute(
+                "SELECT teacher_username, id FROM assignments WHERE status = 'submitted' AND grade IS NULL "
+                "ORDER BY submitted_at, id"
+            ):
+                school.ungraded.setdefault(teacher, []).append(work_id)
+    finally:
+        conn.close()
+
+    return school
+
+
+def _assignment_rows(school: School, spec: SchoolSpec, rng: random.Random, now: datetime):
+    """Строки заданий генерируются лениво, чтобы не держать миллионы кортежей в памяти"""
+    for class_name, students in school.classes.items():
+        teacher = school.class_teacher[class_name]
+        for student in students:
+            for n in range(spec.assignments_per_student):
+                assigned_at = now - timedelta(days=rng.randint(1, 120), minutes=rng.randint(0, 1440))
+                deadline = assigned_at + timedelta(days=7)
+                status, response, submitted_at, grade, graded_at = "active", None, None, None, None
+                if rng.random() < spec.submitted_ratio:
+                    status = "submitted"
+                    response = f"Ответ на задание {n}"
+                    submitted_at = (assigned_at + timedelta(hours=rng.randint(1, 160))).isoformat()
+                    if rng.random() < spec.graded_ratio:
+                        grade = rng.randint(2, 5)
+                        graded_at = submitted_at
+                yield (
+                    teacher, student, f"Задание {n} для класса {class_name}", "class", class_name,
+                    assigned_at.isoformat(), deadline.isoformat(), status,
+                    response, submitted_at, grade, graded_at
+                )
@@ -0,0 +1,142 @@
+"""Сравнение шаблонов сообщений (school_bot/templates.py) со сборкой строк конкатенацией
+
+Пример:
+    python -m bench.templates --works 5 --number 20000
+
+Для карточки работы и страницы выполненных работ замеряются три варианта:
+- concat - прежняя сборка f-строками и += (без экранирования и учета лимитов);
+- template - Template.render() с экранированием и truncate();
+- cached - render_cached(), как в хэндлерах: повторный показ той же версии строки.
+Печатает время одного рендера в микросекундах.
+"""
+import argparse
+import random
+import string
+import timeit
+from typing import Callable, Optional
+
+from school_bot.handlers.teacher import COMPLETED_WORK_ROW, COMPLETED_WORKS_HEADER, WORK_DETAILS, format_work_details
+from school_bot.templates import TEXT_LIMIT, clear_render_cache, join, shorten, truncate
+
+
+def make_work(work_id: int, response_len: int, rng: random.Random) -> dict:
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(response_len // 6)]
+    return {
+        "id": work_id,
+        "student": f"student_{work_id}",
+        "student_name": f"Ученик <{work_id}> & Co",
+        "assignment": "Решить задачи " + " ".join(words[:20]),
+        "response": " ".join(words),
+        "file_id": None,
+        "file_type": None,
+        "submitted_at": "2026-10-19 12:00:00",
+        "grade": rng.choice([3, 4, 5, "не оценено"]),
+    }
+
+
+def legacy_work_details(work: dict) -> str:
+    """format_work_details до шаблонов"""
+    return (
+        f"📄 <b>Подробности работы</b>\n\n"
+        f"👤 Ученик: {work['student_name']} (@{work['student']})\n"
+        f"📝 Задание: {work['assignment']}\n"
+        f"📅 Дата отправки: {work['submitted_at'][:10]}\n"
+        f"🏆 Оценка: {work['grade']}\n\n"
+        f"📋 Ответ ученика:\n{(work['response'] or 'Нет текстового ответа')[:1000]}\n"
+    )
+
+
+def legacy_completed_page(works: list[dict], page: int, total_count: int) -> str:
+    """Текст страницы render_completed_works_page до шаблонов"""
+    total_pages = (total_count + len(works) - 1) // len(works)
+    response = (
+        f"📚 <b>Выполненные задания</b> (страница {page + 1}/{total_pages})\n\n"
+        f"Всего работ: {total_count}\n\n"
+    )
+    for i, work in enumerate(works, page * len(works) + 1):
+        response += (
+            f"🔹 <b>Работа #{i}</b>\n"
+            f"👤 Ученик: {work['student_name']} (@{work['student']})\n"
+            f"📝 Задание: {work['assignment'][:50]}...\n"
+            f"📅 Дата отправки: {work['submitted_at'][:10]}\n"
+            f"🏆 Оценка: {work['grade']}\n\n"
+        )
+    return response
+
+
+def template_completed_page(works: list[dict], page: int, total_count: int, cached: bool) -> str:
+    """Текст страницы так же, как в render_completed_works_page"""
+    total_pages = (total_count + len(works) - 1) // len(works)
+    rows = []
+    for i, work in enumerate(works, page * len(works) + 1):
+        values = dict(
+            number=i,
+            student_name=work["student_name"],
+            student=work["student"],
+            assignment=shorten(work["assignment"], 50),
+            submitted_at=work["submitted_at"][:10],
+            grade=work["grade"]
+        )
+        if cached:
+            rows.append(COMPLETED_WORK_ROW.render_cached((work["id"], i), (work["grade"], work["submitted_at"]), **values))
+        else:
+            rows.append(COMPLETED_WORK_ROW.render(**values))
+    header = COMPLETED_WORKS_HEADER.render(page=page + 1, total_pages=total_pages, total=total_count)
+    return truncate(header + join(rows, sep=""), TEXT_LIMIT)
+
+
+def template_work_details(work: dict) -> str:
+    """format_work_details без кэша"""
+    text = WORK_DETAILS.render(
+        student_name=work["student_name"],
+        student=work["student"],
+        assignment=work["assignment"],
+        submitted_at=work["submitted_at"][:10],
+        grade=work["grade"],
+        response=work["response"] or "Нет текстового ответа"
+    )
+    return truncate(text, TEXT_LIMIT)
+
+
+def measure(func: Callable[[], object], number: int) -> float:
+    """Лучшее из трех время одного вызова, мкс"""
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Шаблоны сообщений против конкатенации")
+    parser.add_argument("--works", type=int, default=5, help="Работ на странице списка")
+    parser.add_argument("--response-len", type=int, default=800, help="Длина ответа ученика, символов")
+    parser.add_argument("--number", type=int, default=20000, help="Рендеров в одном замере")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    works = [make_work(i, args.response_len, rng) for i in range(1, args.works + 1)]
+    work = works[0]
+    clear_render_cache()
+
+    cases = {
+        "work_details": {
+            "concat": lambda: legacy_work_details(work),
+            "template": lambda: template_work_details(work),
+            "cached": lambda: format_work_details(work),
+        },
+        "completed_page": {
+            "concat": lambda: legacy_completed_page(works, 0, 100),
+            "template": lambda: template_completed_page(works, 0, 100, cached=False),
+            "cached": lambda: template_completed_page(works, 0, 100, cached=True),
+        },
+    }
+
+    print(f"{'case':<16}{'variant':<10}{'us/render':>12}{'vs concat':>12}")
+    for case, variants in cases.items():
+        baseline = None
+        for variant, func in variants.items():
+            us = measure(func, args.number)
+            baseline = baseline or us
+            print(f"{case:<16}{variant:<10}{us:>12.2f}{us / baseline:>11.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,43 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from school_bot.config import BOT_TOKEN
+from school_bot.app import StartupTimer, create_app
+from school_bot.config import ARCHIVE_CONCURRENCY, ARCHIVE_DIR, DIGEST_CHECK_INTERVAL, METRICS_LOG_INTERVAL, METRICS_PORT
+from school_bot.metrics import log_metrics_periodically, start_metrics_server
 
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Инициализация бота и диспетчера
-bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
-
-# Импорт хэндлеров
-from school_bot.db.database import init_db
-from school_bot.handlers.teacher import *
-from school_bot.handlers.student import *
-from school_bot.handlers.universal import *
-
 
 async def main():
-    await init_db()
-    await dp.start_polling(bot, skip_updates=True)
+    timer = StartupTimer()
+    bot, dp = create_app(timer=timer)
+
+    from school_bot.db.database import init_db
+    with timer.phase("init_db"):
+        await init_db()
+    logger.info(timer.report())
+
+    if METRICS_PORT:
+        await start_metrics_server("0.0.0.0", METRICS_PORT)
+    if METRICS_LOG_INTERVAL:
+        asyncio.create_task(log_metrics_periodically(METRICS_LOG_INTERVAL))
+    if ARCHIVE_DIR:
+        from school_bot.archive import SubmissionArchiver
+        archiver = SubmissionArchiver(bot, ARCHIVE_DIR, ARCHIVE_CONCURRENCY)
+        asyncio.create_task(archiver.run())
+    if DIGEST_CHECK_INTERVAL:
+        from school_bot.digest import DigestScheduler
+        asyncio.create_task(DigestScheduler(bot).run())
+    try:
+        await dp.start_polling(bot, skip_updates=True)
+    finally:
+        from school_bot.db.slow_queries import slow_query_log
+        if slow_query_log.enabled:
+            logger.info("DB query report:\n%s", slow_query_log.report())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
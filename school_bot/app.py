@@ -0,0 +1,96 @@
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from school_bot.config import (
+    BOT_TOKEN, SEND_CHAT_BURST, SEND_CHAT_RATE, SEND_GLOBAL_RATE, SEND_MAX_RETRIES,
+)
+from school_bot.dedup import setup_dedup
+from school_bot.events import setup_events
+from school_bot.metrics import metrics, setup_metrics
+from school_bot.roles import setup_roles
+from school_bot.scheduling import setup_scheduling
+from school_bot.send_gateway import setup_send_gateway
+
+
+logger = logging.getLogger(__name__)
+
+# Манифест регистрации: модули с роутерами в порядке проверки хэндлеров.
+# Порядок важен - universal ловит все оставшиеся сообщения и идет последним.
+ROUTER_MODULES = (
+    "school_bot.handlers.teacher",
+    "school_bot.handlers.student",
+    "school_bot.handlers.search",
+    "school_bot.handlers.universal",
+)
+
+
+class StartupTimer:
+    """Замеряет длительность этапов запуска (импорт, сборка, init_db)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            metrics.set("bot_startup_seconds", self.phases[name], {"phase": name})
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def report(self) -> str:
+        parts = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        return f"Startup {self.total * 1000:.0f}ms ({parts})"
+
+
+def create_bot(token: Optional[str] = None) -> Bot:
+    return Bot(token=token or BOT_TOKEN)
+
+
+def create_dispatcher(timer: Optional[StartupTimer] = None) -> Dispatcher:
+    """Создает диспетчер и подключает роутеры из ROUTER_MODULES"""
+    timer = timer or StartupTimer()
+    dp = Dispatcher(storage=MemoryStorage())
+    for module_name in ROUTER_MODULES:
+        with timer.phase(f"import:{module_name.rsplit('.', 1)[-1]}"):
+            module = importlib.import_module(module_name)
+        dp.include_router(module.router)
+    return dp
+
+
+def create_app(token: Optional[str] = None, timer: Optional[StartupTimer] = None) -> tuple[Bot, Dispatcher]:
+    """Собирает бота и диспетчер со всеми роутерами, шлюзом отправки, метриками, шиной событий и ролями
+    
+    Повторно доставленные апдейты отбрасываются до всех остальных middleware,
+    затем апдейты одного чата выстраиваются в очередь (см. scheduling).
+    """
+    timer = timer or StartupTimer()
+    bot = create_bot(token)
+    dp = create_dispatcher(timer)
+    with timer.phase("setup"):
+        setup_dedup(dp)
+        setup_scheduling(dp)
+        setup_send_gateway(
+            dp, bot,
+            global_rate=SEND_GLOBAL_RATE,
+            chat_rate=SEND_CHAT_RATE,
+            chat_burst=SEND_CHAT_BURST,
+            max_retries=SEND_MAX_RETRIES
+        )
+        setup_metrics(dp, bot)
+        setup_events(dp, bot)
+        setup_roles(dp)
+    return bot, dp
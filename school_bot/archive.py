@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Optional
+
+from aiogram import Bot
+
+from school_bot.db.archive import (
+    get_archived_works,
+    get_unarchived_response_files,
+    mark_file_archive_failed,
+    mark_file_archived,
+)
+
+
+# Размер блока при скачивании и упаковке файлов
+CHUNK_SIZE = 64 * 1024
+
+
+class _HashingWriter:
+    """Файл для записи, который по пути считает SHA-256 и размер"""
+
+    def __init__(self, file):
+        self._file = file
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+
+class SubmissionArchiver:
+    """Фоновое зеркалирование присланных работ в локальную папку
+
+    Файлы скачиваются потоково (bot.download блоками по CHUNK_SIZE) и
+    сохраняются по содержимому: objects/<sha[:2]>/<sha>. Прогресс хранится
+    в таблице file_archive, поэтому после перезапуска архивация продолжается
+    с незаархивированных файлов.
+    """
+
+    def __init__(self, bot: Bot, root: str | Path, concurrency: int = 3, poll_interval: float = 60.0):
+        self.bot = bot
+        self.root = Path(root)
+        self.poll_interval = poll_interval
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(self) -> None:
+        """Бесконечный цикл архивации (запускается как фоновая задача)"""
+        while True:
+            try:
+                # Порция без единого сохраненного файла - ждем следующего опроса:
+                # упавшие файлы повторяются только после паузы (см. mark_file_archive_failed)
+                while await self.archive_pending():
+                    pass
+            except Exception as e:
+                print(f"⚠ Ошибка архивации: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def archive_pending(self, batch_size: int = 100) -> int:
+        """Архивирует очередную порцию файлов и возвращает количество сохраненных"""
+        pending = await get_unarchived_response_files(batch_size)
+        archived = await asyncio.gather(*[
+            self._archive_file(file_ref, file_id)
+            for file_ref, file_id, _, _ in pending
+        ])
+        return sum(archived)
+
+    async def _archive_file(self, file_ref: int, file_id: str) -> bool:
+        async with self._semaphore:
+            tmp_dir = self.root / "tmp"
+            tmp_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = tmp_dir / f"{file_ref}.part"
+            try:
+                with open(tmp_path, "wb") as tmp_file:
+                    writer = _HashingWriter(tmp_file)
+                    await self.bot.download(file_id, destination=writer, chunk_size=CHUNK_SIZE, seek=False)
+
+                digest = writer.sha256.hexdigest()
+                object_path = self.root / "objects" / digest[:2] / digest
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                if object_path.exists():
+                    tmp_path.unlink()
+                else:
+                    os.replace(tmp_path, object_path)
+
+                await mark_file_archived(
+                    file_ref,
+                    digest,
+                    str(object_path.relative_to(self.root)),
+                    writer.size
+                )
+                return True
+            except Exception as e:
+                print(f"⚠ Не удалось заархивировать файл {file_ref}: {e}")
+                tmp_path.unlink(missing_ok=True)
+                await mark_file_archive_failed(file_ref, str(e))
+                return False
+
+    async def export_zip(self, teacher_username: str, class_name: Optional[str] = None) -> tuple[Path, int]:
+        """Собирает ZIP с работами учителя (или одного класса) во временный файл
+
+        Returns:
+            (путь к ZIP, количество файлов, которых еще нет в архиве)
+        """
+        works = await get_archived_works(teacher_username, class_name)
+        return await asyncio.to_thread(self._write_zip, works)
+
+    def _write_zip(self, works: list) -> tuple[Path, int]:
+        """Пишет ZIP потоково: файлы копируются блоками, не загружаясь в память"""
+        fd, zip_name = tempfile.mkstemp(prefix="works_", suffix=".zip")
+        os.close(fd)
+        missing = 0
+        written_texts = set()
+        file_numbers: dict[int, int] = {}
+
+        with zipfile.ZipFile(zip_name, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for assignment_id, student, text, response_text, submitted_at, path, file_type, file_name in works:
+                folder = f"{student}/{assignment_id}"
+
+                if assignment_id not in written_texts:
+                    written_texts.add(assignment_id)
+                    zf.writestr(
+                        f"{folder}/answer.txt",
+                        f"Задание: {text}\nОтправлено: {submitted_at}\n\n{response_text or ''}"
+                    )
+
+                if not file_type:
+                    continue
+                if not path:
+                    missing += 1
+                    continue
+
+                file_numbers[assignment_id] = file_numbers.get(assignment_id, 0) + 1
+                suffix = Path(file_name).suffix if file_name else (".jpg" if file_type == "photo" else "")
+                arcname = f"{folder}/{file_numbers[assignment_id]}{suffix}"
+                with open(self.root / path, "rb") as src, zf.open(arcname, "w") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+        return Path(zip_name), missing
@@ -0,0 +1,163 @@
+import string
+from enum import Enum
+from typing import Any, Callable, Optional, Union
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+from pydantic import ValidationInfo, field_validator
+
+
+# school_bot/callbacks.py
+#
+# Данные inline-кнопок. Формат: "<префикс><версия>:<поле>:<поле>...",
+# например "w1:s:2n9c:0:5". Действия - одна буква, целые числа - base36,
+# так что даже с id в миллионы строка занимает ~15 байт из 64 допустимых.
+# При несовместимом изменении полей меняется версия в префиксе: старые
+# кнопки перестают распознаваться и получают ответ "кнопка устарела".
+
+_BASE36 = string.digits + string.ascii_lowercase
+
+
+def to_base36(value: int) -> str:
+    if value < 0:
+        raise ValueError("Отрицательные числа в callback data не поддерживаются")
+    digits = []
+    while True:
+        value, rest = divmod(value, 36)
+        digits.append(_BASE36[rest])
+        if not value:
+            return "".join(reversed(digits))
+
+
+class CompactCallbackData(CallbackData, prefix="_"):
+    """База для callback data с целыми числами в base36"""
+
+    def _encode_value(self, key: str, value: Any) -> str:
+        if isinstance(value, int) and not isinstance(value, (bool, Enum)):
+            return to_base36(value)
+        return super()._encode_value(key, value)
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _decode_base36(cls, value: Any, info: ValidationInfo) -> Any:
+        if isinstance(value, str) and cls.model_fields[info.field_name].annotation is int:
+            return int(value, 36)
+        return value
+
+
+class WorkAction(str, Enum):
+    VIEW = "v"
+    GRADE = "g"
+    SET_GRADE = "s"
+    CANCEL = "c"
+    BACK = "b"
+
+
+class WorkCallback(CompactCallbackData, prefix="w1"):
+    """Действие с присланной работой (assignments.id)"""
+    action: WorkAction
+    work_id: int
+    page: int = 0
+    grade: int = 0
+
+
+class WorkList(str, Enum):
+    COMPLETED = "c"  # выполненные задания с оценками (из /view_completed)
+    ALL = "a"        # все присланные работы
+
+
+class WorkListCallback(CompactCallbackData, prefix="l1"):
+    """Страница списка работ"""
+    list: WorkList
+    page: int = 0
+
+
+class QueueAction(str, Enum):
+    GRADE = "g"
+    SKIP = "s"
+    STOP = "x"
+    START = "b"  # кнопка в сводке новых работ, work_id = 0
+
+
+class GradeQueueCallback(CompactCallbackData, prefix="q1"):
+    """Кнопка под работой в режиме проверки по очереди"""
+    action: QueueAction
+    work_id: int
+    grade: int = 0
+
+
+class BulkGradeCallback(CompactCallbackData, prefix="g1"):
+    """Выбор классного задания для оценок списком (id любой строки задания)"""
+    assignment_id: int
+
+
+class NotifyModeCallback(CompactCallbackData, prefix="n1"):
+    """Выбор режима уведомлений учителя о новых работах"""
+    mode: str
+
+
+class RosterAction(str, Enum):
+    CLASSES = "c"   # страница списка классов
+    STUDENTS = "s"  # страница учеников класса
+    DOCUMENT = "d"  # ученики файлом (class_id = 0 - все классы)
+    GRADES = "g"    # страница оценок класса
+    REPORT = "r"    # табель класса CSV-файлом
+
+
+class RosterCallback(CompactCallbackData, prefix="r1"):
+    """Списки классов и учеников учителя (class_id - rowid в classes)"""
+    action: RosterAction
+    class_id: int = 0
+    page: int = 0
+
+
+class SearchCallback(CompactCallbackData, prefix="f1"):
+    """Страница результатов /search (search_id - номер сохраненного запроса)"""
+    search_id: int
+    page: int = 0
+
+
+class CallbackActions:
+    """Inline-кнопки роутера: один хэндлер и поиск по (префикс, действие)
+
+    Вместо цепочки фильтров вида lambda c: c.data.startswith(...) префикс и
+    первое поле callback data ищутся в словаре за O(1), данные распаковываются
+    один раз и передаются хэндлеру аргументом callback_data.
+
+    Пример:
+        actions = CallbackActions(router)
+
+        @actions(WorkCallback, WorkAction.VIEW)
+        async def view_work(callback: CallbackQuery, callback_data: WorkCallback): ...
+    """
+
+    def __init__(self, router: Router):
+        self._actions: dict[tuple[str, Optional[str]], tuple[type[CallbackData], CallableObject]] = {}
+        router.callback_query.register(self._dispatch, self._match)
+
+    def __call__(self, factory: type[CallbackData], action: Optional[Enum] = None) -> Callable:
+        """Регистрирует хэндлер для префикса factory (и действия, если указано)"""
+        key = (factory.__prefix__, action.value if action is not None else None)
+
+        def decorator(callback: Callable) -> Callable:
+            self._actions[key] = (factory, CallableObject(callback))
+            return callback
+        return decorator
+
+    def _match(self, callback: CallbackQuery) -> Union[bool, dict[str, Any]]:
+        prefix, _, rest = (callback.data or "").partition(":")
+        entry = self._actions.get((prefix, rest.partition(":")[0])) or self._actions.get((prefix, None))
+        if entry is None:
+            return False
+        factory, handler = entry
+        try:
+            callback_data = factory.unpack(callback.data)
+        except (TypeError, ValueError):
+            return False
+        return {"callback_data": callback_data, "action_handler": handler}
+
+    @staticmethod
+    async def _dispatch(callback: CallbackQuery, action_handler: CallableObject, **data: Any) -> Any:
+        return await action_handler.call(callback, **data)
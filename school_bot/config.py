@@ -2,4 +2,29 @@ BOT_TOKEN = "your_token"
 DIRECTOR_USERNAME = "your_username"  # Без @
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 BOT_USERNAME = "your_bot_username" # Без @
-SCHOOL_URL = "your_school_url"
\ No newline at end of file
+SCHOOL_URL = "your_school_url"
+ARCHIVE_DIR = None  # Папка для локального архива работ, например "archive" (None - архив выключен)
+ARCHIVE_CONCURRENCY = 3  # Сколько файлов архивировать одновременно
+METRICS_PORT = None  # Порт HTTP-эндпоинта /metrics (None - выключен)
+METRICS_LOG_INTERVAL = 300  # Как часто писать сводку метрик в лог, секунд (0 - не писать)
+DB_DEBUG = False  # Журнал медленных запросов и планов EXPLAIN QUERY PLAN
+SLOW_QUERY_MS = 100  # Порог медленного запроса, мс
+SEND_GLOBAL_RATE = 28  # Сообщений в секунду на весь бот (лимит Telegram - около 30)
+SEND_CHAT_RATE = 1  # Сообщений в секунду в один чат
+SEND_CHAT_BURST = 5  # Сколько сообщений подряд можно отправить в чат без ожидания
+SEND_MAX_RETRIES = 3  # Повторов после ответа 429 (retry_after)
+ROLE_CACHE_TTL = 300  # Сколько секунд помнить роль пользователя (сбрасывается при /start и добавлении учителя)
+RENDER_CACHE_SIZE = 2048  # Сколько отрендеренных шаблонов (работы, строки списков) держать в памяти
+GRADE_BATCH_SIZE = 5  # Сколько оценок из очереди проверки записывать в БД одной транзакцией
+GRADE_FLUSH_DELAY = 10  # Через сколько секунд после последней оценки записать неполную пачку
+GRADING_PREFETCH = 3  # Сколько следующих работ очереди держать загруженными заранее
+DIGEST_DAILY_HOUR = 18  # Во сколько (по местному времени) отправлять ежедневную сводку новых работ
+DIGEST_CHECK_INTERVAL = 60  # Как часто проверять, не пора ли отправить сводки, секунд
+EVENT_QUEUE_SIZE = 1000  # Сколько событий может ждать в очереди одного подписчика (дальше публикация ждет)
+EVENT_DRAIN_TIMEOUT = 10  # Сколько секунд при остановке ждать обработки оставшихся событий
+UPDATE_DEDUP_CACHE_SIZE = 10_000  # Сколько последних update_id помнить для отбрасывания повторных доставок
+UPDATE_DEDUP_WINDOW = 100_000  # update_id ниже сохраненного больше чем на столько - Telegram начал нумерацию заново
+UPDATE_MARK_SAVE_INTERVAL = 5  # Как часто сохранять в БД последний обработанный update_id, секунд
+UPDATE_CONCURRENCY = 64  # Сколько апдейтов (разных чатов) обрабатывать одновременно
+HANDLER_TIMEOUT = 30  # Сколько секунд может работать хэндлер (больше - через @flags.timeout(...))
+SLOW_HANDLER_TIMEOUT = 120  # Таймаут хэндлеров, которые качают файлы (расписание, выгрузка работ)
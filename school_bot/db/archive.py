@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from school_bot.db.database import get_db_connection
+
+
+# school_bot/db/archive.py
+
+# После стольких неудачных попыток файл больше не пытаемся архивировать
+MAX_ARCHIVE_ATTEMPTS = 5
+ARCHIVE_RETRY_DELAY = 60  # пауза перед повтором после первой неудачи, секунд; дальше удваивается
+
+# Все файлы ответов: вложения альбомов и response_file_ref старых заданий
+_RESPONSE_FILES_SQL = '''
+    SELECT assignment_id, file_ref FROM assignment_attachments
+    UNION
+    SELECT id, response_file_ref FROM assignments WHERE response_file_ref IS NOT NULL
+'''
+
+
+async def get_unarchived_response_files(limit: int = 100) -> List[Tuple[int, str, str, Optional[str]]]:
+    """Получает файлы ответов, которые еще не сохранены в локальный архив
+
+    Returns:
+        Список (file_ref, file_id, file_type, file_name)
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute(f'''
+        SELECT f.id, f.file_id, f.file_type, f.file_name
+        FROM files f
+        LEFT JOIN file_archive fa ON fa.file_ref = f.id
+        WHERE f.id IN (SELECT file_ref FROM ({_RESPONSE_FILES_SQL}))
+          AND fa.path IS NULL
+          AND COALESCE(fa.attempts, 0) < ?
+          AND (fa.retry_at IS NULL OR fa.retry_at <= datetime('now'))
+        ORDER BY f.id
+        LIMIT ?
+        ''', (MAX_ARCHIVE_ATTEMPTS, limit))
+        return await cursor.fetchall()
+
+
+async def mark_file_archived(file_ref: int, sha256: str, path: str, size: int) -> None:
+    """Отмечает файл как сохраненный в архив"""
+    async with get_db_connection() as conn:
+        await conn.execute('''
+        INSERT INTO file_archive (file_ref, sha256, path, size, archived_at, attempts, last_error)
+        VALUES (?, ?, ?, ?, ?, 1, NULL)
+        ON CONFLICT (file_ref) DO UPDATE SET
+            sha256 = excluded.sha256,
+            path = excluded.path,
+            size = excluded.size,
+            archived_at = excluded.archived_at,
+            attempts = file_archive.attempts + 1,
+            last_error = NULL
+        ''', (file_ref, sha256, path, size, datetime.now().isoformat()))
+        await conn.commit()
+
+
+async def mark_file_archive_failed(file_ref: int, error: str) -> None:
+    """Запоминает неудачную попытку архивации файла
+
+    Следующая попытка - не раньше чем через ARCHIVE_RETRY_DELAY секунд,
+    после каждой новой неудачи пауза удваивается.
+    """
+    async with get_db_connection() as conn:
+        await conn.execute('''
+        INSERT INTO file_archive (file_ref, attempts, last_error, retry_at)
+        VALUES (?, 1, ?, datetime('now', printf('+%d seconds', ?)))
+        ON CONFLICT (file_ref) DO UPDATE SET
+            attempts = file_archive.attempts + 1,
+            last_error = excluded.last_error,
+            retry_at = datetime('now', printf('+%d seconds', ? << file_archive.attempts))
+        ''', (file_ref, error[:500], ARCHIVE_RETRY_DELAY, ARCHIVE_RETRY_DELAY))
+        await conn.commit()
+
+
+async def get_archived_works(
+    teacher_username: str,
+    class_name: Optional[str] = None
+) -> List[Tuple[int, str, str, Optional[str], str, Optional[str], Optional[str], Optional[str]]]:
+    """Получает выполненные работы учителя с путями к файлам в архиве
+
+    Returns:
+        Список (assignment_id, student_username, text, response_text,
+        submitted_at, archive_path, file_type, file_name); path равен None,
+        если файла нет или он еще не заархивирован
+    """
+    class_filter = ''
+    params: tuple = (teacher_username,)
+    if class_name:
+        class_filter = 'AND a.student_username IN (SELECT student_username FROM student_classes WHERE class_name = ?)'
+        params += (class_name,)
+
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute(f'''
+        SELECT
+            a.id, a.student_username, a.text, a.response_text, a.submitted_at,
+            fa.path, f.file_type, f.file_name
+        FROM assignments a
+        LEFT JOIN ({_RESPONSE_FILES_SQL}) rf ON rf.assignment_id = a.id
+        LEFT JOIN files f ON f.id = rf.file_ref
+        LEFT JOIN file_archive fa ON fa.file_ref = rf.file_ref
+        WHERE a.teacher_username = ? AND a.status = 'submitted'
+        {class_filter}
+        ORDER BY a.student_username, a.id, rf.file_ref
+        ''', params)
+        return await cursor.fetchall()
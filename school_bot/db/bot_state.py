@@ -0,0 +1,28 @@
+from typing import Optional
+from school_bot.db.database import get_db_connection
+
+
+# school_bot/db/bot_state.py
+
+# Ключ последнего обработанного update_id (см. school_bot/dedup.py)
+UPDATE_HIGH_WATER_MARK = "update_high_water_mark"
+
+
+async def get_bot_state(key: str) -> Optional[str]:
+    """Читает значение служебного состояния бота"""
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT value FROM bot_state WHERE key = ?', (key,))
+        row = await cursor.fetchone()
+        return row[0] if row else None
+
+
+async def set_bot_state(key: str, value: str) -> None:
+    """Сохраняет значение служебного состояния бота"""
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+        INSERT INTO bot_state (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        ''', (key, value))
+        await conn.commit()
@@ -3,19 +3,32 @@ import sys
 import traceback
 from typing import List, Optional, Tuple
 import aiosqlite
+from aiogram import Bot
 from school_bot.db.database import get_db_connection
+from school_bot.db.files import FileInfo, save_file
+from school_bot.db.roles import invalidate_role_cache
+from school_bot.db.students import get_student_chat_id, get_students_in_class
+from school_bot.events import AssignmentCreated, WorkGraded, WorkSubmitted, bus
 
 from datetime import datetime
 
 
+@dataclass
+class BulkGradeResult:
+    """Итог выставления оценок списком"""
+    assignment_text: str
+    graded: list[tuple[str, Optional[int], Optional[str], int]]  # (ученик, chat_id, имя, оценка)
+    already_graded: list[str]
+    not_submitted: list[str]
+    missing: list[str]
+
+
 @dataclass
 class AssignmentData:
     teacher_username: str
     student_username: str
     assignment_text: str
-    file_id: str
-    file_type: str
-    file_name: Optional[str]
+    file: Optional[FileInfo]
     class_name: Optional[str] = None
 
 
@@ -44,6 +57,7 @@ async def register_user(
         (chat_id, username)
     )
     await conn.commit()
+    invalidate_role_cache(username)
     
 
 async def get_assignment_info(
@@ -97,35 +111,100 @@ async def get_assignment_details(
 async def update_assignment_response(
     assignment_id: int,
     response_text: str,
-    file_id: Optional[str],
-    file_type: Optional[str],
-    file_name: Optional[str]  # Оставляем параметр, но не используем в запросе
+    files: Optional[List[FileInfo]] = None,
+    student_username: Optional[str] = None
 ) -> bool:
-    """Обновляет задание с ответом ученика"""
+    """Сохраняет ответ ученика, если задание еще активно
+    
+    Проверка и запись - один условный UPDATE ... WHERE status = 'active',
+    поэтому повторная отправка (двойное нажатие, повтор апдейта) ничего не
+    меняет и возвращает False. WorkSubmitted публикуется только для первой.
+    
+    Args:
+        assignment_id: ID задания
+        response_text: Текст ответа
+        files: Файлы ответа. Первый файл также сохраняется
+            в response_file_ref для выборок с одним файлом.
+        student_username: Если указан - задание должно принадлежать этому ученику
+    """
+    files = files or []
     try:
         async with get_db_connection() as conn:
+            file_refs = [await save_file(conn, file) for file in files]
             cursor = await conn.cursor()
             await cursor.execute('''
             UPDATE assignments SET
                 status = 'submitted',
                 response_text = ?,
-                response_file_id = ?,
-                response_file_type = ?,
+                response_file_ref = ?,
                 submitted_at = ?
-            WHERE id = ?
+            WHERE id = ? AND status = 'active'
+              AND (? IS NULL OR student_username = ?)
+            RETURNING teacher_username, student_username, text
             ''', (
                 response_text,
-                file_id,
-                file_type,
+                file_refs[0] if file_refs else None,
                 datetime.now().isoformat(),
-                assignment_id
+                assignment_id,
+                student_username,
+                student_username
             ))
+            updated = await cursor.fetchone()
+            if updated is None:
+                await conn.rollback()
+                return False
+            await cursor.executemany('''
+            INSERT INTO assignment_attachments (assignment_id, file_ref)
+            VALUES (?, ?)
+            ''', [(assignment_id, file_ref) for file_ref in file_refs])
             await conn.commit()
-            return True
     except Exception as e:
         print(f"⚠ Ошибка при обновлении задания {assignment_id}: {e}")
         return False
     
+    teacher_username, student_username, assignment_text = updated
+    await bus.publish(WorkSubmitted(
+        assignment_id, teacher_username, student_username, assignment_text, response_text or "", tuple(files)
+    ))
+    return True
+
+
+async def claim_submission_notification(assignment_id: int) -> bool:
+    """Отмечает, что учителю сообщено о сданной работе; False - уже сообщали
+    
+    Отметка ставится до отправки: уведомление уходит не больше одного раза.
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+        UPDATE assignments SET teacher_notified_at = ?
+        WHERE id = ? AND teacher_notified_at IS NULL
+        ''', (datetime.now().isoformat(), assignment_id))
+        await conn.commit()
+        return cursor.rowcount > 0
+
+
+async def get_response_attachments(
+    assignment_id: int,
+    conn: Optional[aiosqlite.Connection] = None
+) -> List[Tuple[str, str, Optional[str]]]:
+    """Получает все файлы ответа ученика (file_id, file_type, file_name)"""
+    async def _fetch(connection: aiosqlite.Connection):
+        cursor = await connection.cursor()
+        await cursor.execute('''
+        SELECT f.file_id, f.file_type, f.file_name
+        FROM assignment_attachments aa
+        JOIN files f ON f.id = aa.file_ref
+        WHERE aa.assignment_id = ?
+        ORDER BY aa.id
+        ''', (assignment_id,))
+        return await cursor.fetchall()
+    
+    if conn is None:
+        async with get_db_connection() as new_conn:
+            return await _fetch(new_conn)
+    return await _fetch(conn)
+    
 
 async def get_active_assignments(
     student_username: str,
@@ -151,10 +230,11 @@ async def _fetch_assignments(
         a.teacher_username,
         a.assigned_at,
         a.deadline,
-        a.file_id,
-        a.file_type,
-        a.file_name
+        f.file_id,
+        f.file_type,
+        f.file_name
     FROM assignments a
+    LEFT JOIN files f ON f.id = a.file_ref
     WHERE a.student_username = ? AND a.status = 'active'
     ORDER BY a.assigned_at
     ''', (student_username,))
@@ -166,9 +246,7 @@ async def create_individual_assignment(
     teacher_username: str,
     student_username: str,
     assignment_text: str,
-    file_id: Optional[str] = None,
-    file_type: Optional[str] = None,
-    file_name: Optional[str] = None
+    file_ref: Optional[int] = None
 ) -> bool:
     """Создает новое индивидуальное задание"""
     try:
@@ -176,12 +254,12 @@ async def create_individual_assignment(
         await cursor.execute('''
         INSERT INTO assignments (
             teacher_username, student_username, text,
-            assignment_type, file_id, file_type, file_name,
+            assignment_type, file_ref,
             assigned_at, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'), 'active')
+        ) VALUES (?, ?, ?, ?, ?, datetime('now'), 'active')
         ''', (
             teacher_username, student_username, assignment_text,
-            'individual', file_id, file_type, file_name
+            'individual', file_ref
         ))
         return True
     except Exception as e:
@@ -195,23 +273,31 @@ async def create_class_assignment(
     student_username: str,
     class_name: str,
     assignment_text: str,
-    file_id: str,
-    file_type: str,
-    file_name: Optional[str]
+    file_ref: Optional[int],
+    class_assignment_id: Optional[int] = None
 ) -> int:
-    """Создает классное задание в БД"""
+    """Создает классное задание в БД
+    
+    class_assignment_id - id первой строки этого задания; для первой строки
+    не передается - она получает свой собственный id.
+    """
     cursor = await conn.cursor()
     await cursor.execute('''
     INSERT INTO assignments (
         teacher_username, student_username, text, 
-        assignment_type, file_id, file_type, file_name,
+        assignment_type, file_ref, class_name, class_assignment_id,
         assigned_at, status
     ) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'), 'active')
     ''', (
         teacher_username, student_username, assignment_text,
-        'class', file_id, file_type, file_name
+        'class', file_ref, class_name, class_assignment_id
     ))
-    return cursor.lastrowid
+    assignment_id = cursor.lastrowid
+    if class_assignment_id is None:
+        await cursor.execute(
+            'UPDATE assignments SET class_assignment_id = id WHERE id = ?', (assignment_id,)
+        )
+    return assignment_id
 
 
 async def update_assignment_message_id(
@@ -237,51 +323,155 @@ async def update_assignment_message_id(
     ))
 
 
-async def save_assignment_to_db(assignment: AssignmentData) -> bool:
-    """Сохраняет задание в базе данных"""
+async def add_class_assignment(
+    conn: aiosqlite.Connection,
+    teacher_username: str,
+    class_name: str,
+    assignment_text: str,
+    file: Optional[FileInfo] = None
+) -> AssignmentCreated:
+    """Создает задание для каждого ученика класса (без commit)
+    
+    Возвращает событие, которое вызывающий публикует после commit.
+    """
+    students = await get_students_in_class(conn, class_name)
+    file_ref = await save_file(conn, file) if file else None
+    class_assignment_id = None
+    for student_username, _ in students:
+        assignment_id = await create_class_assignment(
+            conn,
+            teacher_username,
+            student_username,
+            class_name,
+            assignment_text,
+            file_ref,
+            class_assignment_id
+        )
+        class_assignment_id = class_assignment_id or assignment_id
+    return AssignmentCreated(teacher_username, assignment_text, tuple(students), class_name, file)
+
+
+async def add_individual_assignment(
+    conn: aiosqlite.Connection,
+    teacher_username: str,
+    student_username: str,
+    assignment_text: str,
+    file: Optional[FileInfo] = None
+) -> Optional[AssignmentCreated]:
+    """Прикрепляет файл к активному индивидуальному заданию или создает новое (без commit)
+    
+    Возвращает событие для публикации после commit или None, если задание не сохранено.
+    """
+    file_ref = await save_file(conn, file) if file else None
+    if not await update_individual_assignment(conn, teacher_username, student_username, assignment_text, file_ref):
+        if not await create_individual_assignment(conn, teacher_username, student_username, assignment_text, file_ref):
+            return None
+    chat_id = await get_student_chat_id(conn, student_username)
+    return AssignmentCreated(teacher_username, assignment_text, ((student_username, chat_id),), file=file)
+
+
+async def save_assignment_to_db(bot: Bot, assignment: AssignmentData) -> bool:
+    """Сохраняет задание в базе данных; ученикам сообщает подписчик AssignmentCreated"""
     async with get_db_connection() as conn:
         try:
             if assignment.class_name:
                 # Для классного задания
-                from school_bot.handlers.teacher import process_class_assignment
-                await process_class_assignment(
+                event = await add_class_assignment(
                     conn,
                     assignment.teacher_username,
                     assignment.class_name,
                     assignment.assignment_text,
-                    assignment.file_id,
-                    assignment.file_type,
-                    assignment.file_name
+                    assignment.file
                 )
             else:
                 # Для индивидуального задания
-                from school_bot.handlers.teacher import process_individual_assignment
-                await process_individual_assignment(
+                event = await add_individual_assignment(
                     conn,
                     assignment.teacher_username,
                     assignment.student_username,
                     assignment.assignment_text,
-                    assignment.file_id,
-                    assignment.file_type,
-                    assignment.file_name
+                    assignment.file
                 )
+                if event is None:
+                    await conn.rollback()
+                    return False
             await conn.commit()
-            return True
         except Exception as e:
             print(f"Database error: {e}")
             return False
     
+    await bus.publish(event)
+    return True
+    
 
-async def get_class_by_name(teacher_username: str, class_name: str) -> Optional[str]:
-    """Проверяет существование класса и возвращает его оригинальное название"""
-    async with get_db_connection() as conn:
-        cursor = await conn.cursor()
+# Кэш разрешения названий классов: (teacher_username, name_key) -> оригинальное название.
+# Классы создаются только через create_new_class, который сбрасывает кэш.
+_class_name_cache: dict[tuple[str, str], str] = {}
+_CLASS_NAME_CACHE_SIZE = 1024
+
+_CLASS_NAME_QUOTES = str.maketrans('', '', '"\'«»“”„')
+
+
+def normalize_class_name(class_name: str) -> str:
+    """Приводит название класса к ключу поиска (без регистра, пробелов по краям и кавычек)"""
+    return class_name.translate(_CLASS_NAME_QUOTES).strip().casefold()
+
+
+def invalidate_class_cache(teacher_username: Optional[str] = None) -> None:
+    """Сбрасывает кэш названий классов (для учителя или полностью)"""
+    if teacher_username is None:
+        _class_name_cache.clear()
+        return
+    for key in [key for key in _class_name_cache if key[0] == teacher_username]:
+        del _class_name_cache[key]
+
+
+async def resolve_class_name(
+    teacher_username: str,
+    class_name: str,
+    conn: Optional[aiosqlite.Connection] = None
+) -> Optional[str]:
+    """Находит класс учителя по введенному названию и возвращает его оригинальное название
+    
+    Сравнение идет по нормализованному ключу (см. normalize_class_name),
+    поиск использует индекс (teacher_username, name_key) и кэшируется.
+    """
+    name_key = normalize_class_name(class_name)
+    if not name_key:
+        return None
+    
+    cache_key = (teacher_username, name_key)
+    cached = _class_name_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    async def _resolve(connection: aiosqlite.Connection) -> Optional[str]:
+        cursor = await connection.cursor()
         await cursor.execute('''
-        SELECT name FROM classes 
-        WHERE LOWER(name) = ? AND teacher_username = ?
-        ''', (class_name.lower(), teacher_username))
+        SELECT name FROM classes
+        WHERE teacher_username = ? AND name_key = ?
+        ORDER BY name
+        LIMIT 1
+        ''', (teacher_username, name_key))
         result = await cursor.fetchone()
         return result[0] if result else None
+    
+    if conn is None:
+        async with get_db_connection() as new_conn:
+            original_name = await _resolve(new_conn)
+    else:
+        original_name = await _resolve(conn)
+    
+    if original_name is not None:
+        if len(_class_name_cache) >= _CLASS_NAME_CACHE_SIZE:
+            _class_name_cache.clear()
+        _class_name_cache[cache_key] = original_name
+    return original_name
+
+
+async def get_class_by_name(teacher_username: str, class_name: str) -> Optional[str]:
+    """Проверяет существование класса и возвращает его оригинальное название"""
+    return await resolve_class_name(teacher_username, class_name)
 
 
 async def get_teacher_classes(teacher_username: str) -> List[str]:
@@ -297,34 +487,12 @@ async def get_teacher_classes(teacher_username: str) -> List[str]:
 
 async def check_class_exists(teacher_username: str, class_name: str, conn: Optional[aiosqlite.Connection] = None) -> bool:
     """Проверяет существование класса (регистронезависимо с обработкой кавычек)"""
-    # Удаляем лишние кавычки если они есть
-    cleaned_class_name = class_name.strip().replace('"', '').replace("'", "")
-    
-    async def _check(connection):
-        cursor = await connection.cursor()
-        await cursor.execute('''
-            SELECT 1 FROM classes 
-            WHERE (name = ? OR REPLACE(REPLACE(name, '"', ''), "'", '') = ?)
-            AND teacher_username = ?
-        ''', (class_name, cleaned_class_name, teacher_username))
-        return bool(await cursor.fetchone())
-    
-    if conn:
-        return await _check(conn)
-    else:
-        async with get_db_connection() as new_conn:
-            return await _check(new_conn)
+    return await resolve_class_name(teacher_username, class_name, conn) is not None
     
 
 async def check_class_exists_case_insensitive(teacher_username: str, class_name: str) -> bool:
     """Проверяет существование класса (регистронезависимо)"""
-    async with get_db_connection() as conn:
-        cursor = await conn.cursor()
-        await cursor.execute('''
-            SELECT 1 FROM classes 
-            WHERE LOWER(name) = LOWER(?) AND teacher_username = ?
-        ''', (class_name, teacher_username))
-        return bool(await cursor.fetchone())
+    return await resolve_class_name(teacher_username, class_name) is not None
 
 
 async def create_new_class(teacher_username: str, class_name: str) -> None:
@@ -332,10 +500,11 @@ async def create_new_class(teacher_username: str, class_name: str) -> None:
     async with get_db_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute('''
-            INSERT INTO classes (name, teacher_username)
-            VALUES (?, ?)
-        ''', (class_name, teacher_username))
+            INSERT INTO classes (name, teacher_username, name_key)
+            VALUES (?, ?, ?)
+        ''', (class_name, teacher_username, normalize_class_name(class_name)))
         await conn.commit()
+    invalidate_class_cache(teacher_username)
 
 
 async def get_submitted_work_details(work_id: int, teacher_username: str) -> Optional[tuple]:
@@ -345,15 +514,16 @@ async def get_submitted_work_details(work_id: int, teacher_username: str) -> Opt
         await cursor.execute('''
             SELECT 
                 a.id, s.username, s.name, a.text, a.response_text, 
-                a.response_file_id, a.submitted_at, a.grade
+                f.file_id, a.submitted_at, a.grade, f.file_type
             FROM assignments a
             JOIN students s ON a.student_username = s.username
+            LEFT JOIN files f ON f.id = a.response_file_ref
             WHERE a.id = ? AND a.teacher_username = ? AND a.status = 'submitted'
         ''', (work_id, teacher_username))
         return await cursor.fetchone()
     
 
-async def get_submitted_works(teacher_username: str, limit: int = 50) -> list[tuple]:
+async def get_submitted_works(teacher_username: str, limit: int = 50, offset: int = 0) -> list[tuple]:
     """Получает список выполненных работ для учителя"""
     async with get_db_connection() as conn:
         cursor = await conn.cursor()
@@ -364,8 +534,8 @@ async def get_submitted_works(teacher_username: str, limit: int = 50) -> list[tu
             JOIN students s ON a.student_username = s.username
             WHERE a.teacher_username = ? AND a.status = 'submitted'
             ORDER BY a.submitted_at DESC
-            LIMIT ?
-        ''', (teacher_username, limit))
+            LIMIT ? OFFSET ?
+        ''', (teacher_username, limit, offset))
         return await cursor.fetchall()
     
 
@@ -376,16 +546,20 @@ async def get_work_details(work_id: int) -> Optional[tuple]:
         await cursor.execute('''
             SELECT 
                 a.id, s.username, s.name, a.text, a.response_text, 
-                a.response_file_id, a.response_file_type, a.submitted_at, a.grade
+                f.file_id, f.file_type, a.submitted_at, a.grade
             FROM assignments a
             JOIN students s ON a.student_username = s.username
+            LEFT JOIN files f ON f.id = a.response_file_ref
             WHERE a.id = ?
         ''', (work_id,))
         return await cursor.fetchone()
     
 
 async def grade_assignment_work(work_id: int, grade: int) -> tuple[str, str] | None:
-    """Обновляет оценку работы и возвращает данные для уведомления (student_username, assignment_text)"""
+    """Обновляет оценку работы и возвращает (student_username, assignment_text)
+    
+    После commit публикуется WorkGraded - уведомление ученику отправляет подписчик.
+    """
     async with get_db_connection() as conn:
         cursor = await conn.cursor()
         
@@ -395,7 +569,7 @@ async def grade_assignment_work(work_id: int, grade: int) -> tuple[str, str] | N
             grade = ?,
             graded_at = datetime('now')
         WHERE id = ?
-        RETURNING student_username, text
+        RETURNING student_username, text, teacher_username
         ''', (grade, work_id))
         
         updated_work = await cursor.fetchone()
@@ -403,13 +577,170 @@ async def grade_assignment_work(work_id: int, grade: int) -> tuple[str, str] | N
         if not updated_work:
             return None
         
-        student_username, assignment_text = updated_work
+        student_username, assignment_text, teacher_username = updated_work
         await conn.commit()
-        
-        return student_username, assignment_text
+    
+    await bus.publish(WorkGraded(work_id, teacher_username, student_username, assignment_text, grade))
+    return student_username, assignment_text
+    
+
+async def get_grading_queue(
+    teacher_username: str,
+    after: Optional[tuple[str, int]] = None,
+    limit: int = 5
+) -> list[tuple]:
+    """Непроверенные работы учителя от старых к новым (по индексу idx_assignments_grading_queue)
+    
+    after - (submitted_at, id) последней уже полученной работы: следующая
+    порция читается с этого места, а не через OFFSET.
+    """
+    submitted_at, work_id = after or ('', 0)
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT 
+                a.id, s.username, s.name, a.text, a.response_text, 
+                f.file_id, a.submitted_at, a.grade, f.file_type
+            FROM assignments a
+            JOIN students s ON a.student_username = s.username
+            LEFT JOIN files f ON f.id = a.response_file_ref
+            WHERE a.teacher_username = ? AND a.status = 'submitted' AND a.grade IS NULL
+              AND (a.submitted_at, a.id) > (?, ?)
+            ORDER BY a.submitted_at, a.id
+            LIMIT ?
+        ''', (teacher_username, submitted_at, work_id, limit))
+        return await cursor.fetchall()
+    
+
+async def grade_assignment_works(grades: list[tuple[int, int]]) -> set[int]:
+    """Сохраняет пачку оценок [(grade, work_id), ...] одной транзакцией
+    
+    Работы, которые уже оценены (например, из списка работ), не меняются.
+    Возвращает id работ, оценки которых действительно сохранены.
+    """
+    if not grades:
+        return set()
+    saved = set()
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        for grade, work_id in grades:
+            await cursor.execute('''
+            UPDATE assignments SET
+                grade = ?,
+                graded_at = datetime('now')
+            WHERE id = ? AND grade IS NULL
+            ''', (grade, work_id))
+            if cursor.rowcount:
+                saved.add(work_id)
+        await conn.commit()
+    return saved
+    
+
+async def get_class_assignments(teacher_username: str, limit: int = 10) -> list[tuple]:
+    """Последние классные задания учителя: (id, класс, текст, выдано, учеников, ждут оценки)
+    
+    id - class_assignment_id задания, по нему задание находится через get_class_assignment.
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT 
+                a.class_assignment_id, MIN(a.class_name), MIN(a.text), MIN(a.assigned_at), COUNT(*),
+                SUM(a.status = 'submitted' AND a.grade IS NULL)
+            FROM assignments a
+            WHERE a.teacher_username = ? AND a.class_assignment_id IS NOT NULL
+            GROUP BY a.class_assignment_id
+            ORDER BY a.class_assignment_id DESC
+            LIMIT ?
+        ''', (teacher_username, limit))
+        return await cursor.fetchall()
+    
+
+async def get_class_assignment(assignment_id: int, teacher_username: str) -> Optional[tuple[str, str, list[tuple]]]:
+    """Классное задание по id любой его строки: (класс, текст, [(ученик, статус, оценка), ...])"""
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT class_name, text, class_assignment_id FROM assignments
+            WHERE id = ? AND teacher_username = ? AND class_assignment_id IS NOT NULL
+        ''', (assignment_id, teacher_username))
+        row = await cursor.fetchone()
+        if not row:
+            return None
+        class_name, text, class_assignment_id = row
+        await cursor.execute('''
+            SELECT student_username, status, grade FROM assignments
+            WHERE teacher_username = ? AND class_assignment_id = ?
+            ORDER BY student_username
+        ''', (teacher_username, class_assignment_id))
+        return class_name, text, await cursor.fetchall()
+    
+
+async def bulk_grade_class_assignment(
+    teacher_username: str,
+    assignment_id: int,
+    grades: dict[str, int]
+) -> Optional[BulkGradeResult]:
+    """Выставляет оценки классного задания одной транзакцией
+    
+    grades - {username ученика в нижнем регистре: оценка}. Оцениваются только
+    сданные и еще не оцененные работы; остальные ученики попадают в отчет
+    (уже оценено, не сдано, нет в задании). Проверка и запись идут в одной
+    транзакции BEGIN IMMEDIATE, так что оценку, поставленную в это время
+    из другого окна, список не перезапишет. После commit на каждую оценку
+    публикуется WorkGraded.
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('BEGIN IMMEDIATE')
+        try:
+            await cursor.execute('''
+                SELECT a2.id, a2.student_username, a2.status, a2.grade, s.chat_id, s.name, a2.text
+                FROM assignments a
+                JOIN assignments a2 ON a2.teacher_username = a.teacher_username
+                    AND a2.class_assignment_id = a.class_assignment_id
+                JOIN students s ON s.username = a2.student_username
+                WHERE a.id = ? AND a.teacher_username = ?
+            ''', (assignment_id, teacher_username))
+            rows = {row[1].lower(): row for row in await cursor.fetchall()}
+            if not rows:
+                await conn.rollback()
+                return None
+            
+            result = BulkGradeResult(next(iter(rows.values()))[6], [], [], [], [])
+            updates = []
+            for username, grade in grades.items():
+                row = rows.get(username)
+                if row is None:
+                    result.missing.append(username)
+                elif row[3] is not None:
+                    result.already_graded.append(row[1])
+                elif row[2] != 'submitted':
+                    result.not_submitted.append(row[1])
+                else:
+                    updates.append((grade, row[0]))
+                    result.graded.append((row[1], row[4], row[5], grade))
+            
+            await cursor.executemany('''
+            UPDATE assignments SET
+                grade = ?,
+                graded_at = datetime('now')
+            WHERE id = ?
+            ''', updates)
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+    
+    for (grade, work_id), (student_username, chat_id, student_name, _) in zip(updates, result.graded):
+        await bus.publish(WorkGraded(
+            work_id, teacher_username, student_username, result.assignment_text, grade, chat_id, student_name
+        ))
+    return result
     
 
 async def create_individual_assignment_db(
+    bot: Bot,
     teacher_username: str,
     student_username: str,
     assignment_text: str
@@ -417,44 +748,43 @@ async def create_individual_assignment_db(
     """Создает индивидуальное задание в БД"""
     async with get_db_connection() as conn:
         try:
-            from school_bot.handlers.teacher import process_individual_assignment
-            success, status = await process_individual_assignment(
+            event = await add_individual_assignment(
                 conn,
                 teacher_username,
                 student_username,
                 assignment_text
             )
+            if event is None:
+                await conn.rollback()
+                return False, "Ошибка при создании задания"
             await conn.commit()
-            return success, status
         except Exception as e:
             await conn.rollback()
             print(f"Ошибка при создании индивидуального задания: {e}")
             return False, "Ошибка при создании задания"
+    
+    await bus.publish(event)
+    return True, "Задание создано"
 
 
 async def create_class_assignment_db(
+    bot: Bot,
     teacher_username: str,
     class_name: str,
     assignment_text: str,
-    file_id: Optional[str] = None,
-    file_type: Optional[str] = None,
-    file_name: Optional[str] = None
+    file: Optional[FileInfo] = None
 ) -> str:
     """Создает классное задание в БД"""
     async with get_db_connection() as conn:
         try:
-            from school_bot.handlers.teacher import process_class_assignment
-            await process_class_assignment(
+            event = await add_class_assignment(
                 conn,
                 teacher_username,
                 class_name,
                 assignment_text,
-                file_id,
-                file_type,
-                file_name
+                file
             )
             await conn.commit()
-            return f"Задание для класса {class_name} успешно создано!"
         except Exception as e:
             await conn.rollback()
             
@@ -483,18 +813,14 @@ async def create_class_assignment_db(
             
             return user_error_msg
     
+    await bus.publish(event)
+    return f"Задание для класса {class_name} успешно создано!"
+    
+
 
 async def get_original_class_name(teacher_username: str, input_name: str) -> Optional[str]:
     """Возвращает оригинальное название класса (с учетом регистра)"""
-    async with get_db_connection() as conn:
-        cursor = await conn.cursor()
-        await cursor.execute('''
-            SELECT name FROM classes 
-            WHERE LOWER(TRIM(name)) = LOWER(TRIM(?)) 
-            AND teacher_username = ?
-        ''', (input_name, teacher_username))
-        result = await cursor.fetchone()
-        return result[0] if result else None
+    return await resolve_class_name(teacher_username, input_name)
     
 
 async def update_individual_assignment(
@@ -502,24 +828,20 @@ async def update_individual_assignment(
     teacher_username: str,
     student_username: str,
     assignment_text: str,
-    file_id: str,
-    file_type: str,
-    file_name: Optional[str]
+    file_ref: Optional[int]
 ) -> bool:
     """Обновляет индивидуальное задание в БД"""
     try:
         cursor = await conn.cursor()
         await cursor.execute('''
         UPDATE assignments SET
-            file_id = ?,
-            file_type = ?,
-            file_name = ?,
+            file_ref = ?,
             status = 'active'
         WHERE teacher_username = ? 
           AND student_username = ?
           AND text = ?
           AND status = 'active'
-        ''', (file_id, file_type, file_name, teacher_username, student_username, assignment_text))
+        ''', (file_ref, teacher_username, student_username, assignment_text))
         return cursor.rowcount > 0
     except Exception as e:
         print(f"Ошибка при обновлении задания: {e}")
@@ -529,14 +851,12 @@ async def update_individual_assignment(
 async def update_class_assignments(
     conn: aiosqlite.Connection,
     assignment_ids: List[int],
-    file_id: str,
-    file_type: str,
-    file_name: str
+    file_ref: int
 ) -> None:
     """Обновляет классные задания с файлом"""
     cursor = await conn.cursor()
     await cursor.executemany('''
     UPDATE assignments
-    SET file_id = ?, file_type = ?, file_name = ?
+    SET file_ref = ?
     WHERE id = ?
-    ''', [(file_id, file_type, file_name, aid) for aid in assignment_ids])
\ No newline at end of file
+    ''', [(file_ref, aid) for aid in assignment_ids])
\ No newline at end of file
@@ -1,7 +1,9 @@
 from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
 import aiosqlite
 from pathlib import Path
 from school_bot.config import DIRECTOR_USERNAME
+from school_bot.db.instrumentation import InstrumentedConnection
 
 DB_PATH = Path(__file__).parent / 'school_bot.db'
 
@@ -17,14 +19,27 @@ async def init_db():
             first_seen TEXT
         )''')
         
+        # Как присылать учителю новые работы: сразу или сводкой (см. school_bot/digest.py)
+        await _add_column_if_missing(cursor, 'teachers', 'notify_mode', "TEXT DEFAULT 'immediate'")
+        await _add_column_if_missing(cursor, 'teachers', 'last_digest_at', 'TEXT')
+        
         # Таблица классов
         await cursor.execute('''
         CREATE TABLE IF NOT EXISTS classes (
             name TEXT PRIMARY KEY,
             teacher_username TEXT,
+            name_key TEXT,
             FOREIGN KEY (teacher_username) REFERENCES teachers(username)
         )''')
         
+        # Нормализованное название класса для поиска без учета регистра и кавычек
+        if await _add_column_if_missing(cursor, 'classes', 'name_key', 'TEXT'):
+            await _backfill_class_name_keys(cursor)
+        await cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_classes_teacher_name_key
+        ON classes (teacher_username, name_key)
+        ''')
+        
         # Таблица учеников
         await cursor.execute('''
         CREATE TABLE IF NOT EXISTS students (
@@ -44,6 +59,25 @@ async def init_db():
             FOREIGN KEY (class_name) REFERENCES classes(name)
         )''')
         
+        # Ученики класса (первичный ключ начинается с student_username)
+        await cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_student_classes_class
+        ON student_classes (class_name, student_username)
+        ''')
+        
+        # Таблица файлов Telegram (один файл хранится один раз)
+        await cursor.execute('''
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_unique_id TEXT UNIQUE,
+            file_id TEXT,
+            file_type TEXT,
+            file_name TEXT,
+            mime_type TEXT,
+            file_size INTEGER,
+            updated_at TEXT
+        )''')
+        
         # Таблица заданий
         await cursor.execute('''
         CREATE TABLE IF NOT EXISTS assignments (
@@ -52,20 +86,131 @@ async def init_db():
             student_username TEXT,
             text TEXT,
             assignment_type TEXT,
-            file_id TEXT,
-            file_name TEXT,
-            file_type TEXT,
+            file_ref INTEGER,
             assigned_at TEXT,
             deadline TEXT,
             status TEXT DEFAULT 'active',
             response_text TEXT,
-            response_file_id TEXT,
-            response_file_type TEXT,
+            response_file_ref INTEGER,
             submitted_at TEXT,
             grade INTEGER,
             graded_at TEXT,
             FOREIGN KEY (teacher_username) REFERENCES teachers(username),
-            FOREIGN KEY (student_username) REFERENCES students(username)
+            FOREIGN KEY (student_username) REFERENCES students(username),
+            FOREIGN KEY (file_ref) REFERENCES files(id),
+            FOREIGN KEY (response_file_ref) REFERENCES files(id)
+        )''')
+        
+        # Когда учителю ушло уведомление о сданной работе (не больше одного на задание)
+        await _add_column_if_missing(cursor, 'assignments', 'teacher_notified_at', 'TEXT')
+        
+        # Класс, которому выдано задание
+        if await _add_column_if_missing(cursor, 'assignments', 'class_name', 'TEXT'):
+            await _backfill_assignment_class_names(cursor)
+        await cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_assignments_teacher_class
+        ON assignments (teacher_username, class_name, text)
+        ''')
+        
+        # Одно классное задание - строки учеников с одинаковым class_assignment_id
+        # (id первой строки): тексты вроде "ДЗ" повторяются, по тексту задания не различить
+        if await _add_column_if_missing(cursor, 'assignments', 'class_assignment_id', 'INTEGER'):
+            await _backfill_class_assignment_ids(cursor)
+        await cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_assignments_class_assignment
+        ON assignments (teacher_username, class_assignment_id)
+        ''')
+        
+        # Файлы ответа ученика (альбом может содержать несколько файлов)
+        await cursor.execute('''
+        CREATE TABLE IF NOT EXISTS assignment_attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            assignment_id INTEGER,
+            file_ref INTEGER,
+            FOREIGN KEY (assignment_id) REFERENCES assignments(id),
+            FOREIGN KEY (file_ref) REFERENCES files(id)
+        )''')
+        
+        # Старые БД хранили file_id прямо в заданиях - переносим в files
+        await _migrate_inline_files(cursor)
+        
+        await cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_assignment_attachments_assignment
+        ON assignment_attachments (assignment_id)
+        ''')
+        
+        # Локальный архив присланных файлов (прогресс архивации)
+        await cursor.execute('''
+        CREATE TABLE IF NOT EXISTS file_archive (
+            file_ref INTEGER PRIMARY KEY,
+            sha256 TEXT,
+            path TEXT,
+            size INTEGER,
+            archived_at TEXT,
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            FOREIGN KEY (file_ref) REFERENCES files(id)
+        )''')
+        await _add_column_if_missing(cursor, 'file_archive', 'retry_at', 'TEXT')
+        
+        await cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_assignments_student_status
+        ON assignments (student_username, status)
+        ''')
+        
+        # Сводка ученика по классам (см. get_student_class_overview) - покрывающий индекс
+        await cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_assignments_student_class
+        ON assignments (student_username, class_name, status, grade)
+        ''')
+        
+        # Очередь проверки: непроверенные работы учителя от старых к новым
+        await cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_assignments_grading_queue
+        ON assignments (teacher_username, submitted_at, id)
+        WHERE status = 'submitted' AND grade IS NULL
+        ''')
+        
+        # Полнотекстовый поиск по заданиям и ответам (см. school_bot/db/search.py).
+        # Индекс без копии текста (content='assignments'), синхронизируется триггерами.
+        # Username'ы проиндексированы (с "_" внутри слова - одним токеном),
+        # чтобы отбирать задания владельца внутри FTS
+        await cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'assignments_fts'")
+        fts_exists = await cursor.fetchone() is not None
+        await cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS assignments_fts USING fts5(
+            text, response_text, teacher_username, student_username,
+            content = 'assignments', content_rowid = 'id',
+            tokenize = "unicode61 remove_diacritics 2 tokenchars '_'",
+            prefix = '2 3'
+        )''')
+        await cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS assignments_fts_insert AFTER INSERT ON assignments BEGIN
+            INSERT INTO assignments_fts (rowid, text, response_text, teacher_username, student_username)
+            VALUES (new.id, new.text, new.response_text, new.teacher_username, new.student_username);
+        END''')
+        await cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS assignments_fts_delete AFTER DELETE ON assignments BEGIN
+            INSERT INTO assignments_fts (assignments_fts, rowid, text, response_text, teacher_username, student_username)
+            VALUES ('delete', old.id, old.text, old.response_text, old.teacher_username, old.student_username);
+        END''')
+        await cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS assignments_fts_update
+        AFTER UPDATE OF text, response_text, teacher_username, student_username ON assignments BEGIN
+            INSERT INTO assignments_fts (assignments_fts, rowid, text, response_text, teacher_username, student_username)
+            VALUES ('delete', old.id, old.text, old.response_text, old.teacher_username, old.student_username);
+            INSERT INTO assignments_fts (rowid, text, response_text, teacher_username, student_username)
+            VALUES (new.id, new.text, new.response_text, new.teacher_username, new.student_username);
+        END''')
+        if not fts_exists:
+            # Задания, сохраненные до появления индекса
+            await cursor.execute("INSERT INTO assignments_fts (assignments_fts) VALUES ('rebuild')")
+        
+        # Служебное состояние бота (например, последний обработанный update_id)
+        await cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bot_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
         )''')
         
         # Добавляем учителя по умолчанию
@@ -76,10 +221,126 @@ async def init_db():
         await conn.commit()
 
 
+async def _add_column_if_missing(cursor: aiosqlite.Cursor, table: str, column: str, definition: str) -> bool:
+    """Добавляет колонку в существующую таблицу (миграция старых БД)"""
+    await cursor.execute(f'PRAGMA table_info({table})')
+    if any(row[1] == column for row in await cursor.fetchall()):
+        return False
+    await cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+
+async def _backfill_class_name_keys(cursor: aiosqlite.Cursor) -> None:
+    """Заполняет name_key для классов, созданных до появления колонки"""
+    from school_bot.db.controllers import normalize_class_name
+
+    await cursor.execute('SELECT name FROM classes WHERE name_key IS NULL')
+    rows = await cursor.fetchall()
+    await cursor.executemany(
+        'UPDATE classes SET name_key = ? WHERE name = ?',
+        [(normalize_class_name(name), name) for (name,) in rows]
+    )
+
+
+async def _backfill_assignment_class_names(cursor: aiosqlite.Cursor) -> None:
+    """Заполняет class_name для классных заданий, выданных до появления колонки
+    
+    Класс определяется по ученику: берется его единственный класс у этого
+    учителя. Если таких классов несколько, задание остается без класса.
+    """
+    await cursor.execute('''
+    UPDATE assignments SET class_name = (
+        SELECT MIN(sc.class_name)
+        FROM student_classes sc
+        JOIN classes c ON c.name = sc.class_name
+        WHERE sc.student_username = assignments.student_username
+          AND c.teacher_username = assignments.teacher_username
+        HAVING COUNT(*) = 1
+    )
+    WHERE assignment_type = 'class' AND class_name IS NULL
+    ''')
+
+
+# Строки одного классного задания вставляются подряд - старые строки с тем же
+# текстом считаются одним заданием, если выданы не дальше этого друг от друга
+_CLASS_ASSIGNMENT_WINDOW = timedelta(minutes=1)
+
+
+async def _backfill_class_assignment_ids(cursor: aiosqlite.Cursor) -> None:
+    """Группирует классные задания, выданные до появления class_assignment_id
+    
+    Строки с одинаковыми учителем, классом и текстом идут по времени выдачи;
+    новое задание начинается после паузы больше _CLASS_ASSIGNMENT_WINDOW или
+    на ученике, который в текущем задании уже есть.
+    """
+    await cursor.execute('''
+    SELECT id, teacher_username, class_name, text, student_username, assigned_at
+    FROM assignments
+    WHERE class_name IS NOT NULL
+    ORDER BY teacher_username, class_name, text, assigned_at, id
+    ''')
+    updates = []
+    group_key, group_id, group_students, previous_at = None, None, set(), None
+    for id_, teacher, class_name, text, student, assigned_at in await cursor.fetchall():
+        try:
+            at = datetime.fromisoformat(assigned_at) if assigned_at else None
+        except ValueError:
+            at = None
+        gap = at is not None and previous_at is not None and at - previous_at > _CLASS_ASSIGNMENT_WINDOW
+        if (teacher, class_name, text) != group_key or gap or student in group_students:
+            group_key, group_id, group_students = (teacher, class_name, text), id_, set()
+        group_students.add(student)
+        previous_at = at or previous_at
+        updates.append((group_id, id_))
+    await cursor.executemany('UPDATE assignments SET class_assignment_id = ? WHERE id = ?', updates)
+
+
+async def _migrate_inline_files(cursor: aiosqlite.Cursor) -> None:
+    """Переносит file_id из assignments/assignment_attachments в таблицу files
+    
+    file_unique_id для старых записей неизвестен, поэтому они получают
+    ключ 'legacy:<file_id>'. После переноса старые колонки удаляются.
+    """
+    inline_columns = {
+        'assignments': [
+            ('file_ref', 'file_id', 'file_type', 'file_name'),
+            ('response_file_ref', 'response_file_id', 'response_file_type', None),
+        ],
+        'assignment_attachments': [
+            ('file_ref', 'file_id', 'file_type', 'file_name'),
+        ],
+    }
+    
+    for table, mappings in inline_columns.items():
+        await cursor.execute(f'PRAGMA table_info({table})')
+        columns = {row[1] for row in await cursor.fetchall()}
+        if not any(file_id_col in columns for _, file_id_col, _, _ in mappings):
+            continue
+        
+        for ref_col, file_id_col, type_col, name_col in mappings:
+            await _add_column_if_missing(cursor, table, ref_col, 'INTEGER')
+            name_expr = name_col or 'NULL'
+            await cursor.execute(f'''
+            INSERT OR IGNORE INTO files (file_unique_id, file_id, file_type, file_name, updated_at)
+            SELECT 'legacy:' || {file_id_col}, {file_id_col}, {type_col}, {name_expr}, datetime('now')
+            FROM {table}
+            WHERE {file_id_col} IS NOT NULL
+            ''')
+            await cursor.execute(f'''
+            UPDATE {table} SET {ref_col} = (
+                SELECT f.id FROM files f WHERE f.file_unique_id = 'legacy:' || {table}.{file_id_col}
+            )
+            WHERE {file_id_col} IS NOT NULL
+            ''')
+            for column in (file_id_col, type_col, name_col):
+                if column:
+                    await cursor.execute(f'ALTER TABLE {table} DROP COLUMN {column}')
+
+
 @asynccontextmanager
 async def get_db_connection():
     conn = await aiosqlite.connect(DB_PATH)
     try:
-        yield conn
+        yield InstrumentedConnection(conn)
     finally:
         await conn.close()
\ No newline at end of file
@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Union
+import aiosqlite
+from aiogram.types import Document, PhotoSize
+
+from school_bot.config import MAX_FILE_SIZE
+
+
+# school_bot/db/files.py
+
+
+@dataclass
+class FileInfo:
+    """Метаданные файла Telegram (без скачивания содержимого)"""
+    file_unique_id: str
+    file_id: str
+    file_type: str
+    file_name: Optional[str] = None
+    mime_type: Optional[str] = None
+    file_size: Optional[int] = None
+
+
+async def save_file(conn: aiosqlite.Connection, file: FileInfo) -> int:
+    """Сохраняет файл в таблице files и возвращает его id
+
+    Файл определяется по file_unique_id: повторная отправка того же файла
+    не создает новую запись, а только обновляет актуальный file_id.
+    """
+    cursor = await conn.cursor()
+    await cursor.execute('''
+    INSERT INTO files (
+        file_unique_id, file_id, file_type, file_name,
+        mime_type, file_size, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (file_unique_id) DO UPDATE SET
+        file_id = excluded.file_id,
+        file_name = COALESCE(excluded.file_name, files.file_name),
+        mime_type = COALESCE(excluded.mime_type, files.mime_type),
+        file_size = COALESCE(excluded.file_size, files.file_size),
+        updated_at = excluded.updated_at
+    RETURNING id
+    ''', (
+        file.file_unique_id, file.file_id, file.file_type, file.file_name,
+        file.mime_type, file.file_size, datetime.now().isoformat()
+    ))
+    row = await cursor.fetchone()
+    return row[0]
+
+
+async def get_file_info(message: Union[Document, PhotoSize]) -> FileInfo:
+    """Извлекает информацию о файле из сообщения
+    
+    Размер проверяется по метаданным Telegram, файл не скачивается.
+    """
+    if message.file_size and message.file_size > MAX_FILE_SIZE:
+        raise ValueError(f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE//1024//1024}MB")
+    
+    if isinstance(message, Document):
+        return FileInfo(
+            file_unique_id=message.file_unique_id,
+            file_id=message.file_id,
+            file_type="document",
+            file_name=message.file_name,
+            mime_type=message.mime_type,
+            file_size=message.file_size
+        )
+    else:  # Photo
+        return FileInfo(
+            file_unique_id=message.file_unique_id,
+            file_id=message.file_id,
+            file_type="photo",
+            mime_type="image/jpeg",
+            file_size=message.file_size
+        )
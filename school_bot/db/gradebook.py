@@ -0,0 +1,200 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from school_bot.db.database import get_db_connection
+from school_bot.metrics import metrics
+
+
+# school_bot/db/gradebook.py
+
+# Сколько последних оценок показывать в строке и сколько брать в "недавнее" среднее
+RECENT_GRADES = 5
+TREND_WINDOW = 3
+
+
+@dataclass(frozen=True)
+class GradeStats:
+    """Оценки в одной строке дневника или табеля"""
+    graded: int
+    average: Optional[float]
+    recent_average: Optional[float]  # среднее последних TREND_WINDOW оценок
+    recent: tuple[int, ...]  # последние RECENT_GRADES оценок, от старых к новым
+
+    @property
+    def trend(self) -> float:
+        """На сколько последние оценки выше (или ниже) среднего"""
+        if self.average is None or self.recent_average is None:
+            return 0.0
+        return self.recent_average - self.average
+
+
+@dataclass(frozen=True)
+class SubjectGrades(GradeStats):
+    """Оценки ученика в классе (или за индивидуальные задания учителя)"""
+    class_name: Optional[str] = None  # None - индивидуальные задания
+    teacher_username: str = ""
+
+
+@dataclass(frozen=True)
+class StudentGrades(GradeStats):
+    """Оценки одного ученика класса"""
+    student_username: str = ""
+    student_name: Optional[str] = None
+
+
+# Окна по оценкам одной группы (w) и по ней же от новых к старым (w_desc):
+# номер оценки, количество, среднее и среднее последних TREND_WINDOW оценок
+_GRADE_WINDOWS = f'''
+    ROW_NUMBER() OVER w_desc AS rn,
+    COUNT(*) OVER w AS graded,
+    AVG(a.grade) OVER w AS average,
+    AVG(a.grade) OVER (w_desc ROWS BETWEEN CURRENT ROW AND {TREND_WINDOW - 1} FOLLOWING) AS recent_average
+'''
+
+
+def _group_grades(rows: list[tuple], key_size: int) -> dict[tuple, tuple[int, Optional[float], Optional[float], tuple[int, ...]]]:
+    """Собирает строки запроса (ключ..., graded, average, recent_average, grade, rn) по ключу
+
+    Строки ключа идут от старых оценок к новым, так что последняя (rn = 1)
+    несет среднее последних оценок. Ключ без оценок (LEFT JOIN) - пустая строка.
+    """
+    groups: dict[tuple, tuple[int, Optional[float], Optional[float], tuple[int, ...]]] = {}
+    for row in rows:
+        key = row[:key_size]
+        graded, average, recent_average, grade, _ = row[key_size:]
+        recent = groups[key][3] if key in groups else ()
+        if grade is not None:
+            recent += (grade,)
+        groups[key] = (graded or 0, average, recent_average, recent)
+    return groups
+
+
+# username -> дневник. Сбрасывается подписчиком WorkGraded (см. handlers/student.py)
+_grade_book_cache: OrderedDict[str, tuple[SubjectGrades, ...]] = OrderedDict()
+_GRADE_BOOK_CACHE_SIZE = 4096
+_grade_book_generation = 0  # растет при каждом сбросе
+
+
+def invalidate_grade_book(username: Optional[str] = None) -> None:
+    """Сбрасывает закэшированный дневник ученика (или всех учеников)"""
+    global _grade_book_generation
+    _grade_book_generation += 1
+    if username is None:
+        _grade_book_cache.clear()
+    else:
+        _grade_book_cache.pop(username, None)
+
+
+async def get_student_grade_book(student_username: str) -> tuple[SubjectGrades, ...]:
+    """Получает оценки ученика по классам одним запросом с оконными функциями
+
+    Для каждого класса (индивидуальные задания - отдельно по учителю):
+    количество оценок, среднее, среднее последних TREND_WINDOW оценок и
+    последние RECENT_GRADES оценок. Результат кэшируется до следующей оценки.
+    """
+    cached = _grade_book_cache.get(student_username)
+    if cached is not None:
+        _grade_book_cache.move_to_end(student_username)
+        metrics.inc("grade_book_cache_total", {"result": "hit"})
+        return cached
+    metrics.inc("grade_book_cache_total", {"result": "miss"})
+
+    generation = _grade_book_generation
+    async with get_db_connection() as conn:
+        cursor = await conn.execute(f'''
+        WITH graded AS (
+            SELECT a.class_name, a.teacher_username, a.grade, {_GRADE_WINDOWS}
+            FROM assignments a
+            WHERE a.student_username = ? AND a.status = 'submitted' AND a.grade IS NOT NULL
+            WINDOW w AS (PARTITION BY a.class_name, a.teacher_username),
+                   w_desc AS (w ORDER BY a.submitted_at DESC, a.id DESC)
+        )
+        SELECT class_name, teacher_username, graded, average, recent_average, grade, rn
+        FROM graded
+        WHERE rn <= ?
+        ORDER BY class_name IS NULL, class_name, teacher_username, rn DESC
+        ''', (student_username, RECENT_GRADES))
+        rows = await cursor.fetchall()
+
+    grade_book = tuple(
+        SubjectGrades(*stats, class_name=class_name, teacher_username=teacher)
+        for (class_name, teacher), stats in _group_grades(rows, 2).items()
+    )
+    # Пока шел запрос, дневник могли сбросить - тогда результат уже устарел
+    if generation == _grade_book_generation:
+        _grade_book_cache[student_username] = grade_book
+        while len(_grade_book_cache) > _GRADE_BOOK_CACHE_SIZE:
+            _grade_book_cache.popitem(last=False)
+    return grade_book
+
+
+async def get_class_grades(teacher_username: str, class_id: int) -> Optional[tuple[str, list[StudentGrades]]]:
+    """Получает оценки всех учеников класса одним запросом (None - класса нет у учителя)
+
+    Ученики без оценок тоже попадают в таблицу (graded = 0).
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.execute(
+            'SELECT name FROM classes WHERE rowid = ? AND teacher_username = ?',
+            (class_id, teacher_username)
+        )
+        row = await cursor.fetchone()
+        if row is None:
+            return None
+        class_name = row[0]
+        cursor = await conn.execute(f'''
+        WITH graded AS (
+            SELECT a.student_username, a.grade, {_GRADE_WINDOWS}
+            FROM assignments a
+            WHERE a.teacher_username = ? AND a.class_name = ?
+              AND a.status = 'submitted' AND a.grade IS NOT NULL
+            WINDOW w AS (PARTITION BY a.student_username),
+                   w_desc AS (w ORDER BY a.submitted_at DESC, a.id DESC)
+        )
+        SELECT sc.student_username, s.name, g.graded, g.average, g.recent_average, g.grade, g.rn
+        FROM student_classes sc
+        LEFT JOIN students s ON s.username = sc.student_username
+        LEFT JOIN graded g ON g.student_username = sc.student_username AND g.rn <= ?
+        WHERE sc.class_name = ?
+        ORDER BY sc.student_username, g.rn DESC
+        ''', (teacher_username, class_name, RECENT_GRADES, class_name))
+        rows = await cursor.fetchall()
+
+    return class_name, [
+        StudentGrades(*stats, student_username=username, student_name=name)
+        for (username, name), stats in _group_grades(rows, 2).items()
+    ]
+
+
+async def get_student_report_rows(student_username: str) -> list[tuple[Optional[str], str, str, str, int]]:
+    """Все оценки ученика для табеля: (класс, учитель, задание, дата сдачи, оценка)"""
+    async with get_db_connection() as conn:
+        cursor = await conn.execute('''
+        SELECT a.class_name, a.teacher_username, a.text, a.submitted_at, a.grade
+        FROM assignments a
+        WHERE a.student_username = ? AND a.status = 'submitted' AND a.grade IS NOT NULL
+        ORDER BY a.class_name IS NULL, a.class_name, a.teacher_username, a.submitted_at
+        ''', (student_username,))
+        return await cursor.fetchall()
+
+
+async def get_class_report_rows(teacher_username: str, class_name: str) -> list[tuple[str, int, str, str, int]]:
+    """Все оценки класса для табеля: (ученик, номер задания, задание, дата выдачи, оценка)
+
+    Номер задания - class_assignment_id: задания с одинаковым текстом остаются
+    разными столбцами. Строки учеников вставляются по одной, поэтому дата
+    выдачи - самая ранняя в задании.
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.execute('''
+        SELECT
+            a.student_username, a.class_assignment_id, a.text,
+            MIN(a.assigned_at) OVER (PARTITION BY a.class_assignment_id) AS first_assigned_at,
+            a.grade
+        FROM assignments a
+        WHERE a.teacher_username = ? AND a.class_name = ? AND a.class_assignment_id IS NOT NULL
+          AND a.status = 'submitted' AND a.grade IS NOT NULL
+        ORDER BY first_assigned_at, a.class_assignment_id, a.id
+        ''', (teacher_username, class_name))
+        return await cursor.fetchall()
@@ -0,0 +1,123 @@
+import re
+import time
+from typing import Any, Iterable, Optional
+import aiosqlite
+
+from school_bot.db.slow_queries import QueryRun, params_shape, slow_query_log
+from school_bot.metrics import metrics
+
+
+# school_bot/db/instrumentation.py
+
+_TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+(\w+)', re.IGNORECASE)
+
+
+def statement_label(sql: str) -> str:
+    """Короткая метка запроса для метрик: операция и основная таблица"""
+    words = sql.split(None, 1)
+    if not words:
+        return "other"
+    operation = words[0].upper()
+    match = _TABLE_RE.search(sql)
+    return f"{operation} {match.group(1)}" if match else operation
+
+
+class InstrumentedCursor:
+    """Обертка над aiosqlite.Cursor, замеряющая время выполнения запросов
+    
+    При включенном slow_query_log дополнительно снимает планы запросов
+    и учитывает время выборки строк (fetch*).
+    """
+
+    def __init__(self, cursor: aiosqlite.Cursor, conn: aiosqlite.Connection):
+        self._cursor = cursor
+        self._conn = conn
+        self._run: Optional[QueryRun] = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    async def _run_statement(self, sql: str, parameters: Any, many: bool) -> None:
+        debug = slow_query_log.enabled
+        if debug:
+            plan_parameters = next(iter(parameters), None) if many else parameters
+            await slow_query_log.capture_plan(self._conn, sql, plan_parameters)
+            if many:
+                parameters = list(parameters)
+        
+        start = time.perf_counter()
+        try:
+            if many:
+                await self._cursor.executemany(sql, parameters)
+            else:
+                await self._cursor.execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe("db_statement_seconds", elapsed, {"statement": statement_label(sql)})
+        
+        if debug:
+            rows = self._cursor.rowcount if self._cursor.rowcount >= 0 else None
+            self._run = slow_query_log.record(sql, params_shape(parameters, many), elapsed, rows)
+
+    async def _fetch(self, fetch, *args) -> Any:
+        if self._run is None:
+            return await fetch(*args)
+        start = time.perf_counter()
+        result = await fetch(*args)
+        if isinstance(result, list):
+            rows = len(result)
+        else:
+            rows = 0 if result is None else 1
+        slow_query_log.add_time(self._run, time.perf_counter() - start, rows)
+        return result
+
+    async def execute(self, sql: str, parameters: Optional[Iterable[Any]] = None) -> "InstrumentedCursor":
+        await self._run_statement(sql, parameters, many=False)
+        return self
+
+    async def executemany(self, sql: str, parameters: Iterable[Iterable[Any]]) -> "InstrumentedCursor":
+        await self._run_statement(sql, parameters, many=True)
+        return self
+
+    async def fetchone(self) -> Any:
+        return await self._fetch(self._cursor.fetchone)
+
+    async def fetchall(self) -> Any:
+        return await self._fetch(self._cursor.fetchall)
+
+    async def fetchmany(self, size: Optional[int] = None) -> Any:
+        if size is None:
+            return await self._fetch(self._cursor.fetchmany)
+        return await self._fetch(self._cursor.fetchmany, size)
+
+
+class InstrumentedConnection:
+    """Обертка над aiosqlite.Connection для get_db_connection
+
+    Все запросы, выполненные через execute/executemany/cursor, а также
+    commit попадают в метрику db_statement_seconds.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection):
+        self._conn = conn
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    async def cursor(self) -> InstrumentedCursor:
+        return InstrumentedCursor(await self._conn.cursor(), self._conn)
+
+    async def execute(self, sql: str, parameters: Optional[Iterable[Any]] = None) -> InstrumentedCursor:
+        cursor = await self.cursor()
+        return await cursor.execute(sql, parameters)
+
+    async def executemany(self, sql: str, parameters: Iterable[Iterable[Any]]) -> InstrumentedCursor:
+        cursor = await self.cursor()
+        return await cursor.executemany(sql, parameters)
+
+    async def commit(self) -> None:
+        start = time.perf_counter()
+        try:
+            await self._conn.commit()
+        finally:
+            metrics.observe("db_statement_seconds", time.perf_counter() - start, {"statement": "COMMIT"})
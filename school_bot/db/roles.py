@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import aiosqlite
+
+from school_bot.config import DIRECTOR_USERNAME, ROLE_CACHE_TTL
+from school_bot.db.database import get_db_connection
+
+
+# school_bot/db/roles.py
+
+DIRECTOR = "director"
+TEACHER = "teacher"
+STUDENT = "student"
+GUEST = "guest"
+
+# username -> (роль, момент проверки). Роль меняется только при регистрации
+# (/start) и добавлении учителя - там кэш сбрасывается явно, TTL страхует
+# от ручных правок БД.
+_role_cache: OrderedDict[str, tuple[str, float]] = OrderedDict()
+_ROLE_CACHE_SIZE = 4096
+
+
+def invalidate_role_cache(username: Optional[str] = None) -> None:
+    """Сбрасывает закэшированную роль пользователя (или все роли)"""
+    if username is None:
+        _role_cache.clear()
+    else:
+        _role_cache.pop(username, None)
+
+
+async def get_user_role(username: Optional[str], conn: Optional[aiosqlite.Connection] = None) -> str:
+    """Определяет роль пользователя одним запросом (с кэшированием)
+
+    Учитель и ученик считаются зарегистрированными, если у них есть chat_id
+    (как в is_user_teacher / is_user_student).
+    """
+    if not username:
+        return GUEST
+    if username == DIRECTOR_USERNAME:
+        return DIRECTOR
+
+    cached = _role_cache.get(username)
+    if cached is not None and time.monotonic() - cached[1] < ROLE_CACHE_TTL:
+        _role_cache.move_to_end(username)
+        return cached[0]
+
+    query = '''
+    SELECT
+        EXISTS (SELECT 1 FROM teachers WHERE username = ? AND chat_id IS NOT NULL),
+        EXISTS (SELECT 1 FROM students WHERE username = ? AND chat_id IS NOT NULL)
+    '''
+    if conn is None:
+        async with get_db_connection() as new_conn:
+            cursor = await new_conn.execute(query, (username, username))
+            is_teacher, is_student = await cursor.fetchone()
+    else:
+        cursor = await conn.execute(query, (username, username))
+        is_teacher, is_student = await cursor.fetchone()
+
+    role = TEACHER if is_teacher else STUDENT if is_student else GUEST
+    _role_cache[username] = (role, time.monotonic())
+    _role_cache.move_to_end(username)
+    if len(_role_cache) > _ROLE_CACHE_SIZE:
+        _role_cache.popitem(last=False)
+    return role
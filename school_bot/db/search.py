@@ -0,0 +1,122 @@
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from school_bot.db.database import get_db_connection
+
+
+# school_bot/db/search.py
+
+# Начало и конец найденного слова в сниппете. Текст сниппета еще не
+# экранирован - хэндлер экранирует его и заменяет метки на теги.
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+# Сколько слов запроса учитывать и сколько слов показывать в сниппете
+MAX_QUERY_TERMS = 8
+SNIPPET_TOKENS = 12
+
+_QUERY_TERM = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    """Найденное задание (строка assignments) со сниппетами"""
+    assignment_id: int
+    teacher_username: str
+    student_username: str
+    status: str
+    grade: Optional[int]
+    date: Optional[str]  # дата сдачи, а для несданных - дата выдачи
+    text: str  # сниппет задания
+    response: str  # сниппет ответа ("" - ответа нет)
+
+
+def _phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def build_match_query(
+    query: str,
+    teacher_username: Optional[str] = None,
+    student_username: Optional[str] = None
+) -> Optional[str]:
+    """Превращает введенный текст в запрос FTS5 по тексту задания и ответу
+    
+    Все слова должны встретиться; последнее (от двух букв) ищется как начало
+    слова - префикс только у одного слова, чтобы FTS5 не собирал в памяти
+    списки документов для нескольких префиксов.
+    
+    Синтаксис FTS5 (кавычки, NEAR, OR, *) из ввода не используется - слова
+    берутся как есть, поэтому любой ввод дает корректный запрос. Username
+    владельца добавляется фильтром по колонке, так что ранжируются только
+    его задания.
+    """
+    terms = _QUERY_TERM.findall(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    *head, last = terms
+    words = [_phrase(term) for term in head] + [_phrase(last) + ("*" if len(last) > 1 else "")]
+    match = f"{{text response_text}} : ({' '.join(words)})"
+    if teacher_username is not None:
+        match += f" AND teacher_username : {_phrase(teacher_username)}"
+    if student_username is not None:
+        match += f" AND student_username : {_phrase(student_username)}"
+    return match
+
+
+async def search_assignments(
+    query: str,
+    teacher_username: Optional[str] = None,
+    student_username: Optional[str] = None,
+    limit: int = 5,
+    offset: int = 0
+) -> tuple[list[SearchHit], int]:
+    """Ищет по текстам заданий и ответов учителя или ученика (страницу и общее количество)
+    
+    Результаты упорядочены по релевантности (bm25, совпадение в тексте
+    задания весит вдвое больше, чем в ответе).
+    """
+    match = build_match_query(query, teacher_username, student_username)
+    if match is None:
+        return [], 0
+    async with get_db_connection() as conn:
+        # Ранжирование и подсчет - по всем совпадениям, сниппеты - только для страницы
+        cursor = await conn.execute('''
+        WITH matches AS MATERIALIZED (
+            SELECT rowid, bm25(assignments_fts, 2.0, 1.0, 0.0, 0.0) AS score
+            FROM assignments_fts
+            WHERE assignments_fts MATCH ?
+        )
+        SELECT
+            a.id, a.teacher_username, a.student_username, a.status, a.grade,
+            COALESCE(a.submitted_at, a.assigned_at),
+            COUNT(*) OVER ()
+        FROM matches m
+        JOIN assignments a ON a.id = m.rowid
+        WHERE (? IS NULL OR a.teacher_username = ?)
+          AND (? IS NULL OR a.student_username = ?)
+        ORDER BY m.score, a.id DESC
+        LIMIT ? OFFSET ?
+        ''', (match, teacher_username, teacher_username, student_username, student_username, limit, offset))
+        rows = await cursor.fetchall()
+        if not rows:
+            return [], 0
+        
+        ids = [row[0] for row in rows]
+        cursor = await conn.execute(f'''
+        SELECT
+            rowid,
+            snippet(assignments_fts, 0, ?, ?, '…', ?),
+            COALESCE(snippet(assignments_fts, 1, ?, ?, '…', ?), '')
+        FROM assignments_fts
+        WHERE assignments_fts MATCH ? AND rowid IN ({", ".join("?" * len(ids))})
+        ''', (
+            HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS,
+            HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS,
+            match, *ids
+        ))
+        snippets = {rowid: (text, response) for rowid, text, response in await cursor.fetchall()}
+    
+    hits = [SearchHit(*row[:-1], *snippets.get(row[0], ("", ""))) for row in rows]
+    return hits, rows[0][-1]
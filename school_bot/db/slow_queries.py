@@ -0,0 +1,168 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Optional
+import aiosqlite
+
+from school_bot.config import DB_DEBUG, SLOW_QUERY_MS
+
+
+# school_bot/db/slow_queries.py
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+_ALIAS_RE = re.compile(r"\bassignments\s+(?:AS\s+)?(\w+)", re.IGNORECASE)
+# Полный проход по таблице; SCAN ... USING (COVERING) INDEX - проход по индексу
+_SCAN_RE = re.compile(r"^SCAN (\w+)(?!.*\bUSING (?:COVERING )?INDEX\b)")
+
+_SQL_KEYWORDS = {"WHERE", "JOIN", "LEFT", "INNER", "ON", "SET", "GROUP", "ORDER", "LIMIT", "VALUES", "USING"}
+
+
+def normalize_sql(sql: str) -> str:
+    """Приводит запрос к общему виду: литералы заменены на ?, пробелы схлопнуты"""
+    sql = _STRING_LITERAL_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _WHITESPACE_RE.sub(" ", sql).strip()
+    return _IN_LIST_RE.sub("(?...)", sql)
+
+
+def params_shape(parameters: Any, many: bool = False) -> str:
+    """Описывает параметры запроса типами, без самих значений"""
+    if many:
+        rows = list(parameters or [])
+        first = params_shape(rows[0]) if rows else "()"
+        return f"{len(rows)} x {first}"
+    if not parameters:
+        return "()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+
+
+@dataclass
+class QueryRun:
+    """Одно выполнение запроса (строки досчитываются при fetch)"""
+    sql: str
+    params: str
+    elapsed: float
+    rows: Optional[int] = None
+    logged: bool = False
+
+
+@dataclass
+class QueryStats:
+    """Накопленная статистика по нормализованному запросу"""
+    sql: str
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    slow_calls: int = 0
+    rows: int = 0
+    plan: List[str] = field(default_factory=list)
+    full_scan_assignments: bool = False
+
+
+class SlowQueryLog:
+    """Отладочный журнал медленных запросов с планами выполнения
+
+    Включается через DB_DEBUG в конфиге. Для каждого нового запроса один раз
+    снимается EXPLAIN QUERY PLAN; полный проход по таблице assignments
+    помечается отдельно. Запросы дольше порога пишутся в лог.
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, enabled: bool = False, max_slow_runs: int = 500):
+        self.threshold = threshold_ms / 1000
+        self.enabled = enabled
+        self.max_slow_runs = max_slow_runs
+        self.stats: dict[str, QueryStats] = {}
+        self.slow_runs: List[QueryRun] = []
+
+    def reset(self) -> None:
+        self.stats.clear()
+        self.slow_runs.clear()
+
+    async def capture_plan(
+        self,
+        conn: aiosqlite.Connection,
+        sql: str,
+        parameters: Optional[Iterable[Any]]
+    ) -> None:
+        """Снимает EXPLAIN QUERY PLAN при первой встрече запроса"""
+        normalized = normalize_sql(sql)
+        if normalized in self.stats:
+            return
+        stats = self.stats[normalized] = QueryStats(sql=normalized)
+        try:
+            cursor = await conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ())
+            stats.plan = [row[3] for row in await cursor.fetchall()]
+            await cursor.close()
+        except Exception as e:
+            stats.plan = [f"EXPLAIN failed: {e}"]
+            return
+
+        aliases = {"assignments"} | {
+            alias for alias in _ALIAS_RE.findall(sql) if alias.upper() not in _SQL_KEYWORDS
+        }
+        for detail in stats.plan:
+            match = _SCAN_RE.match(detail)
+            if match and match.group(1) in aliases:
+                stats.full_scan_assignments = True
+                logger.warning("Full scan of assignments: %s | plan: %s", normalized, "; ".join(stats.plan))
+                break
+
+    def record(self, sql: str, shape: str, elapsed: float, rows: Optional[int]) -> QueryRun:
+        """Учитывает выполнение запроса и возвращает его запись"""
+        normalized = normalize_sql(sql)
+        stats = self.stats.setdefault(normalized, QueryStats(sql=normalized))
+        stats.calls += 1
+        run = QueryRun(sql=normalized, params=shape, elapsed=0.0, rows=rows)
+        self.add_time(run, elapsed, rows)
+        return run
+
+    def add_time(self, run: QueryRun, elapsed: float, rows: Optional[int] = None) -> None:
+        """Добавляет время/строки (например, от fetch) к выполнению запроса"""
+        stats = self.stats[run.sql]
+        run.elapsed += elapsed
+        stats.total += elapsed
+        stats.max = max(stats.max, run.elapsed)
+        if rows:
+            run.rows = (run.rows or 0) + rows
+            stats.rows += rows
+
+        if not run.logged and run.elapsed >= self.threshold:
+            run.logged = True
+            stats.slow_calls += 1
+            if len(self.slow_runs) >= self.max_slow_runs:
+                self.slow_runs.pop(0)
+            self.slow_runs.append(run)
+            logger.warning(
+                "Slow query %.1fms rows=%s params=%s: %s",
+                run.elapsed * 1000, run.rows, run.params, run.sql
+            )
+
+    def report(self, limit: int = 20) -> str:
+        """Отчет по запросам, отсортированный по суммарному времени"""
+        ranked = sorted(self.stats.values(), key=lambda s: s.total, reverse=True)[:limit]
+        if not ranked:
+            return "Нет данных о запросах (DB_DEBUG выключен?)"
+
+        lines = []
+        for i, stats in enumerate(ranked, 1):
+            avg = stats.total / stats.calls if stats.calls else 0
+            flag = " ⚠ SCAN assignments" if stats.full_scan_assignments else ""
+            lines.append(
+                f"#{i} total={stats.total * 1000:.1f}ms calls={stats.calls} "
+                f"avg={avg * 1000:.2f}ms max={stats.max * 1000:.1f}ms "
+                f"slow={stats.slow_calls} rows={stats.rows}{flag}"
+            )
+            lines.append(f"   {stats.sql[:300]}")
+            if stats.plan:
+                lines.append(f"   plan: {'; '.join(stats.plan)}")
+        return "\n".join(lines)
+
+
+slow_query_log = SlowQueryLog(threshold_ms=SLOW_QUERY_MS, enabled=DB_DEBUG)
@@ -1,7 +1,9 @@
-from functools import lru_cache
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import List, Optional, Tuple
 import aiosqlite
 from school_bot.db.database import get_db_connection
+from school_bot.metrics import metrics
 
 
 # school_bot/db/students.py
@@ -14,9 +16,8 @@ async def student_exists(conn: aiosqlite.Connection, username: str) -> bool:
     return await cursor.fetchone() is not None
 
 
-@lru_cache(maxsize=128)
 async def is_user_student(username: str, conn: aiosqlite.Connection) -> bool:
-    """Проверяет, является ли пользователь учеником (с кэшированием)"""
+    """Проверяет, является ли пользователь учеником"""
     cursor = await conn.cursor()
     await cursor.execute(
         'SELECT 1 FROM students WHERE username = ? AND chat_id IS NOT NULL',
@@ -110,23 +111,140 @@ async def get_completed_assignments_student(student_username: str, limit: int =
         return await cursor.fetchall()
     
 
-async def get_student_classes_with_assignments(
-    conn: aiosqlite.Connection,
-    student_username: str
-) -> list[tuple[str, int]]:
-    """Получает список классов ученика с количеством активных заданий"""
-    cursor = await conn.cursor()
-    await cursor.execute('''
-    SELECT 
-        c.name,
-        (SELECT COUNT(*) FROM assignments a 
-         WHERE a.student_username = ? AND a.status = 'active' AND a.class_name = c.name) as active_count
-    FROM classes c
-    JOIN student_classes sc ON c.name = sc.class_name
+async def get_student_assignments_overview(
+    student_username: str,
+    completed_limit: int = 10
+) -> tuple[list[tuple], list[tuple]]:
+    """Получает активные и последние выполненные задания ученика одним запросом
+    
+    Returns:
+        (active, completed): активные задания в формате get_active_assignments
+        и выполненные в формате get_completed_assignments_student
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+        SELECT * FROM (
+            SELECT * FROM (
+                SELECT 
+                    'active' AS section,
+                    a.id, a.text, a.teacher_username, a.assigned_at,
+                    a.deadline, NULL AS grade,
+                    f.file_id, f.file_type, f.file_name
+                FROM assignments a
+                LEFT JOIN files f ON f.id = a.file_ref
+                WHERE a.student_username = ? AND a.status = 'active'
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT 
+                    'submitted' AS section,
+                    a.id, a.text, a.teacher_username, a.submitted_at,
+                    NULL, a.grade,
+                    NULL, NULL, NULL
+                FROM assignments a
+                WHERE a.student_username = ? AND a.status = 'submitted'
+                ORDER BY a.submitted_at DESC
+                LIMIT ?
+            )
+        )
+        -- Порядок внутри частей UNION ALL не гарантирован - сортируем снаружи:
+        -- активные от старых к новым, выполненные от новых к старым
+        ORDER BY
+            section,
+            CASE WHEN section = 'active' THEN assigned_at END,
+            assigned_at DESC,
+            id
+        ''', (student_username, student_username, completed_limit))
+        rows = await cursor.fetchall()
+    
+    active = [
+        (id_, text, teacher, assigned_at, deadline, file_id, file_type, file_name)
+        for section, id_, text, teacher, assigned_at, deadline, _, file_id, file_type, file_name in rows
+        if section == 'active'
+    ]
+    completed = [
+        (id_, text, teacher, submitted_at, grade)
+        for section, id_, text, teacher, submitted_at, _, grade, *_ in rows
+        if section == 'submitted'
+    ]
+    return active, completed
+
+
+@dataclass(frozen=True)
+class ClassOverview:
+    """Сводка по заданиям ученика в одном классе"""
+    class_name: str
+    active: int  # ждут выполнения
+    submitted: int  # сданы, ждут оценки
+    graded: int
+    average_grade: Optional[float]
+
+
+# username -> сводка по классам. Сбрасывается подписчиками шины событий
+# (новое задание, сдача, оценка, зачисление в класс) - см. handlers/student.py
+_class_overview_cache: OrderedDict[str, tuple[ClassOverview, ...]] = OrderedDict()
+_CLASS_OVERVIEW_CACHE_SIZE = 4096
+_class_overview_generation = 0  # растет при каждом сбросе
+
+
+def invalidate_class_overview(username: Optional[str] = None) -> None:
+    """Сбрасывает закэшированную сводку по классам ученика (или всех учеников)"""
+    global _class_overview_generation
+    _class_overview_generation += 1
+    if username is None:
+        _class_overview_cache.clear()
+    else:
+        _class_overview_cache.pop(username, None)
+
+
+async def get_student_class_overview(
+    student_username: str,
+    conn: Optional[aiosqlite.Connection] = None
+) -> tuple[ClassOverview, ...]:
+    """Получает классы ученика со счетчиками заданий одним сгруппированным запросом
+    
+    Задания берутся по индексу (student_username, class_name, status, grade)
+    без обращения к самой таблице; результат кэшируется до следующего
+    изменения заданий ученика.
+    """
+    cached = _class_overview_cache.get(student_username)
+    if cached is not None:
+        _class_overview_cache.move_to_end(student_username)
+        metrics.inc("class_overview_cache_total", {"result": "hit"})
+        return cached
+    metrics.inc("class_overview_cache_total", {"result": "miss"})
+    
+    generation = _class_overview_generation
+    query = '''
+    SELECT
+        sc.class_name,
+        COUNT(CASE WHEN a.status = 'active' THEN 1 END),
+        COUNT(CASE WHEN a.status = 'submitted' AND a.grade IS NULL THEN 1 END),
+        COUNT(CASE WHEN a.status = 'submitted' THEN a.grade END),
+        AVG(CASE WHEN a.status = 'submitted' THEN a.grade END)
+    FROM student_classes sc
+    LEFT JOIN assignments a
+        ON a.student_username = sc.student_username AND a.class_name = sc.class_name
     WHERE sc.student_username = ?
-    ORDER BY c.name
-    ''', (student_username, student_username))
-    return await cursor.fetchall()
+    GROUP BY sc.class_name
+    ORDER BY sc.class_name
+    '''
+    if conn is None:
+        async with get_db_connection() as new_conn:
+            cursor = await new_conn.execute(query, (student_username,))
+            rows = await cursor.fetchall()
+    else:
+        cursor = await conn.execute(query, (student_username,))
+        rows = await cursor.fetchall()
+    
+    overview = tuple(ClassOverview(*row) for row in rows)
+    # Пока шел запрос, сводку могли сбросить - тогда результат уже устарел
+    if generation == _class_overview_generation:
+        _class_overview_cache[student_username] = overview
+        while len(_class_overview_cache) > _CLASS_OVERVIEW_CACHE_SIZE:
+            _class_overview_cache.popitem(last=False)
+    return overview
 
 
 async def get_student_display_name(conn: aiosqlite.Connection, username: str) -> str:
@@ -1,9 +1,18 @@
-from typing import List, Optional, Tuple
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
 import aiosqlite
 from school_bot.config import DIRECTOR_USERNAME
 from school_bot.db.database import get_db_connection
+from school_bot.db.roles import invalidate_role_cache
 
 
+# Режимы уведомлений учителя о новых работах
+NOTIFY_IMMEDIATE = "immediate"
+NOTIFY_HOURLY = "hourly"
+NOTIFY_DAILY = "daily"
+NOTIFY_MODES = (NOTIFY_IMMEDIATE, NOTIFY_HOURLY, NOTIFY_DAILY)
+
 async def teacher_exists(conn: aiosqlite.Connection, username: str) -> bool:
     """Проверяет, существует ли учитель с таким username"""
     cursor = await conn.cursor()
@@ -20,6 +29,7 @@ async def add_teacher(conn: aiosqlite.Connection, username: str) -> bool:
             (username,)
         )
         await conn.commit()
+        invalidate_role_cache(username)
         return True
     except Exception as e:
         print(f"Error adding teacher: {e}")
@@ -65,8 +75,12 @@ async def is_user_teacher(username: str, conn: Optional[aiosqlite.Connection] =
         return False
 
 
-async def get_completed_assignments_teacher(teacher_username: str, limit: int = 100) -> tuple[list[dict], int]:
-    """Получает выполненные задания для учителя"""
+async def get_completed_assignments_teacher(
+    teacher_username: str,
+    limit: int = 100,
+    offset: int = 0
+) -> tuple[list[dict], int]:
+    """Получает выполненные задания для учителя (страницу и общее количество)"""
     async with get_db_connection() as conn:
         cursor = await conn.cursor()
         await cursor.execute('''
@@ -76,18 +90,19 @@ async def get_completed_assignments_teacher(teacher_username: str, limit: int =
                 COALESCE(s.name, s.username) as student_name,
                 a.text,
                 a.response_text,
-                a.response_file_id,
-                a.response_file_type,
+                f.file_id,
+                f.file_type,
                 a.submitted_at,
                 COALESCE(a.grade, 'не оценено') as grade,
                 COUNT(a.id) OVER() as total_count
             FROM assignments a
             JOIN students s ON a.student_username = s.username
+            LEFT JOIN files f ON f.id = a.response_file_ref
             WHERE a.teacher_username = ? 
               AND a.status = 'submitted'
             ORDER BY a.submitted_at DESC
-            LIMIT ?
-            ''', (teacher_username, limit))
+            LIMIT ? OFFSET ?
+            ''', (teacher_username, limit, offset))
         
         works = await cursor.fetchall()
         
@@ -109,24 +124,161 @@ async def get_completed_assignments_teacher(teacher_username: str, limit: int =
         return completed_works, total_count
     
 
-async def get_teacher_classes_with_students(teacher_username: str) -> List[Tuple[str, Optional[str]]]:
-    """Получает список классов учителя с учениками"""
+@dataclass(frozen=True)
+class ClassRoster:
+    """Класс учителя и сколько в нем учеников"""
+    class_id: int  # rowid в classes - короткий ключ для callback data
+    class_name: str
+    students: int
+    registered: int  # ученики, которые уже запустили бота
+
+
+async def get_teacher_class_rosters(teacher_username: str, class_id: Optional[int] = None) -> list[ClassRoster]:
+    """Получает классы учителя со счетчиками учеников (или один класс по class_id)"""
     async with get_db_connection() as conn:
-        cursor = await conn.cursor()
-        await cursor.execute('''
-        SELECT c.name, GROUP_CONCAT(s.username, ', ')
+        cursor = await conn.execute('''
+        SELECT c.rowid, c.name, COUNT(sc.student_username), COUNT(s.chat_id)
         FROM classes c
-        LEFT JOIN student_classes sc ON c.name = sc.class_name
-        LEFT JOIN students s ON sc.student_username = s.username
-        WHERE c.teacher_username = ?
-        GROUP BY c.name
-        ''', (teacher_username,))
-        return await cursor.fetchall()
+        LEFT JOIN student_classes sc ON sc.class_name = c.name
+        LEFT JOIN students s ON s.username = sc.student_username
+        WHERE c.teacher_username = ? AND (? IS NULL OR c.rowid = ?)
+        GROUP BY c.rowid
+        ORDER BY c.name
+        ''', (teacher_username, class_id, class_id))
+        return [ClassRoster(*row) for row in await cursor.fetchall()]
+
+
+async def get_class_id(teacher_username: str, class_name: str) -> Optional[int]:
+    """Номер класса (rowid в classes) для кнопок списков учеников"""
+    async with get_db_connection() as conn:
+        cursor = await conn.execute(
+            'SELECT rowid FROM classes WHERE teacher_username = ? AND name = ?',
+            (teacher_username, class_name)
+        )
+        row = await cursor.fetchone()
+        return row[0] if row else None
+
+
+async def get_class_students(
+    teacher_username: str,
+    class_id: Optional[int] = None,
+    limit: int = -1,
+    offset: int = 0
+) -> list[tuple[str, str, Optional[str], bool]]:
+    """Получает учеников классов учителя: (класс, username, имя, запустил ли бота)
     
+    class_id ограничивает выборку одним классом, limit/offset - страницей
+    (по умолчанию все ученики, для выгрузки файлом).
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.execute('''
+        SELECT c.name, sc.student_username, s.name, s.chat_id IS NOT NULL
+        FROM classes c
+        JOIN student_classes sc ON sc.class_name = c.name
+        LEFT JOIN students s ON s.username = sc.student_username
+        WHERE c.teacher_username = ? AND (? IS NULL OR c.rowid = ?)
+        ORDER BY c.name, sc.student_username
+        LIMIT ? OFFSET ?
+        ''', (teacher_username, class_id, class_id, limit, offset))
+        return [(class_name, username, name, bool(registered)) for class_name, username, name, registered in await cursor.fetchall()]
+
 
 async def get_teacher_chat_id(conn: aiosqlite.Connection, username: str) -> Optional[int]:
     """Получает chat_id учителя из БД"""
     cursor = await conn.cursor()
     await cursor.execute('SELECT chat_id FROM teachers WHERE username = ?', (username,))
     teacher_data = await cursor.fetchone()
-    return teacher_data[0] if teacher_data else None
\ No newline at end of file
+    return teacher_data[0] if teacher_data else None
+
+async def get_submission_notification_info(
+    conn: aiosqlite.Connection,
+    teacher_username: str,
+    student_username: str
+) -> Optional[tuple[Optional[int], str, str]]:
+    """Все для уведомления о сданной работе одним запросом: (chat_id учителя, режим, имя ученика)"""
+    cursor = await conn.cursor()
+    await cursor.execute('''
+    SELECT 
+        t.chat_id,
+        COALESCE(t.notify_mode, 'immediate'),
+        COALESCE((SELECT COALESCE(s.name, s.username) FROM students s WHERE s.username = ?), ?)
+    FROM teachers t
+    WHERE t.username = ?
+    ''', (student_username, student_username, teacher_username))
+    return await cursor.fetchone()
+
+
+async def get_teacher_notify_mode(username: str) -> str:
+    """Режим уведомлений учителя о новых работах"""
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT notify_mode FROM teachers WHERE username = ?', (username,))
+        row = await cursor.fetchone()
+        return row[0] if row and row[0] else NOTIFY_IMMEDIATE
+
+
+async def set_teacher_notify_mode(username: str, mode: str) -> bool:
+    """Меняет режим уведомлений; сводка будет считаться с момента переключения"""
+    if mode not in NOTIFY_MODES:
+        raise ValueError(f"Неизвестный режим уведомлений: {mode}")
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute(
+            'UPDATE teachers SET notify_mode = ?, last_digest_at = ? WHERE username = ?',
+            (mode, datetime.now().isoformat(), username)
+        )
+        await conn.commit()
+        return cursor.rowcount > 0
+
+
+async def get_due_digests(hourly_boundary: str, daily_boundary: str) -> list[tuple]:
+    """Сводки, которые пора отправить, одним сгруппированным запросом
+    
+    Граница - начало текущего часа (hourly) или время последней ежедневной
+    рассылки (daily). Учитель попадает в выборку, если его прошлая сводка
+    была раньше границы; в сводку входят непроверенные работы, сданные до нее.
+    По каждому классу возвращается (учитель, chat_id, граница, класс,
+    новых с прошлой сводки, ждут оценки); для индивидуальных заданий класс -
+    пустая строка. Время - в формате submitted_at (datetime.isoformat()).
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+        WITH due AS (
+            SELECT 
+                username,
+                chat_id,
+                COALESCE(last_digest_at, '') AS last_digest_at,
+                CASE notify_mode WHEN 'hourly' THEN ? WHEN 'daily' THEN ? END AS boundary
+            FROM teachers
+            WHERE chat_id IS NOT NULL AND notify_mode IN ('hourly', 'daily')
+        )
+        SELECT 
+            t.username,
+            t.chat_id,
+            t.boundary,
+            COALESCE(a.class_name, ''),
+            SUM(a.submitted_at > t.last_digest_at),
+            COUNT(*)
+        FROM due t
+        JOIN assignments a ON a.teacher_username = t.username
+        WHERE t.last_digest_at < t.boundary
+          AND a.status = 'submitted' AND a.grade IS NULL AND a.submitted_at < t.boundary
+        GROUP BY t.username, COALESCE(a.class_name, '')
+        ORDER BY t.username, COALESCE(a.class_name, '')
+        ''', (hourly_boundary, daily_boundary))
+        return await cursor.fetchall()
+
+
+async def mark_digests_sent(sent: list[tuple[str, str]]) -> None:
+    """Запоминает границы отправленных сводок: [(учитель, граница)]
+    
+    Следующая сводка учителя считает новыми работы, сданные после границы.
+    """
+    async with get_db_connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.executemany(
+            'UPDATE teachers SET last_digest_at = ? WHERE username = ?',
+            [(boundary, username) for username, boundary in sent]
+        )
+        await conn.commit()
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from school_bot.config import UPDATE_DEDUP_CACHE_SIZE, UPDATE_DEDUP_WINDOW, UPDATE_MARK_SAVE_INTERVAL
+from school_bot.db.bot_state import UPDATE_HIGH_WATER_MARK, get_bot_state, set_bot_state
+from school_bot.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateDedupMiddleware(BaseMiddleware):
+    """Отбрасывает повторно доставленные апдейты
+
+    - последние cache_size update_id хранятся в LRU - повтор того же апдейта
+      в этом запуске не обрабатывается второй раз;
+    - обработанный update_id раз в save_interval секунд (и при остановке)
+      сохраняется в БД: наибольший, до которого обработаны все полученные
+      апдейты. После перезапуска апдейты с id не больше сохраненного
+      считаются уже обработанными. Отметка не заходит за апдейт, который
+      еще обрабатывается, поэтому если Telegram доставит его повторно
+      (webhook после падения), он не будет отброшен. При polling Telegram
+      не присылает полученные апдейты снова - не обработанные до падения
+      теряются, и отметка этого не исправляет;
+    - повтором считается только id не дальше window ниже отметки. После
+      долгого простоя (например, каникул) Telegram может начать нумерацию
+      с меньшего значения - такой id сбрасывает отметку, а не отбрасывается.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = UPDATE_DEDUP_CACHE_SIZE,
+        save_interval: float = UPDATE_MARK_SAVE_INTERVAL,
+        window: int = UPDATE_DEDUP_WINDOW
+    ):
+        self.cache_size = cache_size
+        self.save_interval = save_interval
+        self.window = window
+        self._seen: OrderedDict[int, None] = OrderedDict()
+        self._in_flight: set[int] = set()  # получены, но еще обрабатываются
+        self._restored_mark: Optional[int] = None  # id из прошлого запуска
+        self.high_water_mark = 0
+        self._saved_mark = 0
+        self._saved_at = time.monotonic()
+        self._saving: Optional[asyncio.Task] = None
+
+    async def _restore(self) -> None:
+        try:
+            value = await get_bot_state(UPDATE_HIGH_WATER_MARK)
+        except Exception as e:
+            logger.warning("Failed to load update high-water mark: %s", e)
+            value = None
+        self._restored_mark = int(value) if value else 0
+        self.high_water_mark = max(self.high_water_mark, self._restored_mark)
+        self._saved_mark = self._restored_mark
+
+    @property
+    def processed_mark(self) -> int:
+        """Наибольший id, до которого все полученные апдейты обработаны
+
+        Апдейты, которые еще обрабатываются, в отметку не входят - их
+        повторная доставка не считается дублем.
+        """
+        if self._in_flight:
+            return min(self._in_flight) - 1
+        return self.high_water_mark
+
+    def _reset(self, update_id: int) -> None:
+        """Telegram начал нумерацию заново - старые отметки больше не действуют"""
+        logger.warning("update_id %s is far below mark %s, resetting the mark", update_id, self.high_water_mark)
+        metrics.inc("update_id_resets_total")
+        self._seen.clear()
+        self._in_flight.clear()
+        self._restored_mark = 0
+        self.high_water_mark = 0
+        self._saved_mark = 0
+        self._saved_at = float("-inf")  # новую отметку сохраняем сразу
+
+    def is_duplicate(self, update_id: int) -> bool:
+        """Проверяет апдейт и запоминает его, если он новый"""
+        if update_id in self._seen:
+            return True
+        if update_id <= self.high_water_mark - self.window:
+            self._reset(update_id)
+        elif update_id <= self._restored_mark:
+            return True
+        self._seen[update_id] = None
+        if len(self._seen) > self.cache_size:
+            self._seen.popitem(last=False)
+        self.high_water_mark = max(self.high_water_mark, update_id)
+        return False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        if self._restored_mark is None:
+            await self._restore()
+        if self.is_duplicate(event.update_id):
+            metrics.inc("updates_deduplicated_total")
+            logger.info("Skipping duplicate update %s", event.update_id)
+            return None
+        self._in_flight.add(event.update_id)
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight.discard(event.update_id)
+            self._schedule_save()
+
+    def _schedule_save(self) -> None:
+        """Сохраняет отметку в фоне не чаще раза в save_interval секунд"""
+        if self._saving is not None or time.monotonic() - self._saved_at < self.save_interval:
+            return
+        self._saving = asyncio.ensure_future(self.save())
+        self._saving.add_done_callback(lambda _: setattr(self, "_saving", None))
+
+    async def save(self) -> None:
+        """Записывает обработанный update_id (см. processed_mark) в БД"""
+        mark = self.processed_mark
+        self._saved_at = time.monotonic()
+        if mark <= self._saved_mark:
+            return
+        try:
+            await set_bot_state(UPDATE_HIGH_WATER_MARK, str(mark))
+            # Пока шла запись, отметку могли сбросить - тогда новую запишем следующей
+            if mark <= self.high_water_mark:
+                self._saved_mark = mark
+        except Exception as e:
+            logger.warning("Failed to save update high-water mark: %s", e)
+
+
+def setup_dedup(dp: Dispatcher) -> UpdateDedupMiddleware:
+    """Подключает отбрасывание повторных апдейтов (раньше остальных middleware)"""
+    dedup = UpdateDedupMiddleware()
+    dp.update.outer_middleware(dedup)
+    dp.shutdown.register(dedup.save)
+    return dedup
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from school_bot.callbacks import GradeQueueCallback, QueueAction
+from school_bot.config import DIGEST_CHECK_INTERVAL, DIGEST_DAILY_HOUR
+from school_bot.db.teachers import get_due_digests, mark_digests_sent
+from school_bot.metrics import metrics
+from school_bot.templates import TEXT_LIMIT, Template, join, truncate
+
+
+logger = logging.getLogger(__name__)
+
+DIGEST_HEADER = Template(
+    "digest_header",
+    "📬 <b>Сводка новых работ</b>\n\n"
+    "Новых работ: {new}\n"
+    "Ждут проверки: {waiting}\n\n"
+)
+DIGEST_CLASS_ROW = Template("digest_class_row", "👥 {class_name}: новых {new}, ждут {waiting}\n")
+
+# Так в сводке называются индивидуальные задания (без класса)
+INDIVIDUAL_LABEL = "Индивидуальные"
+
+
+def digest_boundaries(now: datetime, daily_hour: int = DIGEST_DAILY_HOUR) -> tuple[str, str]:
+    """Границы сводок на момент now: начало текущего часа и последняя ежедневная рассылка"""
+    hourly = now.replace(minute=0, second=0, microsecond=0)
+    daily = hourly.replace(hour=daily_hour)
+    if daily > now:
+        daily -= timedelta(days=1)
+    return hourly.isoformat(), daily.isoformat()
+
+
+def format_digest(rows: list[tuple]) -> str:
+    """Текст сводки из строк get_due_digests() одного учителя"""
+    new = sum(row[4] for row in rows)
+    waiting = sum(row[5] for row in rows)
+    class_rows = [
+        DIGEST_CLASS_ROW.render(class_name=class_name or INDIVIDUAL_LABEL, new=class_new, waiting=class_waiting)
+        for _, _, _, class_name, class_new, class_waiting in rows
+    ]
+    return truncate(DIGEST_HEADER.render(new=new, waiting=waiting) + join(class_rows, sep=""), TEXT_LIMIT)
+
+
+def digest_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(
+            text="🎯 Начать проверку",
+            callback_data=GradeQueueCallback(action=QueueAction.START, work_id=0).pack()
+        )
+    ]])
+
+
+class DigestScheduler:
+    """Сводки новых работ для учителей с режимом hourly / daily
+
+    Раз в check_interval секунд один сгруппированный запрос находит учителей,
+    у которых наступила граница сводки, и считает их непроверенные работы
+    по классам. Каждому уходит одно сообщение с кнопкой проверки по очереди.
+    Если новых работ с прошлой сводки нет, сообщение не отправляется, но
+    граница все равно запоминается.
+    """
+
+    def __init__(self, bot: Bot, check_interval: float = DIGEST_CHECK_INTERVAL, daily_hour: int = DIGEST_DAILY_HOUR):
+        self.bot = bot
+        self.check_interval = check_interval
+        self.daily_hour = daily_hour
+
+    async def run(self) -> None:
+        """Бесконечный цикл рассылки (запускается как фоновая задача)"""
+        while True:
+            try:
+                await self.send_due()
+            except Exception as e:
+                logger.error("Digest run failed: %s", e)
+            await asyncio.sleep(self.check_interval)
+
+    async def send_due(self, now: Optional[datetime] = None) -> int:
+        """Отправляет наступившие сводки и возвращает количество отправленных"""
+        hourly, daily = digest_boundaries(now or datetime.now(), self.daily_hour)
+        rows = await get_due_digests(hourly, daily)
+        if not rows:
+            return 0
+
+        sent, delivered = [], 0
+        for (teacher, chat_id, boundary), group in groupby(rows, key=lambda row: row[:3]):
+            group = list(group)
+            if sum(row[4] for row in group):
+                if not await self._send(teacher, chat_id, format_digest(group)):
+                    continue  # граница не сдвигается - попробуем в следующий раз
+                delivered += 1
+            sent.append((teacher, boundary))
+        await mark_digests_sent(sent)
+        return delivered
+
+    async def _send(self, teacher: str, chat_id: int, text: str) -> bool:
+        try:
+            await self.bot.send_message(chat_id, text, reply_markup=digest_keyboard(), parse_mode="HTML")
+        except Exception as e:
+            logger.warning("Digest for %s was not sent: %s", teacher, e)
+            metrics.inc("teacher_digests_total", {"result": "error"})
+            return False
+        metrics.inc("teacher_digests_total", {"result": "sent"})
+        return True
@@ -0,0 +1,204 @@
+import asyncio
+import contextvars
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from aiogram import Bot, Dispatcher
+
+from school_bot.config import EVENT_DRAIN_TIMEOUT, EVENT_QUEUE_SIZE
+from school_bot.db.files import FileInfo
+from school_bot.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Event:
+    """Доменное событие: публикуется после commit транзакции, которая его вызвала"""
+
+
+@dataclass(frozen=True)
+class AssignmentCreated(Event):
+    teacher_username: str
+    assignment_text: str
+    recipients: tuple[tuple[str, Optional[int]], ...]  # (ученик, chat_id)
+    class_name: Optional[str] = None  # None - индивидуальное задание
+    file: Optional[FileInfo] = None
+
+
+@dataclass(frozen=True)
+class WorkSubmitted(Event):
+    assignment_id: int
+    teacher_username: str
+    student_username: str
+    assignment_text: str
+    response_text: str = ""
+    files: tuple[FileInfo, ...] = ()
+
+
+@dataclass(frozen=True)
+class WorkGraded(Event):
+    work_id: int
+    teacher_username: str
+    student_username: str
+    assignment_text: str
+    grade: int
+    student_chat_id: Optional[int] = None  # если уже известны - уведомление не читает БД
+    student_name: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class StudentEnrolled(Event):
+    teacher_username: str
+    student_username: str
+    class_name: str
+
+
+Subscriber = Callable[[Bot, Event], Awaitable[None]]
+
+
+class _Subscription:
+    """Подписчик со своей ограниченной очередью и пулом обработчиков"""
+
+    def __init__(self, name: str, handler: Subscriber, concurrency: int, queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue[Event]] = None
+        self.workers: list[asyncio.Task] = []
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+class EventBus:
+    """Внутренняя асинхронная шина доменных событий
+
+    Код записи публикует событие после commit, а уведомления, счетчики
+    и сброс кэшей подписываются на него:
+
+        @bus.subscribe(WorkGraded, concurrency=4)
+        async def notify_student(bot: Bot, event: WorkGraded) -> None: ...
+
+    - у каждого подписчика своя очередь на queue_size событий и concurrency
+      обработчиков: медленная рассылка не задерживает ни запись, ни других
+      подписчиков, а переполненная очередь притормаживает публикацию;
+    - inline=True - подписчик вызывается прямо в publish() (дешевый сброс
+      кэша, который должен сработать до ответа пользователю);
+    - подписка на базовый класс получает все его события;
+    - после close() события доставляются сразу в publish() - так не теряются
+      публикации из обработчиков остановки (например, последняя пачка оценок).
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.bot: Optional[Bot] = None
+        self._subscriptions: dict[type[Event], list[_Subscription]] = {}
+        self._inline: dict[type[Event], list[_Subscription]] = {}
+        self._closed = False
+
+    def bind(self, bot: Bot) -> None:
+        """Бот, который получают подписчики"""
+        self.bot = bot
+        self._closed = False
+
+    def subscribe(self, *event_types: type[Event], concurrency: int = 1, inline: bool = False):
+        """Декоратор подписки на события указанных типов"""
+        def decorator(handler: Subscriber) -> Subscriber:
+            name = f"{handler.__module__.rsplit('.', 1)[-1]}.{handler.__name__}"
+            subscription = _Subscription(name, handler, concurrency, self.queue_size)
+            registry = self._inline if inline else self._subscriptions
+            for event_type in event_types:
+                registry.setdefault(event_type, []).append(subscription)
+            return handler
+        return decorator
+
+    def _matching(self, registry: dict[type[Event], list[_Subscription]], event: Event) -> list[_Subscription]:
+        return [
+            subscription
+            for event_type in type(event).__mro__ if event_type in registry
+            for subscription in registry[event_type]
+        ]
+
+    async def publish(self, event: Event) -> None:
+        """Передает событие подписчикам; вызывать после commit"""
+        for subscription in self._matching(self._inline, event):
+            await self._deliver(subscription, event)
+        for subscription in self._matching(self._subscriptions, event):
+            if self._closed:
+                await self._deliver(subscription, event)
+                continue
+            self._start(subscription)
+            await subscription.queue.put(event)
+            metrics.set("event_bus_queue_depth", subscription.queue.qsize(), {"subscriber": subscription.name})
+
+    def _start(self, subscription: _Subscription) -> None:
+        """Очередь и обработчики создаются при первой публикации в текущем цикле событий"""
+        loop = asyncio.get_running_loop()
+        if subscription.loop is not loop:
+            subscription.loop = loop
+            subscription.queue = asyncio.Queue(subscription.queue_size)
+            # Чистый контекст: обработчики не наследуют переменные апдейта,
+            # в котором случилась первая публикация (например, текущий чат)
+            subscription.workers = [
+                loop.create_task(self._work(subscription), context=contextvars.Context())
+                for _ in range(subscription.concurrency)
+            ]
+
+    async def _work(self, subscription: _Subscription) -> None:
+        while True:
+            event = await subscription.queue.get()
+            try:
+                await self._deliver(subscription, event)
+            finally:
+                subscription.queue.task_done()
+                metrics.set("event_bus_queue_depth", subscription.queue.qsize(), {"subscriber": subscription.name})
+
+    async def _deliver(self, subscription: _Subscription, event: Event) -> None:
+        start = time.perf_counter()
+        try:
+            await subscription.handler(self.bot, event)
+        except Exception as e:
+            metrics.inc("event_bus_errors_total", {"subscriber": subscription.name})
+            logger.error("Subscriber %s failed on %s: %s", subscription.name, type(event).__name__, e)
+        finally:
+            metrics.observe("event_bus_handler_seconds", time.perf_counter() - start, {"subscriber": subscription.name})
+
+    def _all(self) -> list[_Subscription]:
+        return list({id(s): s for subs in self._subscriptions.values() for s in subs}.values())
+
+    async def join(self) -> None:
+        """Ждет, пока подписчики обработают все опубликованные события"""
+        loop = asyncio.get_running_loop()
+        for subscription in self._all():
+            if subscription.loop is loop:
+                await subscription.queue.join()
+
+    async def close(self, timeout: float = EVENT_DRAIN_TIMEOUT) -> None:
+        """Дорабатывает очереди (не дольше timeout) и останавливает обработчиков"""
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Event bus closed with undelivered events")
+        self._closed = True
+        for subscription in self._all():
+            for worker in subscription.workers:
+                worker.cancel()
+            subscription.workers = []
+            subscription.loop = None
+
+
+bus = EventBus()
+
+
+@bus.subscribe(Event, inline=True)
+async def count_event(bot: Bot, event: Event) -> None:
+    metrics.inc("domain_events_total", {"event": type(event).__name__})
+
+
+def setup_events(dp: Dispatcher, bot: Bot) -> None:
+    """Подключает шину событий к боту; очереди дорабатываются при остановке"""
+    bus.bind(bot)
+    dp.shutdown.register(bus.close)
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import re
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Optional
+
+from school_bot.config import GRADE_BATCH_SIZE, GRADE_FLUSH_DELAY, GRADING_PREFETCH
+from school_bot.db.controllers import get_grading_queue, grade_assignment_works
+from school_bot.events import WorkGraded, bus
+from school_bot.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько открытых очередей (учителей) держать в памяти
+MAX_SESSIONS = 1024
+
+# Строка списка оценок: "username: 5", "@username 5", CSV "username,5" / "username;5"
+_GRADE_LINE = re.compile(r"^@?(\w+)\s*[:;,=\t ]\s*(\d+)$")
+
+
+def parse_grade_list(text: str) -> tuple[dict[str, int], list[str]]:
+    """Разбирает оценки по строке на ученика
+    
+    Возвращает {username в нижнем регистре: оценка} и список строк, которые
+    не удалось разобрать (с причиной). Пустые строки, строки с # и заголовок
+    CSV в первой строке (без цифр, например "student,grade") пропускаются.
+    """
+    grades: dict[str, int] = {}
+    errors: list[str] = []
+    lines = [line.strip() for line in text.splitlines()]
+    lines = [line for line in lines if line and not line.startswith("#")]
+    for i, line in enumerate(lines):
+        match = _GRADE_LINE.match(line)
+        if match is None:
+            if i == 0 and not any(char.isdigit() for char in line):
+                continue
+            errors.append(f"{line} - не распознано")
+            continue
+        username, grade = match.group(1).lower(), int(match.group(2))
+        if not 1 <= grade <= 5:
+            errors.append(f"{line} - оценка должна быть от 1 до 5")
+        elif username in grades:
+            errors.append(f"{line} - ученик указан повторно")
+        else:
+            grades[username] = grade
+    return grades, errors
+
+
+def work_from_row(row: tuple) -> dict:
+    """Работа из строки get_grading_queue в том же виде, что и load_work()"""
+    work_id, student, student_name, assignment, response, file_id, submitted_at, grade, file_type = row
+    return {
+        "id": work_id,
+        "student": student,
+        "student_name": student_name or student,
+        "assignment": assignment,
+        "response": response,
+        "file_id": file_id,
+        "file_type": file_type,
+        "submitted_at": submitted_at,
+        "grade": grade if grade is not None else "не оценено"
+    }
+
+
+@dataclass
+class GradingSession:
+    """Очередь проверки одного учителя"""
+    teacher: str
+    buffer: deque[dict] = field(default_factory=deque)
+    cursor: Optional[tuple[str, int]] = None  # (submitted_at, id) последней прочитанной работы
+    exhausted: bool = False
+    current: Optional[dict] = None
+    pending: list[tuple[int, dict]] = field(default_factory=list)  # (оценка, работа) до записи в БД
+    graded: int = 0
+    refill: Optional[asyncio.Task] = None
+    flush_timer: Optional[asyncio.TimerHandle] = None
+
+
+class GradingQueue:
+    """Проверка работ по очереди: работа -> оценка -> следующая работа
+
+    - непроверенные работы читаются порциями от старых к новым по индексу,
+      с места последней прочитанной работы (без OFFSET);
+    - пока учитель смотрит работу, следующие уже подгружаются в фоне;
+    - оценки копятся в памяти и пишутся в БД пачкой (batch_size штук или
+      через flush_delay секунд после последней оценки, а также при выходе
+      из очереди и остановке бота). После записи на каждую оценку
+      публикуется WorkGraded - уведомления ученикам уходят только для
+      сохраненных оценок.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = GRADE_BATCH_SIZE,
+        flush_delay: float = GRADE_FLUSH_DELAY,
+        prefetch: int = GRADING_PREFETCH
+    ):
+        self.batch_size = batch_size
+        self.flush_delay = flush_delay
+        self.prefetch = prefetch
+        self._sessions: OrderedDict[str, GradingSession] = OrderedDict()
+        self._background: set[asyncio.Task] = set()
+
+    def session(self, teacher: str) -> Optional[GradingSession]:
+        return self._sessions.get(teacher)
+
+    async def start(self, teacher: str) -> Optional[dict]:
+        """Открывает очередь заново и возвращает первую работу (None - проверять нечего)"""
+        old = self._sessions.pop(teacher, None)
+        if old is not None:
+            await self._flush(old)
+        session = GradingSession(teacher)
+        self._sessions[teacher] = session
+        while len(self._sessions) > MAX_SESSIONS:
+            _, evicted = self._sessions.popitem(last=False)
+            self._flush_later(evicted)
+        return await self._advance(session)
+
+    async def grade(self, teacher: str, work_id: int, grade: int) -> tuple[bool, Optional[dict]]:
+        """Запоминает оценку текущей работы и возвращает (принята ли оценка, следующая работа)
+
+        Оценка не принимается, если кнопка относится не к текущей работе
+        (повторное нажатие, старое сообщение очереди).
+        """
+        session = self._sessions.get(teacher)
+        if session is None or session.current is None or session.current["id"] != work_id:
+            return False, None
+        work = session.current
+        work["grade"] = grade
+        session.pending.append((grade, work))
+        session.graded += 1
+        metrics.inc("grading_queue_grades_total")
+
+        if len(session.pending) >= self.batch_size:
+            self._flush_later(session)
+        else:
+            self._schedule_flush(session)
+        return True, await self._advance(session)
+
+    async def skip(self, teacher: str, work_id: int) -> tuple[bool, Optional[dict]]:
+        """Пропускает текущую работу (в этой очереди она больше не покажется)"""
+        session = self._sessions.get(teacher)
+        if session is None or session.current is None or session.current["id"] != work_id:
+            return False, None
+        return True, await self._advance(session)
+
+    async def stop(self, teacher: str) -> int:
+        """Закрывает очередь, сохраняет оценки и возвращает, сколько работ проверено"""
+        session = self._sessions.pop(teacher, None)
+        if session is None:
+            return 0
+        if session.refill is not None:
+            session.refill.cancel()
+        await self._flush(session)
+        return session.graded
+
+    async def close(self) -> None:
+        """Сохраняет все накопленные оценки (при остановке бота)"""
+        while self._sessions:
+            _, session = self._sessions.popitem()
+            await self._flush(session)
+        while self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    async def _advance(self, session: GradingSession) -> Optional[dict]:
+        """Следующая работа из буфера; буфер дозаполняется в фоне заранее"""
+        if not session.buffer and not session.exhausted:
+            await asyncio.shield(self._start_refill(session))
+        session.current = session.buffer.popleft() if session.buffer else None
+        if len(session.buffer) < self.prefetch and not session.exhausted:
+            self._start_refill(session)
+        return session.current
+
+    def _start_refill(self, session: GradingSession) -> asyncio.Task:
+        """Запускает подгрузку следующей порции (или возвращает уже идущую)"""
+        if session.refill is None:
+            session.refill = asyncio.ensure_future(self._refill(session))
+        return session.refill
+
+    async def _refill(self, session: GradingSession) -> None:
+        limit = self.prefetch + 1
+        try:
+            rows = await get_grading_queue(session.teacher, session.cursor, limit)
+            session.buffer.extend(work_from_row(row) for row in rows)
+            if rows:
+                session.cursor = (rows[-1][6], rows[-1][0])
+            session.exhausted = len(rows) < limit
+        except Exception as e:
+            logger.warning("Failed to load grading queue for %s: %s", session.teacher, e)
+        finally:
+            session.refill = None
+
+    def _schedule_flush(self, session: GradingSession) -> None:
+        if session.flush_timer is not None:
+            session.flush_timer.cancel()
+        loop = asyncio.get_running_loop()
+        session.flush_timer = loop.call_later(self.flush_delay, self._flush_later, session)
+
+    def _flush_later(self, session: GradingSession) -> None:
+        self._track(self._flush(session))
+
+    def _track(self, coro: Awaitable[None]) -> None:
+        """Фоновая задача, которую close() дождется при остановке"""
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _flush(self, session: GradingSession) -> None:
+        """Пишет накопленные оценки в БД одной транзакцией"""
+        if session.flush_timer is not None:
+            session.flush_timer.cancel()
+            session.flush_timer = None
+        batch, session.pending = session.pending, []
+        if not batch:
+            return
+        try:
+            saved = await grade_assignment_works([(grade, work["id"]) for grade, work in batch])
+        except Exception as e:
+            # Оценки не потеряны - вернем их в очередь на следующую запись
+            logger.error("Failed to save %d grades of %s: %s", len(batch), session.teacher, e)
+            session.pending[:0] = batch
+            self._schedule_flush(session)
+            return
+        metrics.observe("grading_queue_batch_size", len(batch))
+        if len(saved) != len(batch):
+            logger.info("%d of %d grades of %s were already set", len(batch) - len(saved), len(batch), session.teacher)
+        for grade, work in batch:
+            if work["id"] not in saved:
+                # Работу уже оценили в другом окне - ученик получил ту оценку
+                continue
+            await bus.publish(WorkGraded(work["id"], session.teacher, work["student"], work["assignment"], grade))
@@ -0,0 +1,171 @@
+import itertools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from aiogram import types, Router
+from aiogram.filters import Command, CommandObject
+
+from school_bot.callbacks import CallbackActions, SearchCallback, WorkAction, WorkCallback
+from school_bot.db.roles import DIRECTOR, STUDENT, TEACHER
+from school_bot.db.search import HIGHLIGHT_END, HIGHLIGHT_START, SearchHit, search_assignments
+from school_bot.pagination import Paginator, RenderedPage
+from school_bot.roles import RoleFilter
+from school_bot.templates import TEXT_LIMIT, Safe, Template, escape, join, shorten, truncate
+
+
+router = Router(name="search")
+router.message.filter(RoleFilter(TEACHER, DIRECTOR, STUDENT))
+router.callback_query.filter(RoleFilter(TEACHER, DIRECTOR, STUDENT))
+actions = CallbackActions(router)
+
+# Результатов на странице и сколько последних запросов помнить для кнопок
+RESULTS_PER_PAGE = 5
+MAX_SAVED_SEARCHES = 10_000
+
+
+@dataclass(frozen=True)
+class SavedSearch:
+    """Запрос /search, на который ссылаются кнопки страниц"""
+    username: str
+    query: str
+    as_teacher: bool  # учитель ищет по своим заданиям, ученик - по своим
+
+
+# search_id -> запрос. Номера начинаются с текущего времени, чтобы кнопки,
+# оставшиеся с прошлого запуска, не открыли чужой запрос
+_searches: OrderedDict[int, SavedSearch] = OrderedDict()
+_search_ids = itertools.count(int(time.time()))
+
+
+def save_search(search: SavedSearch) -> int:
+    search_id = next(_search_ids)
+    _searches[search_id] = search
+    while len(_searches) > MAX_SAVED_SEARCHES:
+        _searches.popitem(last=False)
+    return search_id
+
+
+SEARCH_HEADER = Template(
+    "search_header",
+    "🔎 <b>Поиск:</b> {query}\n"
+    "Найдено: {total} (страница {page}/{total_pages})\n\n"
+)
+SEARCH_ROW = Template("search_row", "{number}. 📝 {text}\n   {who} · {date} · {status}\n{response}\n")
+SEARCH_RESPONSE = Template("search_response", "   💬 {response}\n")
+
+
+def highlight(snippet: str) -> Safe:
+    """Экранирует сниппет и выделяет найденные слова"""
+    return Safe(escape(snippet).replace(HIGHLIGHT_START, "<b>").replace(HIGHLIGHT_END, "</b>"))
+
+
+def format_hit_status(hit: SearchHit) -> str:
+    if hit.status != "submitted":
+        return "не сдано"
+    return f"оценка: {hit.grade}" if hit.grade is not None else "на проверке"
+
+
+def format_search_hit(number: int, hit: SearchHit, as_teacher: bool) -> Safe:
+    return SEARCH_ROW.render(
+        number=number,
+        text=highlight(hit.text),
+        who=f"👤 @{hit.student_username}" if as_teacher else f"👔 @{hit.teacher_username}",
+        date=(hit.date or "")[:10],
+        status=format_hit_status(hit),
+        response=SEARCH_RESPONSE.render(response=highlight(hit.response)) if hit.response else ""
+    )
+
+
+async def render_search_page(owner: tuple[str, int], page: int) -> Optional[RenderedPage]:
+    """Страница результатов поиска (ранжирование и сниппеты - в SQLite FTS5)"""
+    username, search_id = owner
+    search = _searches.get(search_id)
+    if search is None or search.username != username:
+        return None
+    
+    hits, total = await search_assignments(
+        search.query,
+        teacher_username=username if search.as_teacher else None,
+        student_username=None if search.as_teacher else username,
+        limit=RESULTS_PER_PAGE,
+        offset=page * RESULTS_PER_PAGE
+    )
+    if not hits:
+        return None
+    
+    start_idx = page * RESULTS_PER_PAGE
+    has_next = start_idx + len(hits) < total
+    response = SEARCH_HEADER.render(
+        query=shorten(search.query, 100),
+        total=total,
+        page=page + 1,
+        total_pages=(total + RESULTS_PER_PAGE - 1) // RESULTS_PER_PAGE
+    ) + join(
+        (format_search_hit(i, hit, search.as_teacher) for i, hit in enumerate(hits, start_idx + 1)),
+        sep=""
+    )
+    
+    keyboard = []
+    if search.as_teacher:
+        # Сданную работу можно сразу открыть и оценить
+        keyboard.extend(
+            [types.InlineKeyboardButton(
+                text=f"Просмотреть работу #{i}",
+                callback_data=WorkCallback(action=WorkAction.VIEW, work_id=hit.assignment_id).pack()
+            )]
+            for i, hit in enumerate(hits, start_idx + 1) if hit.status == "submitted"
+        )
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(types.InlineKeyboardButton(
+            text="⬅️ Назад",
+            callback_data=SearchCallback(search_id=search_id, page=page - 1).pack()
+        ))
+    if has_next:
+        nav_buttons.append(types.InlineKeyboardButton(
+            text="Вперед ➡️",
+            callback_data=SearchCallback(search_id=search_id, page=page + 1).pack()
+        ))
+    if nav_buttons:
+        keyboard.append(nav_buttons)
+    
+    return RenderedPage(
+        truncate(response, TEXT_LIMIT),
+        types.InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None,
+        has_next=has_next
+    )
+
+
+search_pages = Paginator("search", render_search_page)
+
+
+@router.message(Command("search"))
+async def search_command(message: types.Message, command: CommandObject, role: str):
+    """Ищет по заданиям и ответам: /search текст"""
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer(
+            "🔎 Укажите, что искать: <code>/search дроби</code>\n\n"
+            "Ищутся слова в текстах заданий и ответов, можно вводить начало слова.",
+            parse_mode="HTML"
+        )
+        return
+    
+    username = message.from_user.username
+    search_id = save_search(SavedSearch(username, query, as_teacher=role in (TEACHER, DIRECTOR)))
+    shown = await search_pages.show(message, (username, search_id), 0, edit=False)
+    if not shown:
+        await message.answer("🔎 Ничего не найдено.")
+
+
+@actions(SearchCallback)
+async def search_page(callback: types.CallbackQuery, callback_data: SearchCallback):
+    """Страница результатов поиска"""
+    owner = (callback.from_user.username, callback_data.search_id)
+    shown = await search_pages.show(callback.message, owner, max(callback_data.page, 0))
+    if not shown:
+        await callback.answer("Результаты поиска устарели. Повторите /search")
+        return
+    await callback.answer()
@@ -1,44 +1,36 @@
 import traceback
 from typing import List, Optional, Tuple
-from aiogram import types
-from aiogram.types import Message, ContentType, ReplyKeyboardRemove, ReplyKeyboardMarkup, KeyboardButton
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
+from aiogram import types, Bot, Router, flags
+from aiogram.types import Message, ContentType, ReplyKeyboardRemove, InputMediaDocument, InputMediaPhoto
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram import F
-import httpx
 
-from school_bot.db.controllers import get_active_assignments, get_active_assignments_for_student, get_assignment_details, get_assignment_info, update_assignment_response
-from school_bot.db.students import get_completed_assignments_student, get_student_classes_with_assignments, get_student_display_name
-from school_bot.db.teachers import get_teacher_chat_id
+from school_bot.db.controllers import claim_submission_notification, get_active_assignments_for_student, get_assignment_info, update_assignment_response
+from school_bot.db.gradebook import SubjectGrades, get_student_grade_book, invalidate_grade_book
+from school_bot.db.students import ClassOverview, get_student_assignments_overview, get_student_class_overview, invalidate_class_overview
+from school_bot.db.teachers import NOTIFY_IMMEDIATE, get_submission_notification_info
 from school_bot.db.database import get_db_connection
-from school_bot.config import MAX_FILE_SIZE, SCHOOL_URL
-from main import dp, bot
-
-
+from school_bot.db.files import FileInfo, get_file_info
+from school_bot.events import AssignmentCreated, StudentEnrolled, WorkGraded, WorkSubmitted, bus
+from school_bot.config import SCHOOL_URL, SLOW_HANDLER_TIMEOUT
+from school_bot.media_groups import MediaGroupBuffer
+from school_bot.metrics import metrics
+from school_bot.keyboards import MenuButtons, get_student_cancel_menu, get_student_main_menu
+from school_bot.db.roles import STUDENT
+from school_bot.report_cards import student_report_card, trend_arrow
 from school_bot.parse import parse_school_info, parse_school_schedule
+from school_bot.roles import RoleFilter
 from school_bot.states import StudentStates
+from school_bot.templates import CAPTION_LIMIT, TEXT_LIMIT, Safe, Template, join, truncate
 
 
-def get_student_main_menu() -> ReplyKeyboardMarkup:
-    """Главное меню ученика с кнопкой информации о школе"""
-    builder = ReplyKeyboardBuilder()
-    builder.row(
-        KeyboardButton(text="📚 Мои задания"),
-        KeyboardButton(text="🏫 Мои классы")
-    )
-    builder.row(
-        KeyboardButton(text="📤 Отправить работу"),
-        KeyboardButton(text="🏛️ О школе")
-    )
-    builder.row(
-        KeyboardButton(text="🔄 Обновить"),
-        KeyboardButton(text="📅 Расписание")
-    )
-    return builder.as_markup(resize_keyboard=True)
+router = Router(name="student")
+router.message.filter(RoleFilter(STUDENT))
+menu = MenuButtons(router)
 
 
-@dp.message(F.text == "🏛️ О школе")
+@menu("🏛️ О школе")
 async def show_school_info(message: types.Message):
     """Вывод информации о школе"""
     try:
@@ -95,9 +87,12 @@ async def show_school_info(message: types.Message):
         )
 
 
-@dp.message(F.text == "📅 Расписание")
+@menu("📅 Расписание")
+@flags.timeout(SLOW_HANDLER_TIMEOUT)
 async def send_schedule(message: types.Message):
     """Отправляет пользователю все PDF с расписанием"""
+    import httpx
+
     try:
         schedules = await parse_school_schedule()
         
@@ -137,25 +132,18 @@ async def send_schedule(message: types.Message):
         )
 
 
-def get_student_cancel_menu() -> ReplyKeyboardMarkup:
-    builder = ReplyKeyboardBuilder()
-    builder.add(KeyboardButton(text="❌ Отмена"))
-    return builder.as_markup(resize_keyboard=True)
-
-
-@dp.message(F.text == "📚 Мои задания")
-async def my_assignments_button(message: types.Message):
-    await view_assignments(message)
-
-
-@dp.message(F.text == "🏫 Мои классы")
-async def my_classes_button(message: types.Message):
-    await view_classes_student(message)
-
-
-@dp.message(F.text == "📤 Отправить работу")
-async def submit_assignment_button(message: types.Message, state: FSMContext):
-    await start_submit_assignment(message, state)
+ACTIVE_ASSIGNMENT = Template(
+    "active_assignment",
+    "{number}. {text}\n"
+    "👤 От: @{teacher}\n"
+    "⌛ Срок: {deadline}\n\n"
+)
+COMPLETED_ASSIGNMENT = Template(
+    "completed_assignment",
+    "{number}. {text}\n"
+    "📅 Отправлено: {submitted_at}\n"
+    "🏷 Оценка: {grade}\n\n"
+)
 
 
 def format_assignments(
@@ -163,50 +151,44 @@ def format_assignments(
     completed_assignments: list
 ) -> str:
     """Форматирует список заданий для отображения"""
-    response = ""
+    parts = []
     
     if active_assignments:
-        response += "📋 <b>Активные задания:</b>\n\n"
+        parts.append(Safe("📋 <b>Активные задания:</b>\n\n"))
         for i, assignment in enumerate(active_assignments, 1):
             # Обрабатываем как полные, так и неполные данные
-            id_ = assignment[0]
-            text = assignment[1]
-            teacher = assignment[2]
-            assigned_at = assignment[3]
+            id_, text, teacher = assignment[:3]
             deadline = assignment[4] if len(assignment) > 4 else None
-            
-            deadline_str = deadline[:10] if deadline else "не указан"
-            response += (
-                f"{i}. {text}\n"
-                f"👤 От: @{teacher}\n"
-                f"⌛ Срок: {deadline_str}\n\n"
-            )
+            parts.append(ACTIVE_ASSIGNMENT.render_cached(
+                (id_, i), deadline,
+                number=i,
+                text=text,
+                teacher=teacher,
+                deadline=deadline[:10] if deadline else "не указан"
+            ))
     
     if completed_assignments:
-        response += "\n✅ <b>Последние выполненные задания:</b>\n"
+        parts.append(Safe("\n✅ <b>Последние выполненные задания:</b>\n"))
         for i, assignment in enumerate(completed_assignments, 1):
-            id_ = assignment[0]
-            text = assignment[1]
-            teacher = assignment[2]
-            submitted_at = assignment[3]
+            id_, text, teacher, submitted_at = assignment[:4]
             grade = assignment[4] if len(assignment) > 4 else None
-            
-            grade_str = grade if grade is not None else "ещё не оценено"
-            response += (
-                f"{i}. {text}\n"
-                f"📅 Отправлено: {submitted_at[:10]}\n"
-                f"🏷 Оценка: {grade_str}\n\n"
-            )
+            parts.append(COMPLETED_ASSIGNMENT.render_cached(
+                (id_, i), (grade, submitted_at),
+                number=i,
+                text=text,
+                submitted_at=submitted_at[:10],
+                grade=grade if grade is not None else "ещё не оценено"
+            ))
     
-    return response if response else "📭 У вас пока нет заданий."
+    return truncate(join(parts, sep=""), TEXT_LIMIT) if parts else "📭 У вас пока нет заданий."
 
 
-@dp.message(Command("my_assignments"), lambda message: str(message.from_user.username))
+@menu("📚 Мои задания")
+@router.message(Command("my_assignments"), lambda message: str(message.from_user.username))
 async def view_assignments(message: types.Message):
     student_username = message.from_user.username
     
-    active = await get_active_assignments(student_username)
-    completed = await get_completed_assignments_student(student_username)
+    active, completed = await get_student_assignments_overview(student_username)
     
     response = format_assignments(active, completed)
     
@@ -216,11 +198,52 @@ async def view_assignments(message: types.Message):
         parse_mode="HTML"
     )
 
-    await send_assignment_files(message.chat.id, active)
+    await send_assignment_files(message.bot, message.chat.id, active)
 
 
-async def send_assignment_files(chat_id: int, assignments: list):
+# Telegram принимает в sendMediaGroup от 2 до 10 файлов одного вида
+MEDIA_GROUP_LIMIT = 10
+
+
+async def send_files_batched(bot: Bot, chat_id: int, files: list[tuple[str, str, Optional[str]]]) -> None:
+    """Отправляет файлы альбомами (до 10 штук), группируя документы и фото отдельно
+    
+    Args:
+        bot: Бот, от имени которого идет отправка
+        chat_id: ID чата получателя
+        files: список (file_id, file_type, caption)
+    """
+    media_by_type = {"document": [], "photo": []}
+    for file_id, file_type, caption in files:
+        if file_type == "document":
+            media_by_type["document"].append(InputMediaDocument(media=file_id, caption=caption))
+        else:  # photo
+            media_by_type["photo"].append(InputMediaPhoto(media=file_id, caption=caption))
+    
+    for media in media_by_type.values():
+        for start in range(0, len(media), MEDIA_GROUP_LIMIT):
+            batch = media[start:start + MEDIA_GROUP_LIMIT]
+            try:
+                if len(batch) > 1:
+                    await bot.send_media_group(chat_id=chat_id, media=batch)
+                    continue
+            except Exception as e:
+                print(f"Ошибка при отправке альбома, отправляю файлы по одному: {e}")
+            
+            # Одиночный файл или неудачный альбом
+            for item in batch:
+                try:
+                    if isinstance(item, InputMediaDocument):
+                        await bot.send_document(chat_id=chat_id, document=item.media, caption=item.caption)
+                    else:
+                        await bot.send_photo(chat_id=chat_id, photo=item.media, caption=item.caption)
+                except Exception as e:
+                    print(f"Ошибка при отправке файла ({item.caption}): {e}")
+
+
+async def send_assignment_files(bot: Bot, chat_id: int, assignments: list):
     """Отправляет файлы из заданий с нумерацией"""
+    files = []
     for i, assignment in enumerate(assignments, 1):
         # Проверяем, есть ли информация о файлах в данных
         if len(assignment) >= 8:  # Если есть полные данные с файлами
@@ -229,41 +252,47 @@ async def send_assignment_files(chat_id: int, assignments: list):
             continue
             
         if file_id:
-            try:
-                caption = f"Файл к заданию {i}"
-                if file_type == "document":
-                    await bot.send_document(
-                        chat_id=chat_id,
-                        document=file_id,
-                        caption=caption
-                    )
-                else:  # photo
-                    await bot.send_photo(
-                        chat_id=chat_id,
-                        photo=file_id,
-                        caption=caption
-                    )
-            except Exception as e:
-                print(f"Ошибка при отправке файла к заданию {i}: {e}")
+            files.append((file_id, file_type, f"Файл к заданию {i}"))
+    
+    if files:
+        await send_files_batched(bot, chat_id, files)
+
+
+STUDENT_CLASS = Template("student_class", "• <b>{class_name}</b>")
+STUDENT_CLASS_STATS = Template(
+    "student_class_stats",
+    "• <b>{class_name}</b>\n   активных: {active} · на проверке: {submitted} · оценено: {graded}"
+)
+STUDENT_CLASS_AVERAGE = Template("student_class_average", " · средний балл: {average}")
+
+
+def format_class_overview(overview: ClassOverview) -> Safe:
+    """Строка класса: счетчики заданий и средний балл (если есть оценки)"""
+    if not (overview.active or overview.submitted or overview.graded):
+        return STUDENT_CLASS.render(class_name=overview.class_name)
+    row = STUDENT_CLASS_STATS.render(
+        class_name=overview.class_name,
+        active=overview.active,
+        submitted=overview.submitted,
+        graded=overview.graded
+    )
+    if overview.average_grade is not None:
+        row += STUDENT_CLASS_AVERAGE.render(average=f"{overview.average_grade:.1f}")
+    return Safe(row)
 
 
-def format_classes_response(classes: list[tuple[str, int]]) -> str:
+def format_classes_response(classes: tuple[ClassOverview, ...]) -> str:
     """Форматирует список классов для отображения"""
-    response = "🏫 <b>Ваши классы:</b>\n"
-    for class_name, active_count in classes:
-        response += f"• {class_name}"
-        if active_count > 0:
-            response += f" ({active_count} активных заданий)"
-        response += "\n"
-    return response
+    rows = join((format_class_overview(overview) for overview in classes), sep="\n\n")
+    return truncate(f"🏫 <b>Ваши классы:</b>\n\n{rows}\n", TEXT_LIMIT)
 
 
-@dp.message(Command("my_classes"), lambda message: str(message.from_user.username))
+@menu("🏫 Мои классы")
+@router.message(Command("my_classes"), lambda message: str(message.from_user.username))
 async def view_classes_student(message: types.Message):
     student_username = message.from_user.username
     
-    async with get_db_connection() as conn:
-        classes = await get_student_classes_with_assignments(conn, student_username)
+    classes = await get_student_class_overview(student_username)
     
     if not classes:
         await message.answer(
@@ -280,14 +309,81 @@ async def view_classes_student(message: types.Message):
     )
 
 
+GRADE_BOOK_ROW = Template(
+    "grade_book_row",
+    "• <b>{subject}</b> {trend}\n   оценок: {graded} · средний балл: {average} · последние: {recent}"
+)
+
+
+def format_grade_book(grade_book: tuple[SubjectGrades, ...]) -> str:
+    """Дневник: по строке на класс (индивидуальные задания - по учителю)"""
+    rows = join(
+        (
+            GRADE_BOOK_ROW.render(
+                subject=subject.class_name or f"Задания от @{subject.teacher_username}",
+                trend=trend_arrow(subject),
+                graded=subject.graded,
+                average=f"{subject.average:.1f}",
+                recent=" ".join(map(str, subject.recent))
+            )
+            for subject in grade_book
+        ),
+        sep="\n\n"
+    )
+    return truncate(f"📒 <b>Ваши оценки:</b>\n\n{rows}\n\n📄 Табель файлом: /report_card", TEXT_LIMIT)
+
+
+@menu("📒 Мои оценки")
+@router.message(Command("grades"), lambda message: str(message.from_user.username))
+async def view_grades(message: types.Message):
+    grade_book = await get_student_grade_book(message.from_user.username)
+    
+    if not grade_book:
+        await message.answer("У вас пока нет оценок.", reply_markup=get_student_main_menu())
+        return
+    
+    await message.answer(
+        format_grade_book(grade_book),
+        parse_mode="HTML",
+        reply_markup=get_student_main_menu()
+    )
+
+
+@router.message(Command("report_card"), lambda message: str(message.from_user.username))
+@flags.timeout(SLOW_HANDLER_TIMEOUT)
+async def send_report_card(message: types.Message):
+    """Отправляет табель ученика CSV-файлом"""
+    report = await student_report_card(message.from_user.username)
+    if report is None:
+        await message.answer("У вас пока нет оценок.", reply_markup=get_student_main_menu())
+        return
+    await message.answer_document(
+        types.BufferedInputFile(report, filename="report_card.csv"),
+        caption="📄 Табель: все оценки и итоги по классам"
+    )
+
+
+ASSIGNMENT_CHOICE = Template("assignment_choice", "{number}. {text} (от @{teacher})")
+SELECTED_ASSIGNMENT = Template(
+    "selected_assignment",
+    "📄 <b>Вы выбрали задание:</b>\n{text}\n\n"
+    "Пришлите текстовый ответ или файл с выполненным заданием.\n"
+    "Вы можете отправить:\n"
+    "• Текст\n"
+    "• Документ (PDF, Word)\n"
+    "• Фото"
+)
+
+
 def format_assignments_list(assignments: list[tuple[int, int, str, str, str]]) -> str:
     """Форматирует список заданий для отображения пользователю"""
-    return "\n".join(
-        f"{display_num}. {text} (от @{teacher_username})"
+    return join(
+        ASSIGNMENT_CHOICE.render(number=display_num, text=text, teacher=teacher_username)
         for display_num, _, text, teacher_username, _ in assignments
     )
 
-@dp.message(Command("submit_assignment"), lambda message: str(message.from_user.username))
+@menu("📤 Отправить работу")
+@router.message(Command("submit_assignment"), lambda message: str(message.from_user.username))
 async def start_submit_assignment(message: Message, state: FSMContext):
     student_username = message.from_user.username
     
@@ -303,9 +399,12 @@ async def start_submit_assignment(message: Message, state: FSMContext):
     
     # Формируем и отправляем список заданий
     await message.answer(
-        f"📝 <b>Ваши активные задания:</b>\n"
-        f"{format_assignments_list(active_assignments)}\n\n"
-        "Введите номер задания из списка выше:",
+        truncate(
+            f"📝 <b>Ваши активные задания:</b>\n"
+            f"{format_assignments_list(active_assignments)}\n\n"
+            "Введите номер задания из списка выше:",
+            TEXT_LIMIT
+        ),
         parse_mode="HTML",
         reply_markup=get_student_cancel_menu()
     )
@@ -318,7 +417,7 @@ async def start_submit_assignment(message: Message, state: FSMContext):
     await state.set_state(StudentStates.waiting_for_assignment_number)
 
 
-@dp.message(StudentStates.waiting_for_assignment_number, F.text.regexp(r'^\d+$'))
+@router.message(StudentStates.waiting_for_assignment_number, F.text.regexp(r'^\d+$'))
 async def process_assignment_number(message: Message, state: FSMContext):
     assignment_number = int(message.text)
     student_username = message.from_user.username
@@ -368,24 +467,19 @@ async def process_assignment_number(message: Message, state: FSMContext):
         )
         
         await message.answer(
-            f"📄 <b>Вы выбрали задание:</b>\n{assignment_text}\n\n"
-            "Пришлите текстовый ответ или файл с выполненным заданием.\n"
-            "Вы можете отправить:\n"
-            "• Текст\n"
-            "• Документ (PDF, Word)\n"
-            "• Фото",
+            truncate(SELECTED_ASSIGNMENT.render(text=assignment_text), TEXT_LIMIT),
             parse_mode="HTML",
             reply_markup=get_student_cancel_menu()
         )
         await state.set_state(StudentStates.waiting_for_assignment_response)
 
 
-@dp.message(StudentStates.waiting_for_assignment_number)
+@router.message(StudentStates.waiting_for_assignment_number)
 async def wrong_assignment_number(message: Message):
     await message.answer("❌ Пожалуйста, введите номер задания цифрами:")
 
 
-@dp.message(StudentStates.waiting_for_assignment_response, F.content_type.in_({ContentType.TEXT}))
+@router.message(StudentStates.waiting_for_assignment_response, F.content_type.in_({ContentType.TEXT}))
 async def process_text_response(message: Message, state: FSMContext):
     data = await state.get_data()
     await state.update_data(response_text=message.text)
@@ -397,71 +491,78 @@ async def process_text_response(message: Message, state: FSMContext):
     await state.set_state(StudentStates.waiting_for_file_response)
 
 
+# Ответ не сохранен: задание не найдено или уже сдано (например, повторное нажатие)
+SUBMIT_REJECTED = "❌ Задание не найдено или ответ на него уже отправлен"
+
+
 async def submit_assignment(
     student_username: str,
     assignment_id: int,
     response_text: str,
-    file_id: Optional[str],
-    file_type: Optional[str],
-    file_name: Optional[str],
-    teacher_username: str
+    files: Optional[List[FileInfo]]
 ) -> bool:
     """
     Основная бизнес-логика отправки задания
     
+    Проверка задания и запись ответа - один условный UPDATE, поэтому
+    повторный вызов (двойное нажатие) вернет False и учитель не получит
+    второе уведомление. Учителя уведомляет подписчик WorkSubmitted.
+    
     Args:
         student_username: Логин ученика
         assignment_id: ID задания
         response_text: Текст ответа
-        file_id: ID файла (если есть)
-        file_type: Тип файла
-        file_name: Имя файла
-        teacher_username: Логин учителя
+        files: Файлы ответа, если есть
         
     Returns:
-        bool: Статус операции
+        bool: True, если ответ сохранен этим вызовом
     """
     try:
-        # 1. Получаем данные задания
-        assignment = await get_assignment_details(assignment_id, student_username)
-        if not assignment:
-            print(f"⚠ Задание {assignment_id} не найдено или уже выполнено")
-            return False
-        
-        # 2. Обновляем задание
-        update_success = await update_assignment_response(
+        submitted = await update_assignment_response(
             assignment_id,
             response_text,
-            file_id,
-            file_type,
-            file_name
+            files,
+            student_username=student_username
         )
-        
-        if not update_success:
-            return False
-        
-        # 3. Уведомляем учителя
-        notification_sent = await notify_teacher(
-            teacher_username=teacher_username,
-            student_username=student_username,
-            assignment_text=assignment[1],
-            response_text=response_text,
-            file_id=file_id,
-            file_type=file_type,
-            file_name=file_name
-        )
-        
-        if not notification_sent:
-            print(f"⚠ Уведомление учителю @{teacher_username} не отправлено")
-        
-        return True
+        if not submitted:
+            print(f"⚠ Задание {assignment_id} не найдено или уже выполнено")
+        return submitted
         
     except Exception as e:
         print(f"⚠ Ошибка при обработке задания {assignment_id}: {e}")
         return False
 
 
-@dp.message(StudentStates.waiting_for_assignment_response, F.content_type.in_({ContentType.DOCUMENT, ContentType.PHOTO}))
+# Альбомы ответов собираются в одну отправку
+album_buffer = MediaGroupBuffer()
+
+
+async def collect_response_files(message: Message) -> Optional[List[FileInfo]]:
+    """Собирает файлы ответа (один файл или весь альбом)
+    
+    Returns:
+        Список файлов или None, если сообщение является частью альбома,
+        который обрабатывается другим апдейтом, либо файл отклонен
+    """
+    
+    messages = await album_buffer.collect(message)
+    if messages is None:
+        return None
+    
+    files = []
+    for item in messages:
+        file_content = item.document or (item.photo[-1] if item.photo else None)
+        if not file_content:
+            continue
+        try:
+            files.append(await get_file_info(file_content))
+        except ValueError as e:
+            await message.answer(f"❌ {e}")
+            return None
+    return files
+
+
+@router.message(StudentStates.waiting_for_assignment_response, F.content_type.in_({ContentType.DOCUMENT, ContentType.PHOTO}))
 async def process_file_response(message: Message, state: FSMContext):
     data = await state.get_data()
     
@@ -477,35 +578,22 @@ async def process_file_response(message: Message, state: FSMContext):
         await state.clear()
         return
     
-    response_text = ""
+    files = await collect_response_files(message)
+    if not files:
+        return
     
-    # Обработка файла
-    if message.document:
-        if message.document.file_size > MAX_FILE_SIZE:
-            await message.answer(f"❌ Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE//1024//1024}MB")
-            return
-        
-        file_id = message.document.file_id
-        file_type = "document"
-        file_name = message.document.file_name
-    else:  # photo
-        file_id = message.photo[-1].file_id
-        file_type = "photo"
-        file_name = None
+    response_text = ""
     
     try:
-        await submit_assignment(
+        submitted = await submit_assignment(
             student_username=message.from_user.username,
             assignment_id=data["assignment_id"],
             response_text=response_text,
-            file_id=file_id,
-            file_type=file_type,
-            file_name=file_name,
-            teacher_username=data["teacher_username"]
+            files=files
         )
         
         await message.answer(
-            "✅ Ваш ответ с файлом успешно отправлен на проверку!",
+            "✅ Ваш ответ с файлом успешно отправлен на проверку!" if submitted else SUBMIT_REJECTED,
             reply_markup=get_student_main_menu()
         )
     except Exception as e:
@@ -517,55 +605,41 @@ async def process_file_response(message: Message, state: FSMContext):
         await state.clear()
 
 
-@dp.message(StudentStates.waiting_for_file_response, F.content_type.in_({ContentType.DOCUMENT, ContentType.PHOTO}))
+@router.message(StudentStates.waiting_for_file_response, F.content_type.in_({ContentType.DOCUMENT, ContentType.PHOTO}))
 async def process_additional_file(message: Message, state: FSMContext):
     data = await state.get_data()
     
-    if message.document:
-        if message.document.file_size > MAX_FILE_SIZE:
-            await message.answer(f"❌ Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE//1024//1024}MB")
-            return
-        
-        file_id = message.document.file_id
-        file_type = "document"
-        file_name = message.document.file_name
-    else:  # photo
-        file_id = message.photo[-1].file_id
-        file_type = "photo"
-        file_name = None
-    
-    await submit_assignment(
+    files = await collect_response_files(message)
+    if not files:
+        return
+    
+    submitted = await submit_assignment(
         message.from_user.username,
-        data["assignment_index"],
+        data["assignment_id"],
         data.get("response_text", ""),
-        file_id,
-        file_type,
-        file_name,
-        data["teacher_username"]
+        files
     )
     
-    await message.answer("✅ Ваш ответ с файлом успешно отправлен на проверку!")
+    await message.answer("✅ Ваш ответ с файлом успешно отправлен на проверку!" if submitted else SUBMIT_REJECTED)
     await state.clear()
 
-@dp.message(Command("skip"), StudentStates.waiting_for_file_response)
+@router.message(Command("skip"), StudentStates.waiting_for_file_response)
 async def skip_file_upload(message: Message, state: FSMContext):
     data = await state.get_data()
     
-    await submit_assignment(
+    submitted = await submit_assignment(
         message.from_user.username,
-        data["assignment_index"],
+        data["assignment_id"],
         data.get("response_text", ""),
-        None,
-        None,
-        None,
-        data["teacher_username"]
+        None
     )
     
-    await message.answer("✅ Ваш текстовый ответ успешно отправлен на проверку!")
+    await message.answer("✅ Ваш текстовый ответ успешно отправлен на проверку!" if submitted else SUBMIT_REJECTED)
     await state.clear()
 
 
 async def send_file_notification(
+    bot: Bot,
     chat_id: int,
     message_text: str,
     file_id: str,
@@ -578,13 +652,13 @@ async def send_file_notification(
             await bot.send_document(
                 chat_id=chat_id,
                 document=file_id,
-                caption=message_text[:1024]
+                caption=truncate(message_text, CAPTION_LIMIT, parse_mode=None)
             )
         elif file_type == "photo":
             await bot.send_photo(
                 chat_id=chat_id,
                 photo=file_id,
-                caption=message_text[:1024]
+                caption=truncate(message_text, CAPTION_LIMIT, parse_mode=None)
             )
         print(f"✅ Файл отправлен (chat_id: {chat_id})")
         return True
@@ -593,7 +667,7 @@ async def send_file_notification(
         return False
 
 
-async def send_text_notification(chat_id: int, message_text: str) -> bool:
+async def send_text_notification(bot: Bot, chat_id: int, message_text: str) -> bool:
     """Отправляет текстовое уведомление"""
     try:
         await bot.send_message(chat_id=chat_id, text=message_text)
@@ -604,30 +678,34 @@ async def send_text_notification(chat_id: int, message_text: str) -> bool:
         return False
 
 async def notify_teacher(
+    bot: Bot,
     teacher_username: str,
     student_username: str,
     assignment_text: str,
     response_text: str = "",
-    file_id: str = None,
-    file_type: str = None,
-    file_name: str = None
-) -> bool:
-    """Надежная функция уведомления учителя с проверкой всех возможных ошибок"""
+    files: Optional[List[FileInfo]] = None
+) -> str:
+    """Надежная функция уведомления учителя с проверкой всех возможных ошибок
+    
+    Возвращает "sent" (отправлено), "digest" (попадет в сводку) или "failed".
+    """
     try:
         async with get_db_connection() as conn:
-            # 1. Проверка наличия учителя и получение chat_id
-            chat_id = await get_teacher_chat_id(conn, teacher_username)
+            # 1. Учитель, его режим уведомлений и имя ученика - одним запросом
+            info = await get_submission_notification_info(conn, teacher_username, student_username)
+            chat_id, notify_mode, student_name = info or (None, NOTIFY_IMMEDIATE, student_username)
             if not chat_id:
                 print(f"⚠ Учитель @{teacher_username} не найден или chat_id отсутствует")
-                return False
+                return "failed"
             
             # 2. Проверка валидности chat_id
             if not isinstance(chat_id, (int, str)) or not str(chat_id).strip():
                 print(f"⚠ Неверный формат chat_id для учителя @{teacher_username}: {chat_id}")
-                return False
+                return "failed"
             
-            # 3. Получаем имя ученика
-            student_name = await get_student_display_name(conn, student_username)
+            # 3. Учитель выбрал сводку - работа попадет в нее (school_bot/digest.py)
+            if notify_mode != NOTIFY_IMMEDIATE:
+                return "digest"
             
             # 4. Подготовка сообщения
             message_text = (
@@ -641,18 +719,62 @@ async def notify_teacher(
             
             # 5. Отправка сообщения
             success = False
-            if file_id and file_type:
-                message_text += f"📎 Приложен файл: {file_name if file_name else file_type}"
-                success = await send_file_notification(chat_id, message_text, file_id, file_type, file_name)
+            if len(files or []) == 1:
+                file = files[0]
+                message_text += f"📎 Приложен файл: {file.file_name if file.file_name else file.file_type}"
+                success = await send_file_notification(bot, chat_id, message_text, file.file_id, file.file_type, file.file_name)
                 if not success:
                     message_text += "\n⚠ Не удалось отправить вложение"
+            elif files:
+                # Альбом: текст уведомления становится подписью первого файла
+                message_text += f"📎 Приложено файлов: {len(files)}"
+                await send_files_batched(bot, chat_id, [
+                    (file.file_id, file.file_type, truncate(message_text, CAPTION_LIMIT, parse_mode=None) if i == 0 else None)
+                    for i, file in enumerate(files)
+                ])
+                success = True
             
             # Если файл не отправлен или не приложен, отправляем текст
             if not success:
-                success = await send_text_notification(chat_id, message_text)
+                success = await send_text_notification(bot, chat_id, message_text)
             
-            return success
+            return "sent" if success else "failed"
 
     except Exception as e:
         print(f"⚠ Критическая ошибка при уведомлении учителя @{teacher_username}: {e}")
-        return False
\ No newline at end of file
+        return "failed"
+
+
+@bus.subscribe(WorkSubmitted, concurrency=4)
+async def notify_teacher_submitted(bot: Bot, event: WorkSubmitted) -> None:
+    """Уведомляет учителя о сданной работе - не больше одного раза на задание"""
+    if not await claim_submission_notification(event.assignment_id):
+        metrics.inc("submission_notifications_total", {"result": "duplicate"})
+        return
+    result = await notify_teacher(
+        bot,
+        teacher_username=event.teacher_username,
+        student_username=event.student_username,
+        assignment_text=event.assignment_text,
+        response_text=event.response_text,
+        files=list(event.files)
+    )
+    metrics.inc("submission_notifications_total", {"result": result})
+    if result == "failed":
+        print(f"⚠ Уведомление учителю @{event.teacher_username} не отправлено")
+
+
+@bus.subscribe(AssignmentCreated, WorkSubmitted, WorkGraded, StudentEnrolled, inline=True)
+async def invalidate_student_classes(bot: Bot, event: AssignmentCreated | WorkSubmitted | WorkGraded | StudentEnrolled) -> None:
+    """Счетчики заданий в "🏫 Мои классы" изменились - сводка пересчитывается"""
+    if isinstance(event, AssignmentCreated):
+        for student_username, _ in event.recipients:
+            invalidate_class_overview(student_username)
+    else:
+        invalidate_class_overview(event.student_username)
+
+
+@bus.subscribe(WorkGraded, inline=True)
+async def invalidate_student_grades(bot: Bot, event: WorkGraded) -> None:
+    """Новая оценка - дневник ученика пересчитывается"""
+    invalidate_grade_book(event.student_username)
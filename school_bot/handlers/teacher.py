@@ -1,30 +1,51 @@
+import asyncio
+import csv
+import io
 from datetime import datetime
-from typing import List, Optional, Tuple, Union
-from aiogram import types
-from aiogram.filters import Command
+from typing import Optional
+from aiogram import types, Bot, Router, flags
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram import F
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, Document, PhotoSize
+from aiogram.types import Message, KeyboardButton
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
-import aiosqlite
 
-from school_bot.db.controllers import AssignmentData, check_class_exists_case_insensitive, create_class_assignment, create_individual_assignment, create_new_class, get_original_class_name, get_submitted_work_details, get_submitted_works, get_teacher_classes, grade_assignment_work, update_assignment_message_id, update_individual_assignment
-from school_bot.db.students import add_new_student, add_student_to_class, check_student_exists, check_student_in_class, get_student_chat_id, get_student_notification_info, get_students_in_class
-from school_bot.db.teachers import get_completed_assignments_teacher, is_user_teacher, get_teacher_classes_with_students
+from school_bot.db.controllers import AssignmentData, BulkGradeResult, add_class_assignment, add_individual_assignment, bulk_grade_class_assignment, check_class_exists_case_insensitive, create_new_class, get_class_assignment, get_class_assignments, get_original_class_name, get_submitted_work_details, get_submitted_works, get_teacher_classes, grade_assignment_work, update_assignment_message_id
+from school_bot.db.gradebook import StudentGrades, get_class_grades
+from school_bot.db.students import add_new_student, add_student_to_class, check_student_exists, check_student_in_class, get_student_notification_info
+from school_bot.db.teachers import NOTIFY_DAILY, NOTIFY_HOURLY, NOTIFY_IMMEDIATE, get_class_id, get_class_students, get_completed_assignments_teacher, get_teacher_class_rosters, get_teacher_notify_mode, set_teacher_notify_mode
 from school_bot.db.database import get_db_connection
+from school_bot.db.files import get_file_info
+from school_bot.db.slow_queries import slow_query_log
+from school_bot.callbacks import BulkGradeCallback, CallbackActions, GradeQueueCallback, NotifyModeCallback, QueueAction, RosterAction, RosterCallback, WorkAction, WorkCallback, WorkList, WorkListCallback
+from school_bot.db.roles import DIRECTOR, TEACHER
+from school_bot.events import AssignmentCreated, StudentEnrolled, WorkGraded, WorkSubmitted, bus
+from school_bot.keyboards import MenuButtons, get_role_menu, get_student_main_menu, get_teacher_cancel_menu
+from school_bot.grading import GradingQueue, parse_grade_list
+from school_bot.pagination import Paginator, RenderedPage
+from school_bot.report_cards import class_report_card, trend_arrow
+from school_bot.roles import RoleFilter
 from school_bot.states import TeacherStates
-from main import dp, bot
-from school_bot.config import BOT_USERNAME, MAX_FILE_SIZE, DIRECTOR_USERNAME
+from school_bot.templates import CAPTION_LIMIT, TEXT_LIMIT, Safe, Template, join, shorten, truncate, visible_length
+from school_bot.config import ARCHIVE_DIR, BOT_USERNAME, DIGEST_DAILY_HOUR, MAX_FILE_SIZE, SLOW_HANDLER_TIMEOUT
 
 
-@dp.message(F.text == "👨‍🏫 Добавить учителя")
+router = Router(name="teacher")
+router.message.filter(RoleFilter(TEACHER, DIRECTOR))
+router.callback_query.filter(RoleFilter(TEACHER, DIRECTOR))
+menu = MenuButtons(router)
+actions = CallbackActions(router)
+
+# Действия директора - вложенный роутер с дополнительной проверкой роли
+director_router = Router(name="director")
+director_router.message.filter(RoleFilter(DIRECTOR))
+director_menu = MenuButtons(director_router)
+router.include_router(director_router)
+
+
+@director_menu("👨‍🏫 Добавить учителя")
 async def add_teacher_handler(message: types.Message, state: FSMContext):
     """Обработчик начала процесса добавления учителя"""
-    if message.from_user.username != DIRECTOR_USERNAME:
-        from school_bot.handlers.universal import get_user_menu
-        await message.answer("⛔ Доступно только директору", reply_markup=await get_user_menu(message.from_user.username))
-        return
-    
     await message.answer(
         "✏️ Введите username нового учителя (без @):\n\n"
         "Пример: <code>ivanov_teacher</code>",
@@ -34,12 +55,11 @@ async def add_teacher_handler(message: types.Message, state: FSMContext):
     await state.set_state(TeacherStates.waiting_for_new_teacher_username)
 
 
-@dp.message(TeacherStates.waiting_for_new_teacher_username)
-async def process_new_teacher_username(message: types.Message, state: FSMContext):
+@director_router.message(TeacherStates.waiting_for_new_teacher_username)
+async def process_new_teacher_username(message: types.Message, state: FSMContext, role: str):
     """Обработчик ввода username нового учителя"""
     from school_bot.db.teachers import teacher_exists, add_teacher
     from school_bot.db.students import student_exists
-    from school_bot.handlers.universal import get_user_menu
     
     username = message.text.strip()
     
@@ -79,23 +99,19 @@ async def process_new_teacher_username(message: types.Message, state: FSMContext
                 "Отправьте ему эту ссылку для регистрации:\n"
                 f"<code>https://t.me/{BOT_USERNAME}?start=teacher_{username}</code>",
                 parse_mode="HTML",
-                reply_markup=await get_user_menu(message.from_user.username)
+                reply_markup=get_role_menu(role)
             )
         else:
             await message.answer(
                 "❌ Произошла ошибка при добавлении учителя. Попробуйте позже.",
-                reply_markup=await get_user_menu(message.from_user.username)
+                reply_markup=get_role_menu(role)
             )
     
     await state.clear()
 
 
-@dp.message(F.text == "🏫 Управление школой")
+@director_menu("🏫 Управление школой")
 async def school_management_handler(message: types.Message):
-    if message.from_user.username != DIRECTOR_USERNAME:
-        await message.answer("⛔ Доступно только директору")
-        return
-    
     await message.answer("⛔ TODO")
     return
 
@@ -111,304 +127,346 @@ async def school_management_handler(message: types.Message):
     )
 
 
-def get_teacher_main_menu(is_director: bool = False) -> ReplyKeyboardMarkup:
-    """Возвращает основное меню учителя или расширенное меню директора"""
-    builder = ReplyKeyboardBuilder()
-    
-    # Общие кнопки для всех учителей
-    builder.row(
-        KeyboardButton(text="📝 Дать задание"),
-        KeyboardButton(text="👥 Мои классы")
-    )
-    builder.row(
-        KeyboardButton(text="📊 Проверка работ"),
-        KeyboardButton(text="🔄 Обновить")
-    )
-    
-    if is_director:
-        # Дополнительные кнопки только для директора
-        builder.row(
-            KeyboardButton(text="👨‍🏫 Добавить учителя"),
-            KeyboardButton(text="🏫 Управление школой")
-        )
-    else:
-        # Кнопки для обычных учителей
-        builder.row(
-            KeyboardButton(text="➕ Создать класс"),
-            KeyboardButton(text="🎓 Добавить ученика")
-        )
+@director_router.message(Command("db_report"))
+async def db_report_handler(message: types.Message):
+    """Отчет о медленных запросах к БД (только директор, нужен DB_DEBUG)"""
+    if not slow_query_log.enabled:
+        await message.answer("⚠️ Профилирование БД выключено (DB_DEBUG = False).")
+        return
     
-    return builder.as_markup(
-        resize_keyboard=True,
-        input_field_placeholder="Выберите действие"
+    await message.answer_document(
+        types.BufferedInputFile(slow_query_log.report(limit=50).encode(), filename="db_report.txt"),
+        caption="📊 Запросы к БД по суммарному времени"
     )
 
-def get_teacher_cancel_menu() -> ReplyKeyboardMarkup:
-    builder = ReplyKeyboardBuilder()
-    builder.add(KeyboardButton(text="❌ Отмена"))
-    return builder.as_markup(resize_keyboard=True)
-
-
-@dp.message(F.text == "📝 Дать задание")
-async def give_assignment_button(message: types.Message, state: FSMContext):
-    await give_assignment_start(message, state)
-
-
-@dp.message(F.text == "👥 Мои классы")
-async def view_classes_button(message: types.Message):
-    await view_classes(message)
-
-
-@dp.message(F.text == "➕ Создать класс")
-async def create_class_button(message: types.Message, state: FSMContext):
-    await create_class_start(message, state)
-
-
-@dp.message(F.text == "🎓 Добавить ученика")
-async def add_student_button(message: types.Message, state: FSMContext):
-    await add_student_start(message, state)
-
-
-@dp.message(F.text == "📊 Проверка работ")
-async def view_completed_button(message: types.Message, state: FSMContext):
-    await view_completed_start(message, state)
 
+# Выполненных работ на странице списка
+WORKS_PER_PAGE = 5
 
-@dp.message(Command("view_completed"))
-async def view_completed_start(message: types.Message, state: FSMContext):
-    """Обработчик просмотра выполненных заданий"""
-    teacher_username = message.from_user.username
-    
-    # Проверяем права доступа
-    if not await is_user_teacher(teacher_username):
-        await message.answer("⛔ Доступ только для учителей")
-        return
-    
-    completed_works, total_count = await get_completed_assignments_teacher(teacher_username)
-    
-    if not completed_works:
-        from school_bot.handlers.universal import get_user_menu
-        await message.answer(
-            "📭 Нет выполненных заданий для проверки.",
-            reply_markup=await get_user_menu(str(message.from_user.username))
-        )
-        return
-    
-    await state.update_data(
-        completed_works=completed_works,
-        current_page=0,
-        total_works=total_count
-    )
-    await show_completed_works_page(message, state)
+COMPLETED_WORKS_HEADER = Template(
+    "completed_works_header",
+    "📚 <b>Выполненные задания</b> (страница {page}/{total_pages})\n\n"
+    "Всего работ: {total}\n\n"
+)
+COMPLETED_WORK_ROW = Template(
+    "completed_work_row",
+    "🔹 <b>Работа #{number}</b>\n"
+    "👤 Ученик: {student_name} (@{student})\n"
+    "📝 Задание: {assignment}\n"
+    "📅 Дата отправки: {submitted_at}\n"
+    "🏆 Оценка: {grade}\n\n"
+)
 
 
-async def show_completed_works_page(message: types.Message, state: FSMContext):
-    data = await state.get_data()
-    completed_works = data["completed_works"]
-    current_page = data["current_page"]
-    works_per_page = 5
-    
-    total_pages = (len(completed_works) + works_per_page - 1) // works_per_page
-    start_idx = current_page * works_per_page
-    end_idx = start_idx + works_per_page
-    
-    # Формируем сообщение
-    response = (
-        f"📚 <b>Выполненные задания</b> (страница {current_page + 1}/{total_pages})\n\n"
-        f"Всего работ: {len(completed_works)}\n\n"
+async def render_completed_works_page(teacher_username: str, page: int) -> Optional[RenderedPage]:
+    """Страница списка выполненных заданий (одна страница из БД)"""
+    works, total_count = await get_completed_assignments_teacher(
+        teacher_username,
+        limit=WORKS_PER_PAGE,
+        offset=page * WORKS_PER_PAGE
     )
+    if not works:
+        return None
     
-    for i, work in enumerate(completed_works[start_idx:end_idx], start_idx + 1):
-        response += (
-            f"🔹 <b>Работа #{i}</b>\n"
-            f"👤 Ученик: {work['student_name']} (@{work['student']})\n"
-            f"📝 Задание: {work['assignment'][:50]}...\n"
-            f"📅 Дата отправки: {work['submitted_at'][:10]}\n"
-            f"🏆 Оценка: {work['grade']}\n\n"
-        )
+    total_pages = (total_count + WORKS_PER_PAGE - 1) // WORKS_PER_PAGE
+    start_idx = page * WORKS_PER_PAGE
+    end_idx = start_idx + len(works)
+    
+    # Формируем сообщение: строка работы рендерится заново, только если изменилась оценка
+    response = COMPLETED_WORKS_HEADER.render(page=page + 1, total_pages=total_pages, total=total_count) + join(
+        (
+            COMPLETED_WORK_ROW.render_cached(
+                (work["id"], i), (work["grade"], work["submitted_at"]),
+                number=i,
+                student_name=work["student_name"],
+                student=work["student"],
+                assignment=shorten(work["assignment"], 50),
+                submitted_at=work["submitted_at"][:10],
+                grade=work["grade"]
+            )
+            for i, work in enumerate(works, start_idx + 1)
+        ),
+        sep=""
+    )
     
     # Создаем клавиатуру
     keyboard = []
     
     # Кнопки навигации
     nav_buttons = []
-    if current_page > 0:
-        nav_buttons.append(types.InlineKeyboardButton(text="⬅️ Назад", callback_data="prev_page"))
-    
-    if end_idx < len(completed_works):
-        nav_buttons.append(types.InlineKeyboardButton(text="Вперед ➡️", callback_data="next_page"))
+    if page > 0:
+        nav_buttons.append(types.InlineKeyboardButton(
+            text="⬅️ Назад",
+            callback_data=WorkListCallback(list=WorkList.COMPLETED, page=page - 1).pack()
+        ))
+    
+    if end_idx < total_count:
+        nav_buttons.append(types.InlineKeyboardButton(
+            text="Вперед ➡️",
+            callback_data=WorkListCallback(list=WorkList.COMPLETED, page=page + 1).pack()
+        ))
     
     if nav_buttons:
         keyboard.append(nav_buttons)
     
     # Кнопки для детального просмотра
-    for i, work in enumerate(completed_works[start_idx:end_idx], start_idx + 1):
+    for i, work in enumerate(works, start_idx + 1):
         keyboard.append([
             types.InlineKeyboardButton(
                 text=f"Просмотреть работу #{i}",
-                callback_data=f"view_work_{start_idx + i - 1}"
+                callback_data=WorkCallback(action=WorkAction.VIEW, work_id=work["id"], page=page).pack()
             )
         ])
     
-    await message.answer(
-        response,
-        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard),
-        parse_mode="HTML"
+    return RenderedPage(
+        truncate(response, TEXT_LIMIT),
+        types.InlineKeyboardMarkup(inline_keyboard=keyboard),
+        has_next=end_idx < total_count
     )
 
-@dp.callback_query(lambda c: c.data in ["prev_page", "next_page"])
-async def handle_page_navigation(callback: types.CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    current_page = data["current_page"]
+
+completed_works_pages = Paginator("completed_works", render_completed_works_page)
+
+
+@menu("📊 Проверка работ")
+@router.message(Command("view_completed"))
+async def view_completed_start(message: types.Message, role: str):
+    """Обработчик просмотра выполненных заданий"""
+    teacher_username = message.from_user.username
     
-    if callback.data == "prev_page" and current_page > 0:
-        await state.update_data(current_page=current_page - 1)
-    elif callback.data == "next_page":
-        await state.update_data(current_page=current_page + 1)
+    # Команда открывает список заново - берем свежие данные
+    completed_works_pages.invalidate(teacher_username)
+    shown = await completed_works_pages.show(message, teacher_username, 0, edit=False)
     
-    await callback.message.delete()
-    await show_completed_works_page(callback.message, state)
+    if not shown:
+        await message.answer(
+            "📭 Нет выполненных заданий для проверки.",
+            reply_markup=get_role_menu(role)
+        )
+
+
+@actions(WorkListCallback, WorkList.COMPLETED)
+async def handle_page_navigation(callback: types.CallbackQuery, callback_data: WorkListCallback):
+    """Страница списка выполненных заданий (и возврат к списку из работы)"""
+    shown = await completed_works_pages.show(
+        callback.message,
+        callback.from_user.username,
+        max(callback_data.page, 0)
+    )
+    if not shown:
+        await callback.answer("Нет выполненных заданий для проверки")
+        return
     await callback.answer()
 
 
-@dp.callback_query(lambda c: c.data.startswith("view_work_"))
-async def view_specific_work(callback: types.CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    work_idx = int(callback.data.split("_")[-1])
-    work = data["completed_works"][work_idx]
-    
-    response = (
-        f"📄 <b>Подробности работы</b>\n\n"
-        f"👤 Ученик: {work['student_name']} (@{work['student']})\n"
-        f"📝 Задание: {work['assignment']}\n"
-        f"📅 Дата отправки: {work['submitted_at'][:10]}\n"
-        f"🏆 Оценка: {work['grade']}\n\n"
-        f"📋 Ответ ученика:\n{work['response'][:1000]}\n"
+async def load_work(work_id: int, teacher_username: str) -> Optional[dict]:
+    """Читает присланную работу из БД (только работы этого учителя)"""
+    row = await get_submitted_work_details(work_id, teacher_username)
+    if not row:
+        return None
+    _, student, student_name, assignment, response, file_id, submitted_at, grade, file_type = row
+    return {
+        "id": work_id,
+        "student": student,
+        "student_name": student_name or student,
+        "assignment": assignment,
+        "response": response,
+        "file_id": file_id,
+        "file_type": file_type,
+        "submitted_at": submitted_at,
+        "grade": grade if grade is not None else "не оценено"
+    }
+
+
+WORK_DETAILS = Template(
+    "work_details",
+    "📄 <b>Подробности работы</b>\n\n"
+    "👤 Ученик: {student_name} (@{student})\n"
+    "📝 Задание: {assignment}\n"
+    "📅 Дата отправки: {submitted_at}\n"
+    "🏆 Оценка: {grade}\n\n"
+    "📋 Ответ ученика:\n{response}\n"
+)
+
+
+def format_work_details(work: dict, limit: int = TEXT_LIMIT) -> str:
+    """Форматирует детали работы для отображения (limit - CAPTION_LIMIT для подписи к файлу)"""
+    text = WORK_DETAILS.render_cached(
+        work["id"], (work["grade"], work["submitted_at"]),
+        student_name=work["student_name"],
+        student=work["student"],
+        assignment=work["assignment"],
+        submitted_at=work["submitted_at"][:10],
+        grade=work["grade"],
+        response=work["response"] or "Нет текстового ответа"
     )
+    return truncate(text, limit)
+
+
+def create_work_details_keyboard(work_id: int, page: int) -> types.InlineKeyboardMarkup:
+    """Создает клавиатуру для управления работой"""
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(
+            text="Поставить оценку", 
+            callback_data=WorkCallback(action=WorkAction.GRADE, work_id=work_id, page=page).pack()
+        )],
+        [types.InlineKeyboardButton(
+            text="Назад к списку", 
+            callback_data=WorkListCallback(list=WorkList.COMPLETED, page=page).pack()
+        )]
+    ])
+
+
+@actions(WorkCallback, WorkAction.VIEW)
+async def view_specific_work(callback: types.CallbackQuery, callback_data: WorkCallback):
+    """Обрабатывает просмотр конкретной работы"""
+    work = await load_work(callback_data.work_id, callback.from_user.username)
+    if not work:
+        await callback.answer("Работа не найдена")
+        return
     
-    keyboard = [
-        [types.InlineKeyboardButton(text="Поставить оценку", callback_data=f"grade_work_{work_idx}")],
-        [types.InlineKeyboardButton(text="Назад к списку", callback_data="back_to_list")]
-    ]
+    response = format_work_details(work)
+    caption = format_work_details(work, CAPTION_LIMIT)
+    keyboard = create_work_details_keyboard(work["id"], callback_data.page)
     
     try:
         if work["file_id"]:
             if work["file_type"] == "document":
-                await bot.send_document(
+                await callback.bot.send_document(
                     chat_id=callback.message.chat.id,
                     document=work["file_id"],
-                    caption=response[:1024],
-                    reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard),
+                    caption=caption,
+                    reply_markup=keyboard,
                     parse_mode="HTML"
                 )
             elif work["file_type"] == "photo":
-                await bot.send_photo(
+                await callback.bot.send_photo(
                     chat_id=callback.message.chat.id,
                     photo=work["file_id"],
-                    caption=response[:1024],
-                    reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard),
+                    caption=caption,
+                    reply_markup=keyboard,
                     parse_mode="HTML"
                 )
             else:
                 await callback.message.answer(
                     response,
-                    reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard),
+                    reply_markup=keyboard,
                     parse_mode="HTML"
                 )
         else:
             await callback.message.answer(
                 response,
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard),
+                reply_markup=keyboard,
                 parse_mode="HTML"
             )
     except Exception as e:
         print(f"Error sending work details: {e}")
         await callback.message.answer(
-            "Не удалось загрузить прикрепленный файл.\n" + response,
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard),
+            truncate("Не удалось загрузить прикрепленный файл.\n" + response, TEXT_LIMIT),
+            reply_markup=keyboard,
             parse_mode="HTML"
         )
     
     await callback.answer()
 
 
-@dp.callback_query(lambda c: c.data.startswith("grade_work_"))
-async def start_grading_work(callback: types.CallbackQuery, state: FSMContext):
-    work_idx = int(callback.data.split("_")[-1])
-    await state.update_data(current_work_idx=work_idx)
-    
+GRADE_PROMPT = "\n\nВыберите оценку:"
+
+
+@actions(WorkCallback, WorkAction.GRADE)
+async def start_grading_work(callback: types.CallbackQuery, callback_data: WorkCallback):
     # Создаем клавиатуру с оценками
     grades_keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text=str(i), callback_data=f"set_grade_{i}") for i in range(1, 6)],
-        [types.InlineKeyboardButton(text="🚫 Отмена", callback_data="cancel_grading")]
+        [
+            types.InlineKeyboardButton(
+                text=str(i),
+                callback_data=WorkCallback(
+                    action=WorkAction.SET_GRADE, work_id=callback_data.work_id, page=callback_data.page, grade=i
+                ).pack()
+            )
+            for i in range(1, 6)
+        ],
+        [types.InlineKeyboardButton(
+            text="🚫 Отмена",
+            callback_data=WorkCallback(action=WorkAction.CANCEL, work_id=callback_data.work_id, page=callback_data.page).pack()
+        )]
     ])
     
-    await callback.message.edit_caption(
-        caption=callback.message.caption + "\n\nВыберите оценку:",
-        reply_markup=grades_keyboard
-    )
+    work = await load_work(callback_data.work_id, callback.from_user.username)
+    if not work:
+        await callback.answer("Работа не найдена")
+        return
+    
+    # Подсказка дописывается к деталям работы, поэтому под нее оставляем место в лимите
+    if callback.message.text is None:
+        await callback.message.edit_caption(
+            caption=format_work_details(work, CAPTION_LIMIT - len(GRADE_PROMPT)) + GRADE_PROMPT,
+            reply_markup=grades_keyboard,
+            parse_mode="HTML"
+        )
+    else:
+        await callback.message.edit_text(
+            format_work_details(work, TEXT_LIMIT - len(GRADE_PROMPT)) + GRADE_PROMPT,
+            reply_markup=grades_keyboard,
+            parse_mode="HTML"
+        )
     await callback.answer()
 
 
-# Регистрация обработчика
-@dp.callback_query(lambda c: c.data.startswith("set_grade_"))
-async def handle_set_grade(callback: types.CallbackQuery, state: FSMContext):
+def format_grade_notification(student: str, student_name: Optional[str], assignment_text: str, grade: int) -> str:
+    """Текст уведомления ученику об оценке"""
+    # Формируем текст сообщения с проверкой имени
+    student_display_name = student_name if student_name else f"@{student}"
+    return (
+        f"📢 {student_display_name}, ваша работа проверена!\n\n"
+        f"Задание: {assignment_text[:100]}\n"
+        f"Оценка: {grade}"
+    )
+
+
+@bus.subscribe(WorkGraded, concurrency=4)
+async def notify_student_graded(bot: Bot, event: WorkGraded) -> None:
+    """Сообщает ученику об оценке работы"""
+    student = event.student_username
+    try:
+        student_data = (event.student_chat_id, event.student_name)
+        if not event.student_chat_id:
+            student_data = await get_student_notification_info(student)
+        if student_data and student_data[0]:
+            student_chat_id, student_name = student_data
+            await bot.send_message(
+                chat_id=student_chat_id,
+                text=format_grade_notification(student, student_name, event.assignment_text, event.grade),
+                reply_markup=get_student_main_menu()
+            )
+        else:
+            print(f"Не удалось отправить уведомление ученику @{student}")
+    except Exception as e:
+        print(f"Error notifying student @{student}: {e}")
+
+
+@actions(WorkCallback, WorkAction.SET_GRADE)
+async def handle_set_grade(callback: types.CallbackQuery, callback_data: WorkCallback):
     """Обработчик установки оценки"""
     try:
-        grade = int(callback.data.split("_")[-1])
-        data = await state.get_data()
+        grade = callback_data.grade
+        if not 1 <= grade <= 5:
+            raise ValueError(grade)
         
-        # Получаем текущий индекс работы
-        work_idx = data.get("current_work_idx")
-        if work_idx is None:
+        work = await load_work(callback_data.work_id, callback.from_user.username)
+        if work is None:
             await callback.answer("Ошибка: работа не найдена")
             return
-            
-        # Получаем список работ
-        completed_works = data.get("completed_works", [])
-        if work_idx >= len(completed_works):
-            await callback.answer("Ошибка: неверный индекс работы")
-            return
-            
-        work = completed_works[work_idx]
         
-        # Обновляем оценку в БД
+        # Обновляем оценку в БД (ученику сообщит подписчик WorkGraded)
         success = await grade_assignment_work(work['id'], grade)
         if not success:
             await callback.answer("Ошибка при обновлении оценки")
             return
-            
-        # Обновляем данные в state
-        completed_works[work_idx]['grade'] = grade
-        await state.update_data(completed_works=completed_works)
-        
-        # Уведомляем ученика
-        try:
-            student_data = await get_student_notification_info(work['student'])
-            if student_data:
-                student_chat_id, student_name = student_data
-                from school_bot.handlers.student import get_student_main_menu
-                
-                # Формируем текст сообщения с проверкой имени
-                student_display_name = student_name if student_name else f"@{work['student']}"
-                message_text = (
-                    f"📢 {student_display_name}, ваша работа проверена!\n\n"
-                    f"Задание: {work['assignment'][:100]}\n"
-                    f"Оценка: {grade}"
-                )
-                
-                await bot.send_message(
-                    chat_id=student_chat_id,
-                    text=message_text,
-                    reply_markup=get_student_main_menu()
-                )
-            else:
-                print(f"Не удалось отправить уведомление ученику @{work['student']}")
-        except Exception as e:
-            print(f"Error notifying student @{work['student']}: {e}")
         
+        work['grade'] = grade
         await callback.answer(f"Оценка {grade} поставлена!")
-        await back_to_work_details(callback, state)
+        await back_to_work_details(callback, work, callback_data.page)
         
     except ValueError:
         await callback.answer("Некорректная оценка")
@@ -417,91 +475,33 @@ async def handle_set_grade(callback: types.CallbackQuery, state: FSMContext):
         await callback.answer("Произошла ошибка")
 
 
-@dp.callback_query(lambda c: c.data == "cancel_grading")
-async def cancel_grading(callback: types.CallbackQuery, state: FSMContext):
+@actions(WorkCallback, WorkAction.CANCEL)
+async def cancel_grading(callback: types.CallbackQuery, callback_data: WorkCallback):
     """Обработчик отмены оценки"""
     try:
-        await back_to_work_details(callback, state)
+        work = await load_work(callback_data.work_id, callback.from_user.username)
+        if work is None:
+            await callback.answer("Ошибка: работа не найдена")
+            return
+        await back_to_work_details(callback, work, callback_data.page)
         await callback.answer("Оценка не изменена")
     except Exception as e:
         print(f"Error in cancel_grading: {e}")
         await callback.answer("Произошла ошибка")
 
 
-@dp.callback_query(lambda c: c.data == "back_to_list")
-async def back_to_list(callback: types.CallbackQuery, state: FSMContext):
-    await callback.message.delete()
-    await show_completed_works_page(callback.message, state)
-    await callback.answer()
-
-
-def format_work_details(work: tuple) -> str:
-    """Форматирует детали работы для отображения"""
-    return (
-        f"📄 <b>Подробности работы</b>\n\n"
-        f"👤 Ученик: {work[2]} (@{work[1]})\n"
-        f"📝 Задание: {work[3]}\n"
-        f"📅 Дата отправки: {work[7][:10]}\n"
-        f"🏆 Оценка: {work[8] if work[8] else 'ещё не оценено'}\n\n"
-        f"📋 Ответ ученика:\n{work[4][:1000] if work[4] else 'Нет текстового ответа'}\n"
-    )
-
-
-def create_work_details_keyboard(work_id: int) -> types.InlineKeyboardMarkup:
-    """Создает клавиатуру для управления работой"""
-    return types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(
-            text="Изменить оценку", 
-            callback_data=f"grade_work_{work_id}"
-        )],
-        [types.InlineKeyboardButton(
-            text="Назад к списку", 
-            callback_data="back_to_list"
-        )]
-    ])
-
-
-async def back_to_work_details(callback: types.CallbackQuery, state: FSMContext):
+async def back_to_work_details(callback: types.CallbackQuery, work: dict, page: int):
     """Возвращает к деталям работы"""
     try:
-        data = await state.get_data()
-        work_idx = data.get("current_work_idx")
-        if work_idx is None:
-            await callback.answer("Ошибка: работа не найдена")
-            return
-            
-        completed_works = data.get("completed_works", [])
-        if work_idx >= len(completed_works):
-            await callback.answer("Ошибка: неверный индекс работы")
-            return
-            
-        work = completed_works[work_idx]
-        
-        response = (
-            f"📄 <b>Подробности работы</b>\n\n"
-            f"👤 Ученик: {work['student_name']} (@{work['student']})\n"
-            f"📝 Задание: {work['assignment']}\n"
-            f"📅 Дата отправки: {work['submitted_at'][:10]}\n"
-            f"🏆 Оценка: {work['grade']}\n\n"
-            f"📋 Ответ ученика:\n{work['response'][:1000]}\n"
-        )
-        
-        keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-            [types.InlineKeyboardButton(
-                text="Поставить оценку", 
-                callback_data=f"grade_work_{work_idx}"
-            )],
-            [types.InlineKeyboardButton(
-                text="Назад к списку", 
-                callback_data="back_to_list"
-            )]
-        ])
+        response = format_work_details(work)
+        caption = format_work_details(work, CAPTION_LIMIT)
+        keyboard = create_work_details_keyboard(work["id"], page)
         
         try:
             if work.get("file_id"):
                 if work.get("file_type") == "document":
                     await callback.message.edit_caption(
-                        caption=response,
+                        caption=caption,
                         reply_markup=keyboard,
                         parse_mode="HTML"
                     )
@@ -509,7 +509,7 @@ async def back_to_work_details(callback: types.CallbackQuery, state: FSMContext)
                     await callback.message.edit_media(
                         media=types.InputMediaPhoto(
                             media=work["file_id"],
-                            caption=response,
+                            caption=caption,
                             parse_mode="HTML"
                         ),
                         reply_markup=keyboard
@@ -534,196 +534,370 @@ async def back_to_work_details(callback: types.CallbackQuery, state: FSMContext)
         await callback.answer("Произошла ошибка")
 
 
-def build_works_keyboard(works: list[tuple], page: int = 0) -> types.InlineKeyboardMarkup:
-    """Создает клавиатуру для отображения списка работ"""
+async def render_all_works_page(teacher_username: str, page: int) -> Optional[RenderedPage]:
+    """Страница списка всех присланных работ (по 10, лишняя строка - признак следующей страницы)"""
+    works = await get_submitted_works(teacher_username, limit=11, offset=page * 10)
+    if not works:
+        return None
+    has_next = len(works) > 10
     start_idx = page * 10
-    end_idx = start_idx + 10
-    current_works = works[start_idx:end_idx]
     
     keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
         [types.InlineKeyboardButton(
             text=f"{i+1+start_idx}. {work[2]} (@{work[1]}): {work[3][:20]}...",
-            callback_data=f"view_work_{work[0]}"
-        )] for i, work in enumerate(current_works)
+            callback_data=WorkCallback(action=WorkAction.VIEW, work_id=work[0], page=page).pack()
+        )] for i, work in enumerate(works[:10])
     ])
     
     # Добавляем кнопки навигации если нужно
-    if len(works) > 10:
-        buttons = []
-        if page > 0:
-            buttons.append(types.InlineKeyboardButton(text="⬅️ Назад", callback_data="prev_works_page"))
-        if end_idx < len(works):
-            buttons.append(types.InlineKeyboardButton(text="➡️ Вперед", callback_data="next_works_page"))
+    buttons = []
+    if page > 0:
+        buttons.append(types.InlineKeyboardButton(
+            text="⬅️ Назад",
+            callback_data=WorkListCallback(list=WorkList.ALL, page=page - 1).pack()
+        ))
+    if has_next:
+        buttons.append(types.InlineKeyboardButton(
+            text="➡️ Вперед",
+            callback_data=WorkListCallback(list=WorkList.ALL, page=page + 1).pack()
+        ))
+    if buttons:
         keyboard.inline_keyboard.append(buttons)
     
-    return keyboard
+    return RenderedPage("Выберите работу для просмотра:", keyboard, has_next=has_next)
 
 
-@dp.callback_query(lambda c: c.data == "view_all_works")
-async def view_all_works(callback: types.CallbackQuery, state: FSMContext):
-    """Обрабатывает просмотр всех работ"""
+all_works_pages = Paginator("all_works", render_all_works_page, parse_mode=None)
+
+
+@actions(WorkListCallback, WorkList.ALL)
+async def view_all_works(callback: types.CallbackQuery, callback_data: WorkListCallback):
+    """Обрабатывает просмотр всех работ (страница в callback data)"""
     teacher_username = callback.from_user.username
+    if callback_data.page == 0:
+        all_works_pages.invalidate(teacher_username)
     
-    works = await get_submitted_works(teacher_username)
-    if not works:
+    shown = await all_works_pages.show(callback.message, teacher_username, max(callback_data.page, 0))
+    if not shown:
         await callback.answer("Нет работ для просмотра")
         return
-    
-    # Сохраняем работы в state для постраничного просмотра
-    await state.update_data(all_works=works, current_page=0)
-    
-    # Формируем и отправляем клавиатуру
-    keyboard = build_works_keyboard(works)
-    await callback.message.edit_text(
-        text="Выберите работу для просмотра:",
-        reply_markup=keyboard
-    )
     await callback.answer()
 
 
-@dp.callback_query(lambda c: c.data == "next_works_page")
-async def next_works_page(callback: types.CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    works = data.get("all_works", [])
-    current_page = data.get("current_page", 0)
-    
-    if not works:
-        await callback.answer("Нет данных о работах")
-        return
+@bus.subscribe(WorkGraded, WorkSubmitted, inline=True)
+async def invalidate_work_lists(bot: Bot, event: WorkGraded | WorkSubmitted) -> None:
+    """Оценка или новая работа видна в списках - страницы учителя рендерятся заново"""
+    completed_works_pages.invalidate(event.teacher_username)
+    all_works_pages.invalidate(event.teacher_username)
+
+
+grading_queue = GradingQueue()
+router.shutdown.register(grading_queue.close)
+
+GRADING_QUEUE_HEADER = Template("grading_queue_header", "🎯 <b>Проверка по очереди</b> · проверено: {graded}\n\n")
+
+
+def create_queue_keyboard(work_id: int) -> types.InlineKeyboardMarkup:
+    """Оценки и управление очередью прямо под работой"""
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [
+            types.InlineKeyboardButton(
+                text=str(i),
+                callback_data=GradeQueueCallback(action=QueueAction.GRADE, work_id=work_id, grade=i).pack()
+            )
+            for i in range(1, 6)
+        ],
+        [
+            types.InlineKeyboardButton(
+                text="⏭ Пропустить",
+                callback_data=GradeQueueCallback(action=QueueAction.SKIP, work_id=work_id).pack()
+            ),
+            types.InlineKeyboardButton(
+                text="⏹ Завершить",
+                callback_data=GradeQueueCallback(action=QueueAction.STOP, work_id=work_id).pack()
+            )
+        ]
+    ])
+
+
+def format_queue_work(work: dict, graded: int, limit: int = TEXT_LIMIT) -> str:
+    header = GRADING_QUEUE_HEADER.render(graded=graded)
+    return header + format_work_details(work, limit - visible_length(header))
+
+
+async def show_queue_work(message: types.Message, work: dict, graded: int, edit: bool = True) -> None:
+    """Показывает работу из очереди одним запросом к Bot API
     
-    next_page = current_page + 1
-    start_idx = next_page * 10
-    end_idx = start_idx + 10
+    Сообщение очереди правится на месте: текст - через edit_text, файл -
+    через edit_media. Если вид сообщения меняется (текст <-> файл), новое
+    отправляется, а старое удаляется параллельно.
+    """
+    keyboard = create_queue_keyboard(work["id"])
+    has_file = work["file_id"] and work["file_type"] in ("document", "photo")
     
-    if start_idx >= len(works):
-        await callback.answer("Это последняя страница")
+    if edit and has_file and message.text is None:
+        media_type = types.InputMediaDocument if work["file_type"] == "document" else types.InputMediaPhoto
+        await message.edit_media(
+            media=media_type(
+                media=work["file_id"],
+                caption=format_queue_work(work, graded, CAPTION_LIMIT),
+                parse_mode="HTML"
+            ),
+            reply_markup=keyboard
+        )
+        return
+    if edit and not has_file and message.text is not None:
+        await message.edit_text(format_queue_work(work, graded), reply_markup=keyboard, parse_mode="HTML")
         return
     
-    keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
+    if not has_file:
+        send = message.answer(format_queue_work(work, graded), reply_markup=keyboard, parse_mode="HTML")
+    elif work["file_type"] == "document":
+        send = message.answer_document(
+            work["file_id"], caption=format_queue_work(work, graded, CAPTION_LIMIT),
+            reply_markup=keyboard, parse_mode="HTML"
+        )
+    else:
+        send = message.answer_photo(
+            work["file_id"], caption=format_queue_work(work, graded, CAPTION_LIMIT),
+            reply_markup=keyboard, parse_mode="HTML"
+        )
+    if edit:
+        await asyncio.gather(asyncio.ensure_future(send), asyncio.ensure_future(message.delete()), return_exceptions=True)
+    else:
+        await send
+
+
+@menu("🎯 Проверка по очереди")
+@router.message(Command("grade_queue"))
+async def start_grading_queue(message: types.Message, role: str):
+    """Режим проверки по очереди: непроверенные работы от старых к новым"""
+    work = await grading_queue.start(message.from_user.username)
+    if work is None:
+        await message.answer("📭 Все работы проверены.", reply_markup=get_role_menu(role))
+        return
+    await show_queue_work(message, work, 0, edit=False)
+
+
+async def finish_grading_queue(callback: types.CallbackQuery, graded: int) -> None:
+    text = f"✅ Проверка завершена. Оценено работ: {graded}"
+    if callback.message.text is not None:
+        reply = callback.message.edit_text(text)
+    else:
+        reply = callback.message.answer(text)
+    await asyncio.gather(asyncio.ensure_future(reply), asyncio.ensure_future(callback.answer()))
+
+
+@actions(GradeQueueCallback, QueueAction.GRADE)
+async def grade_from_queue(callback: types.CallbackQuery, callback_data: GradeQueueCallback):
+    """Оценка из очереди: ответ на кнопку и показ следующей работы идут параллельно"""
+    if not 1 <= callback_data.grade <= 5:
+        await callback.answer("Некорректная оценка")
+        return
+    teacher_username = callback.from_user.username
+    accepted, work = await grading_queue.grade(teacher_username, callback_data.work_id, callback_data.grade)
+    if not accepted:
+        await callback.answer("Эта работа уже не в очереди. Откройте проверку заново.")
+        return
+    graded = grading_queue.session(teacher_username).graded
+    if work is None:
+        await finish_grading_queue(callback, await grading_queue.stop(teacher_username))
+        return
+    await asyncio.gather(
+        asyncio.ensure_future(callback.answer(f"Оценка {callback_data.grade} поставлена")),
+        show_queue_work(callback.message, work, graded)
+    )
+
+
+@actions(GradeQueueCallback, QueueAction.SKIP)
+async def skip_in_queue(callback: types.CallbackQuery, callback_data: GradeQueueCallback):
+    teacher_username = callback.from_user.username
+    accepted, work = await grading_queue.skip(teacher_username, callback_data.work_id)
+    if not accepted:
+        await callback.answer("Эта работа уже не в очереди. Откройте проверку заново.")
+        return
+    if work is None:
+        await finish_grading_queue(callback, await grading_queue.stop(teacher_username))
+        return
+    graded = grading_queue.session(teacher_username).graded
+    await asyncio.gather(asyncio.ensure_future(callback.answer()), show_queue_work(callback.message, work, graded))
+
+
+@actions(GradeQueueCallback, QueueAction.STOP)
+async def stop_grading_queue(callback: types.CallbackQuery, callback_data: GradeQueueCallback):
+    await finish_grading_queue(callback, await grading_queue.stop(callback.from_user.username))
+
+
+@actions(GradeQueueCallback, QueueAction.START)
+async def start_queue_from_digest(callback: types.CallbackQuery, callback_data: GradeQueueCallback):
+    """Кнопка "Начать проверку" в сводке новых работ (school_bot/digest.py)"""
+    work = await grading_queue.start(callback.from_user.username)
+    if work is None:
+        await callback.answer("📭 Все работы проверены.")
+        return
+    await asyncio.gather(asyncio.ensure_future(callback.answer()), show_queue_work(callback.message, work, 0, edit=False))
+
+
+NOTIFY_MODE_TITLES = {
+    NOTIFY_IMMEDIATE: "🔔 Сразу",
+    NOTIFY_HOURLY: "🕐 Сводка раз в час",
+    NOTIFY_DAILY: f"📅 Сводка раз в день ({DIGEST_DAILY_HOUR}:00)",
+}
+
+
+def create_notify_mode_keyboard(current: str) -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(inline_keyboard=[
         [types.InlineKeyboardButton(
-            text=f"{start_idx+i+1}. {work[2]} (@{work[1]}): {work[3][:20]}...",
-            callback_data=f"view_work_{work[0]}"
-        )] for i, work in enumerate(works[start_idx:end_idx])
+            text=("✅ " if mode == current else "") + title,
+            callback_data=NotifyModeCallback(mode=mode).pack()
+        )]
+        for mode, title in NOTIFY_MODE_TITLES.items()
     ])
-    
-    # Добавляем кнопки навигации
-    nav_buttons = []
-    if next_page > 0:
-        nav_buttons.append(types.InlineKeyboardButton(text="⬅️ Назад", callback_data="prev_works_page"))
-    if end_idx < len(works):
-        nav_buttons.append(types.InlineKeyboardButton(text="➡️ Вперед", callback_data="next_works_page"))
-    
-    if nav_buttons:
-        keyboard.inline_keyboard.append(nav_buttons)
-    
-    await state.update_data(current_page=next_page)
-    await callback.message.edit_reply_markup(reply_markup=keyboard)
-    await callback.answer()
 
-@dp.callback_query(lambda c: c.data == "prev_works_page")
-async def prev_works_page(callback: types.CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    works = data.get("all_works", [])
-    current_page = data.get("current_page", 0)
-    
-    if current_page <= 0:
-        await callback.answer("Это первая страница")
+
+@router.message(Command("notifications"))
+async def notification_settings(message: types.Message):
+    """Как присылать новые работы: сразу или сводкой"""
+    mode = await get_teacher_notify_mode(message.from_user.username)
+    await message.answer(
+        "🔔 <b>Уведомления о новых работах</b>\n\n"
+        "В режиме сводки работы приходят одним сообщением с количеством по классам.",
+        reply_markup=create_notify_mode_keyboard(mode),
+        parse_mode="HTML"
+    )
+
+
+@actions(NotifyModeCallback)
+async def set_notification_mode(callback: types.CallbackQuery, callback_data: NotifyModeCallback):
+    if callback_data.mode not in NOTIFY_MODE_TITLES:
+        await callback.answer("Кнопка устарела. Откройте /notifications заново.")
+        return
+    await set_teacher_notify_mode(callback.from_user.username, callback_data.mode)
+    await asyncio.gather(
+        asyncio.ensure_future(callback.message.edit_reply_markup(reply_markup=create_notify_mode_keyboard(callback_data.mode))),
+        asyncio.ensure_future(callback.answer(f"Режим: {NOTIFY_MODE_TITLES[callback_data.mode]}")),
+        return_exceptions=True
+    )
+
+
+def format_bulk_grade_summary(result: BulkGradeResult, errors: list[str]) -> str:
+    """Отчет об оценках списком: сколько выставлено и что пропущено"""
+    lines = [f"✅ Оценки выставлены: {len(result.graded)}"]
+    if result.already_graded:
+        lines.append("⚠️ Уже оценены (не изменены): " + ", ".join(f"@{u}" for u in result.already_graded))
+    if result.not_submitted:
+        lines.append("⏳ Работа еще не сдана: " + ", ".join(f"@{u}" for u in result.not_submitted))
+    if result.missing:
+        lines.append("❓ Нет в этом задании: " + ", ".join(f"@{u}" for u in result.missing))
+    if errors:
+        lines.append("❌ Не распознаны строки:\n" + "\n".join(errors))
+    return truncate("\n\n".join(lines), TEXT_LIMIT, parse_mode=None)
+
+
+def format_assigned_date(assigned_at: Optional[str]) -> str:
+    """Дата выдачи " от ДД.ММ" - различает классные задания с одинаковым текстом"""
+    return f" от {assigned_at[8:10]}.{assigned_at[5:7]}" if assigned_at else ""
+
+
+@menu("📋 Оценки списком")
+@router.message(Command("bulk_grade"))
+async def bulk_grade_start(message: types.Message, role: str):
+    """Оценки списком: выбор классного задания"""
+    assignments = await get_class_assignments(message.from_user.username)
+    if not assignments:
+        await message.answer("📭 У вас пока нет классных заданий.", reply_markup=get_role_menu(role))
         return
-    
-    prev_page = current_page - 1
-    start_idx = prev_page * 10
-    end_idx = start_idx + 10
     
     keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
         [types.InlineKeyboardButton(
-            text=f"{start_idx+i+1}. {work[2]} (@{work[1]}): {work[3][:20]}...",
-            callback_data=f"view_work_{work[0]}"
-        )] for i, work in enumerate(works[start_idx:end_idx])
+            text=f"{class_name}: {shorten(text, 30)}{format_assigned_date(assigned_at)} (ждут оценки: {waiting})",
+            callback_data=BulkGradeCallback(assignment_id=assignment_id).pack()
+        )]
+        for assignment_id, class_name, text, assigned_at, _, waiting in assignments
     ])
-    
-    # Добавляем кнопки навигации
-    nav_buttons = []
-    if prev_page > 0:
-        nav_buttons.append(types.InlineKeyboardButton(text="⬅️ Назад", callback_data="prev_works_page"))
-    if end_idx < len(works):
-        nav_buttons.append(types.InlineKeyboardButton(text="➡️ Вперед", callback_data="next_works_page"))
-    
-    if nav_buttons:
-        keyboard.inline_keyboard.append(nav_buttons)
-    
-    await state.update_data(current_page=prev_page)
-    await callback.message.edit_reply_markup(reply_markup=keyboard)
-    await callback.answer()
+    await message.answer("Выберите задание, за которое выставить оценки:", reply_markup=keyboard)
 
 
-def format_work_response(work: tuple) -> str:
-    """Форматирует информацию о работе для отправки"""
-    return (
-        f"👨🎓 Ученик: {work[2]} (@{work[1]})\n"
-        f"📝 Задание: {work[3]}\n"
-        f"📅 Дата выполнения: {work[6][:10]}\n"
-        f"🏆 Оценка: {work[7] if work[7] else 'ещё не оценено'}\n\n"
-        f"📄 Ответ:\n{work[4] or 'Нет текстового ответа'}"
-    )
+BULK_GRADE_PROMPT = Template(
+    "bulk_grade_prompt",
+    "📋 <b>{class_name}</b>: {text}\n\n"
+    "Пришлите оценки по одной строке на ученика в формате <code>username: оценка</code> "
+    "(или CSV-файл <code>username,оценка</code>).\n\n"
+    "Ждут оценки:\n<code>{template}</code>"
+)
 
 
-async def send_work_file(chat_id: int, file_id: str, caption: str) -> None:
-    """Отправляет файл работы с подписью"""
-    try:
-        file_type = "document" if file_id.startswith("BQ") else "photo"
-        
-        if file_type == "document":
-            await bot.send_document(
-                chat_id=chat_id,
-                document=file_id,
-                caption=caption[:1000]
-            )
-        else:
-            await bot.send_photo(
-                chat_id=chat_id,
-                photo=file_id,
-                caption=caption[:1000]
-            )
-    except Exception as e:
-        raise ValueError(f"Ошибка отправки файла: {str(e)}")
+@actions(BulkGradeCallback)
+async def bulk_grade_select(callback: types.CallbackQuery, callback_data: BulkGradeCallback, state: FSMContext):
+    """Задание выбрано - ждем список оценок"""
+    assignment = await get_class_assignment(callback_data.assignment_id, callback.from_user.username)
+    if assignment is None:
+        await callback.answer("Задание не найдено")
+        return
+    class_name, text, works = assignment
+    
+    # Заготовка списка: сданные и еще не оцененные работы
+    waiting = [student for student, status, grade in works if status == "submitted" and grade is None]
+    template = join(f"{student}: " for student in waiting) if waiting else "username: 5"
+    
+    await state.set_state(TeacherStates.waiting_for_bulk_grades)
+    await state.update_data(bulk_assignment_id=callback_data.assignment_id)
+    await callback.message.answer(
+        truncate(
+            BULK_GRADE_PROMPT.render(class_name=class_name, text=shorten(text, 200), template=template),
+            TEXT_LIMIT
+        ),
+        parse_mode="HTML",
+        reply_markup=get_teacher_cancel_menu()
+    )
+    await callback.answer()
 
 
-@dp.callback_query(lambda c: c.data.startswith("view_work_"))
-async def view_specific_work(callback: types.CallbackQuery):
-    """Обрабатывает просмотр конкретной работы"""
-    work_id = int(callback.data.split("_")[-1])
-    teacher_username = callback.from_user.username
-    
-    work = await get_submitted_work_details(work_id, teacher_username)
-    if not work:
-        await callback.answer("Работа не найдена")
+async def apply_bulk_grades(message: types.Message, state: FSMContext, role: str, text: str) -> None:
+    """Выставляет оценки из списка одной транзакцией и отправляет отчет"""
+    data = await state.get_data()
+    grades, errors = parse_grade_list(text)
+    if not grades:
+        await message.answer(
+            "Не найдено ни одной оценки. Формат: username: оценка" + ("\n\n" + "\n".join(errors[:10]) if errors else ""),
+            reply_markup=get_teacher_cancel_menu()
+        )
         return
     
-    response = format_work_response(work)
+    # Уведомления ученикам рассылает подписчик WorkGraded
+    result = await bulk_grade_class_assignment(message.from_user.username, data.get("bulk_assignment_id", 0), grades)
+    await state.clear()
+    if result is None:
+        await message.answer("❌ Задание не найдено", reply_markup=get_role_menu(role))
+        return
     
+    await message.answer(format_bulk_grade_summary(result, errors), reply_markup=get_role_menu(role))
+
+
+@router.message(TeacherStates.waiting_for_bulk_grades, F.document)
+async def process_bulk_grades_file(message: types.Message, state: FSMContext, role: str):
+    if message.document.file_size and message.document.file_size > MAX_FILE_SIZE:
+        await message.answer("Файл слишком большой", reply_markup=get_teacher_cancel_menu())
+        return
+    content = (await message.bot.download(message.document)).getvalue()
     try:
-        if work[5]:  # Если есть файл
-            await send_work_file(callback.from_user.id, work[5], response)
-        else:
-            await callback.message.answer(response)
-    except ValueError as e:
-        await callback.message.answer(
-            f"{response}\n\n⚠ {str(e)}",
-            parse_mode="HTML"
-        )
-    
-    await callback.answer()
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = content.decode("cp1251", errors="replace")
+    await apply_bulk_grades(message, state, role, text)
 
 
-@dp.message(Command("create_class"))
+@router.message(TeacherStates.waiting_for_bulk_grades, F.text, F.text != "❌ Отмена")
+async def process_bulk_grades_text(message: types.Message, state: FSMContext, role: str):
+    await apply_bulk_grades(message, state, role, message.text)
+
+
+@menu("➕ Создать класс")
+@router.message(Command("create_class"))
 async def create_class_start(message: types.Message, state: FSMContext):
     """Обработчик создания нового класса"""
     teacher_username = message.from_user.username
     
-    # Проверяем права доступа
-    if not await is_user_teacher(teacher_username):
-        await message.answer("⛔ Только учителя могут создавать классы")
-        return
     
     await state.update_data(teacher_username=teacher_username)
     await state.set_state(TeacherStates.waiting_for_new_class_name)
@@ -733,8 +907,8 @@ async def create_class_start(message: types.Message, state: FSMContext):
     )
 
 
-@dp.message(TeacherStates.waiting_for_new_class_name)
-async def process_new_class_name(message: types.Message, state: FSMContext):
+@router.message(TeacherStates.waiting_for_new_class_name)
+async def process_new_class_name(message: types.Message, state: FSMContext, role: str):
     """Обрабатывает создание нового класса"""
     class_name = message.text.strip()
     teacher_username = message.from_user.username
@@ -747,32 +921,27 @@ async def process_new_class_name(message: types.Message, state: FSMContext):
         await message.answer("Класс с таким названием уже существует!")
     else:
         await create_new_class(teacher_username, class_name)
-        from school_bot.handlers.universal import get_user_menu
         await message.answer(
             f"Класс '{class_name}' успешно создан!",
-            reply_markup=await get_user_menu(str(message.from_user.username))
+            reply_markup=get_role_menu(role)
         )
     
     await state.clear()
 
 
-@dp.message(Command("add_student"))
-async def add_student_start(message: types.Message, state: FSMContext):
+@menu("🎓 Добавить ученика")
+@router.message(Command("add_student"))
+async def add_student_start(message: types.Message, state: FSMContext, role: str):
     """Обработчик начала добавления ученика в класс"""
     teacher_username = message.from_user.username
     
-    # Проверяем права доступа
-    if not await is_user_teacher(teacher_username):
-        await message.answer("⛔ Только учителя могут добавлять учеников")
-        return
     
     # Получаем список классов учителя для проверки
     teacher_classes = await get_teacher_classes(teacher_username)
     if not teacher_classes:
-        from school_bot.handlers.universal import get_user_menu
         await message.answer(
             "У вас нет классов. Сначала создайте класс.",
-            reply_markup=await get_user_menu(str(message.from_user.username))
+            reply_markup=get_role_menu(role)
         )
         return
     
@@ -784,8 +953,8 @@ async def add_student_start(message: types.Message, state: FSMContext):
     )
 
 
-@dp.message(TeacherStates.waiting_for_class_name)
-async def select_class_for_student(message: types.Message, state: FSMContext):
+@router.message(TeacherStates.waiting_for_class_name)
+async def select_class_for_student(message: types.Message, state: FSMContext, role: str):
     """Обрабатывает выбор класса для добавления ученика"""
     class_name = message.text.strip()
     teacher_username = message.from_user.username
@@ -802,16 +971,15 @@ async def select_class_for_student(message: types.Message, state: FSMContext):
         available_classes = await get_teacher_classes(teacher_username)
         classes_list = "\n".join([f"- {class_name}" for class_name in available_classes])
         
-        from school_bot.handlers.universal import get_user_menu
         await message.answer(
             f"Класс '{class_name}' не найден. Ваши классы:\n{classes_list}\n"
             "Попробуйте снова или нажмите /cancel",
-            reply_markup=await get_user_menu(str(message.from_user.username))
+            reply_markup=get_role_menu(role)
         )
 
 
-@dp.message(TeacherStates.waiting_for_student_username)
-async def process_student_username(message: types.Message, state: FSMContext):
+@router.message(TeacherStates.waiting_for_student_username)
+async def process_student_username(message: types.Message, state: FSMContext, role: str):
     """Обрабатывает добавление ученика в класс"""
     student_username = message.text.strip("@")
     data = await state.get_data()
@@ -819,9 +987,8 @@ async def process_student_username(message: types.Message, state: FSMContext):
     
     # Проверяем, есть ли ученик уже в классе
     if await check_student_in_class(student_username, class_name):
-        from school_bot.handlers.universal import get_user_menu
         await message.answer("Этот ученик уже в данном классе.",
-                           reply_markup=await get_user_menu(str(message.from_user.username)))
+                           reply_markup=get_role_menu(role))
         await state.clear()
         return
     
@@ -831,33 +998,29 @@ async def process_student_username(message: types.Message, state: FSMContext):
     
     # Добавляем ученика в класс
     await add_student_to_class(student_username, class_name)
+    await bus.publish(StudentEnrolled(message.from_user.username, student_username, class_name))
     
-    from school_bot.handlers.universal import get_user_menu
     await message.answer(
         f"Ученик @{student_username} добавлен в класс '{class_name}'!",
-        reply_markup=await get_user_menu(str(message.from_user.username))
+        reply_markup=get_role_menu(role)
     )
     await state.clear()
 
 
-@dp.message(Command("give_assignment"))
-async def give_assignment_start(message: types.Message, state: FSMContext):
+@menu("📝 Дать задание")
+@router.message(Command("give_assignment"))
+async def give_assignment_start(message: types.Message, state: FSMContext, role: str):
     """Обработчик начала создания задания"""
     teacher_username = message.from_user.username
     
-    # Проверяем права доступа
-    if not await is_user_teacher(teacher_username):
-        await message.answer("⛔ Только учителя могут создавать задания")
-        return
     
     # Получаем классы учителя
     classes = await get_teacher_classes(teacher_username)
     
     if not classes:
-        from school_bot.handlers.universal import get_user_menu
         await message.answer(
             "У вас нет классов. Сначала создайте класс.",
-            reply_markup=await get_user_menu(str(message.from_user.username))
+            reply_markup=get_role_menu(role)
         )
         return
     
@@ -877,7 +1040,7 @@ async def give_assignment_start(message: types.Message, state: FSMContext):
     )
 
 
-@dp.message(TeacherStates.waiting_for_assignment_type)
+@router.message(TeacherStates.waiting_for_assignment_type)
 async def process_assignment_type(message: types.Message, state: FSMContext):
     """Обрабатывает выбор типа задания (класс/индивидуальное)"""
     input_text = message.text.strip()
@@ -915,7 +1078,7 @@ async def process_assignment_type(message: types.Message, state: FSMContext):
             )
 
 
-@dp.message(TeacherStates.waiting_for_student_selection)
+@router.message(TeacherStates.waiting_for_student_selection)
 async def process_student_selection(message: types.Message, state: FSMContext):
     """Обрабатывает выбор ученика для индивидуального задания"""
     student_username = message.text.strip().lower().replace("@", "")
@@ -928,8 +1091,8 @@ async def process_student_selection(message: types.Message, state: FSMContext):
         await message.answer("Ученик не найден. Проверьте username и попробуйте снова")
 
 
-@dp.message(TeacherStates.waiting_for_assignment_text)
-async def process_assignment_text(message: types.Message, state: FSMContext):
+@router.message(TeacherStates.waiting_for_assignment_text)
+async def process_assignment_text(message: types.Message, state: FSMContext, role: str):
     """Обработчик текста задания (без создания дубликатов)"""
     assignment_text = message.text
     data = await state.get_data()
@@ -951,25 +1114,23 @@ async def process_assignment_text(message: types.Message, state: FSMContext):
         )
     except Exception as e:
         print(f"Ошибка при обработке задания: {e}")
-        from school_bot.handlers.universal import get_user_menu
         await message.answer(
             "Произошла ошибка при сохранении задания",
-            reply_markup=await get_user_menu(str(message.from_user.username))
+            reply_markup=get_role_menu(role)
         )
         await state.clear()
 
 
-@dp.message(
+@router.message(
     TeacherStates.waiting_for_assignment_file,
     Command("skip")
 )
-async def skip_file_attachment(message: Message, state: FSMContext):
+async def skip_file_attachment(message: Message, state: FSMContext, role: str):
     await state.clear()
-    from school_bot.handlers.universal import get_user_menu
-    await message.answer("Задание опубликовано без файла", reply_markup=await get_user_menu(str(message.from_user.username)))
+    await message.answer("Задание опубликовано без файла", reply_markup=get_role_menu(role))
 
 
-@dp.message(
+@router.message(
     TeacherStates.waiting_for_assignment_file,
     ~F.document,
     ~F.photo
@@ -978,17 +1139,8 @@ async def process_invalid_file(message: Message):
     await message.answer("Пожалуйста, отправьте файл (PDF, Word, изображение) или нажмите /skip")
 
 
-async def get_file_info(message: Union[Document, PhotoSize]) -> Tuple[str, str, Optional[str]]:
-    """Извлекает информацию о файле из сообщения"""
-    if isinstance(message, Document):
-        if message.file_size > MAX_FILE_SIZE:
-            raise ValueError(f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE//1024//1024}MB")
-        return message.file_id, "document", message.file_name
-    else:  # Photo
-        return message.file_id, "photo", None
-
-
 async def notify_student_with_file(
+    bot: Bot,
     chat_id: int,
     text: str,
     file_id: str,
@@ -1020,94 +1172,67 @@ async def notify_student_with_file(
         return None
 
 
-async def process_individual_assignment(
-    conn: aiosqlite.Connection,
-    teacher_username: str,
-    student_username: str,
-    assignment_text: str,
-    file_id: str,
-    file_type: str,
-    file_name: Optional[str]
-) -> None:
-    """Обрабатывает индивидуальное задание"""
-    await update_individual_assignment(
-        conn,
-        teacher_username,
-        student_username,
-        assignment_text,
-        file_id,
-        file_type,
-        file_name
-    )
-    
-    student_chat_id = await get_student_chat_id(conn, student_username)
-    if not student_chat_id:
+async def notify_student_individual_assignment(bot: Bot, event: AssignmentCreated, student_chat_id: int) -> None:
+    """Сообщает ученику об индивидуальном задании; с файлом - запоминает message_id уведомления"""
+    if event.file is None:
+        await bot.send_message(
+            chat_id=student_chat_id,
+            text=f"📌 Новое индивидуальное задание:\n{event.assignment_text}"
+        )
         return
     
     msg_id = await notify_student_with_file(
+        bot,
         chat_id=student_chat_id,
-        text=f"📌 Новое индивидуальное задание (с файлом):\n{assignment_text}",
-        file_id=file_id,
-        file_type=file_type,
+        text=f"📌 Новое индивидуальное задание (с файлом):\n{event.assignment_text}",
+        file_id=event.file.file_id,
+        file_type=event.file.file_type,
         caption="Прикрепленный файл к заданию"
     )
     
     if msg_id:
-        await update_assignment_message_id(conn, msg_id, {
-            'teacher_username': teacher_username,
-            'student_username': student_username,
-            'assignment_text': assignment_text
-        })
-
-
-async def process_class_assignment(
-    conn: aiosqlite.Connection,
-    teacher_username: str,
-    class_name: str,
-    assignment_text: str,
-    file_id: Optional[str] = None,
-    file_type: Optional[str] = None,
-    file_name: Optional[str] = None
-) -> None:
-    """Обрабатывает задание для класса (без message_id)"""
-    students = await get_students_in_class(conn, class_name)
-    
-    for student_username, student_chat_id in students:
-        # Создаем задание в БД
-        await create_class_assignment(
-            conn,
-            teacher_username,
-            student_username,
-            class_name,
-            assignment_text,
-            file_id,
-            file_type,
-            file_name
+        student_username = event.recipients[0][0]
+        async with get_db_connection() as conn:
+            await update_assignment_message_id(conn, msg_id, {
+                'teacher_username': event.teacher_username,
+                'student_username': student_username,
+                'assignment_text': event.assignment_text
+            })
+            await conn.commit()
+
+
+async def notify_student_class_assignment(bot: Bot, event: AssignmentCreated, student_chat_id: int) -> None:
+    """Сообщает ученику о задании для класса"""
+    text = f"📌 Новое задание для класса {event.class_name}:\n{event.assignment_text}"
+    if event.file is None:
+        await bot.send_message(chat_id=student_chat_id, text=text)
+    elif event.file.file_type == "document":
+        await bot.send_document(
+            chat_id=student_chat_id,
+            document=event.file.file_id,
+            caption=truncate(text, CAPTION_LIMIT, parse_mode=None)
         )
-        
-        # Отправляем уведомление ученику
-        if student_chat_id:
-            try:
-                if file_id:
-                    if file_type == "document":
-                        await bot.send_document(
-                            chat_id=student_chat_id,
-                            document=file_id,
-                            caption=f"📌 Новое задание для класса {class_name}:\n{assignment_text}"
-                        )
-                    else:
-                        await bot.send_photo(
-                            chat_id=student_chat_id,
-                            photo=file_id,
-                            caption=f"📌 Новое задание для класса {class_name}:\n{assignment_text}"
-                        )
-                else:
-                    await bot.send_message(
-                        chat_id=student_chat_id,
-                        text=f"📌 Новое задание для класса {class_name}:\n{assignment_text}"
-                    )
-            except Exception as e:
-                print(f"Ошибка при отправке уведомления ученику {student_username}: {e}")
+    else:
+        await bot.send_photo(
+            chat_id=student_chat_id,
+            photo=event.file.file_id,
+            caption=truncate(text, CAPTION_LIMIT, parse_mode=None)
+        )
+
+
+@bus.subscribe(AssignmentCreated, concurrency=2)
+async def notify_students_assignment(bot: Bot, event: AssignmentCreated) -> None:
+    """Рассылает ученикам новое задание; темп задает шлюз отправки"""
+    for student_username, student_chat_id in event.recipients:
+        if not student_chat_id:
+            continue
+        try:
+            if event.class_name:
+                await notify_student_class_assignment(bot, event, student_chat_id)
+            else:
+                await notify_student_individual_assignment(bot, event, student_chat_id)
+        except Exception as e:
+            print(f"Ошибка при отправке уведомления ученику {student_username}: {e}")
 
 
 async def prepare_assignment_data(
@@ -1118,15 +1243,12 @@ async def prepare_assignment_data(
     try:
         data = await state.get_data()
         file_content = message.document or message.photo[-1]
-        file_id, file_type, file_name = await get_file_info(file_content)
         
         return AssignmentData(
             teacher_username=message.from_user.username,
             student_username=data.get("student_username"),
             assignment_text=data.get("assignment_text", ""),
-            file_id=file_id,
-            file_type=file_type,
-            file_name=file_name,
+            file=await get_file_info(file_content),
             class_name=data.get("class_name")
         )
     except ValueError as e:
@@ -1134,46 +1256,34 @@ async def prepare_assignment_data(
         return None
 
 
-@dp.message(
+@router.message(
     TeacherStates.waiting_for_assignment_file,
     F.document | F.photo
 )
-async def process_assignment_file(message: Message, state: FSMContext):
+async def process_assignment_file(message: Message, state: FSMContext, role: str):
     """Окончательная обработка задания с файлом"""
     data = await state.get_data()
     teacher_username = message.from_user.username
     file_content = message.document or message.photo[-1]
-    file_id, file_type, file_name = await get_file_info(file_content)
+    try:
+        file = await get_file_info(file_content)
+    except ValueError as e:
+        await message.answer(str(e))
+        return
     
     async with get_db_connection() as conn:
         try:
-            success = False
+            event = None
             
             if data["assignment_type"] == "individual":
-                # Пытаемся обновить существующее
-                updated = await update_individual_assignment(
+                # Обновляет существующее задание или создает новое
+                event = await add_individual_assignment(
                     conn,
                     teacher_username,
                     data["student_username"],
                     data["assignment_text"],
-                    file_id,
-                    file_type,
-                    file_name
+                    file
                 )
-                
-                if not updated:
-                    # Если не нашли для обновления, создаем новое
-                    success = await create_individual_assignment(
-                        conn,
-                        teacher_username,
-                        data["student_username"],
-                        data["assignment_text"],
-                        file_id,
-                        file_type,
-                        file_name
-                    )
-                else:
-                    success = True
             else:
                 # Для классного задания - проверяем функцию перед использованием
                 try:
@@ -1184,18 +1294,15 @@ async def process_assignment_file(message: Message, state: FSMContext):
                             raise ValueError(f"Отсутствует обязательный параметр: {param}")
                     
                     # Вызываем функцию с проверкой
-                    await process_class_assignment(
+                    event = await add_class_assignment(
                         conn,
                         teacher_username,
                         data["class_name"],
                         data["assignment_text"],
-                        file_id,
-                        file_type,
-                        file_name
+                        file
                     )
-                    success = True
                 except Exception as e:
-                    print("Ошибка в process_class_assignment:")
+                    print("Ошибка в add_class_assignment:")
                     print(f"Тип ошибки: {type(e).__name__}")
                     print(f"Аргументы: {e.args}")
                     print("Стек вызова:")
@@ -1203,18 +1310,19 @@ async def process_assignment_file(message: Message, state: FSMContext):
                     traceback.print_exc()
                     raise  # Пробрасываем исключение дальше
             
-            from school_bot.handlers.universal import get_user_menu
-            if success:
+            if event is not None:
                 await conn.commit()
+                # Ученикам задание разошлет подписчик AssignmentCreated
+                await bus.publish(event)
                 await state.clear()
                 await message.answer(
                     "✅ Задание успешно сохранено!",
-                    reply_markup=await get_user_menu(str(message.from_user.username))
+                    reply_markup=get_role_menu(role)
                 )
             else:
                 await message.answer(
                     "⚠️ Не удалось сохранить задание",
-                    reply_markup=await get_user_menu(str(message.from_user.username))
+                    reply_markup=get_role_menu(role)
                 )
                 
         except Exception as e:
@@ -1232,53 +1340,372 @@ async def process_assignment_file(message: Message, state: FSMContext):
                 "⚠️ Произошла ошибка при сохранении задания\n"
                 f"Тип: {type(e).__name__}\n"
                 f"Ошибка: {str(e)}",
-                reply_markup=await get_user_menu(str(message.from_user.username))
+                reply_markup=get_role_menu(role)
             )
             await state.clear()
 
 
-def format_classes_response(classes: List[Tuple[str, Optional[str]]]) -> str:
-    """Форматирует список классов для отображения"""
+# Классов на странице списка и учеников на странице класса
+CLASSES_PER_PAGE = 10
+STUDENTS_PER_PAGE = 20
+
+TEACHER_CLASSES_HEADER = Template("teacher_classes_header", "👥 <b>Ваши классы</b> (страница {page}/{total_pages})\n\n")
+TEACHER_CLASS_ROW = Template("teacher_class_row", "🏫 <b>{class_name}</b> - учеников: {students}, в боте: {registered}\n")
+CLASS_ROSTER_HEADER = Template(
+    "class_roster_header",
+    "🏫 <b>{class_name}</b> (страница {page}/{total_pages})\n"
+    "Учеников: {students}, в боте: {registered}\n\n"
+)
+CLASS_ROSTER_ROW = Template("class_roster_row", "{number}. @{username}{name}{pending}\n")
+
+
+def roster_nav_buttons(action: RosterAction, class_id: int, page: int, has_next: bool) -> list[types.InlineKeyboardButton]:
+    """Кнопки "Назад" / "Вперед" для списков классов и учеников"""
+    buttons = []
+    if page > 0:
+        buttons.append(types.InlineKeyboardButton(
+            text="⬅️ Назад",
+            callback_data=RosterCallback(action=action, class_id=class_id, page=page - 1).pack()
+        ))
+    if has_next:
+        buttons.append(types.InlineKeyboardButton(
+            text="Вперед ➡️",
+            callback_data=RosterCallback(action=action, class_id=class_id, page=page + 1).pack()
+        ))
+    return buttons
+
+
+async def render_teacher_classes_page(teacher_username: str, page: int) -> Optional[RenderedPage]:
+    """Страница списка классов: счетчики учеников и кнопки перехода к классу"""
+    rosters = await get_teacher_class_rosters(teacher_username)
+    start_idx = page * CLASSES_PER_PAGE
+    classes = rosters[start_idx:start_idx + CLASSES_PER_PAGE]
     if not classes:
-        return "У вас пока нет классов."
-    
-    response = "🏫 <b>Ваши классы и ученики:</b>\n\n"
-    for class_name, students_str in classes:
-        response += f"<b>{class_name}</b>:\n"
-        if students_str:
-            students = students_str.split(', ')
-            response += "\n".join([f"👤 @{username}" for username in students]) + "\n\n"
-        else:
-            response += "Нет учеников\n\n"
-    return response
+        return None
+    
+    total_pages = (len(rosters) + CLASSES_PER_PAGE - 1) // CLASSES_PER_PAGE
+    has_next = start_idx + len(classes) < len(rosters)
+    response = TEACHER_CLASSES_HEADER.render(page=page + 1, total_pages=total_pages) + join(
+        (
+            TEACHER_CLASS_ROW.render(class_name=roster.class_name, students=roster.students, registered=roster.registered)
+            for roster in classes
+        ),
+        sep=""
+    )
+    
+    keyboard = [
+        [types.InlineKeyboardButton(
+            text=f"👥 {shorten(roster.class_name, 40)}",
+            callback_data=RosterCallback(action=RosterAction.STUDENTS, class_id=roster.class_id).pack()
+        )]
+        for roster in classes
+    ]
+    nav_buttons = roster_nav_buttons(RosterAction.CLASSES, 0, page, has_next)
+    if nav_buttons:
+        keyboard.append(nav_buttons)
+    keyboard.append([types.InlineKeyboardButton(
+        text="📄 Все ученики файлом",
+        callback_data=RosterCallback(action=RosterAction.DOCUMENT).pack()
+    )])
+    
+    return RenderedPage(
+        truncate(response, TEXT_LIMIT),
+        types.InlineKeyboardMarkup(inline_keyboard=keyboard),
+        has_next=has_next
+    )
 
 
-@dp.message(Command("view_classes"))
-async def view_classes(message: types.Message):
-    """Показывает список классов учителя с учениками"""
-    teacher_username = message.from_user.username
+async def render_class_roster_page(owner: tuple[str, int], page: int) -> Optional[RenderedPage]:
+    """Страница учеников одного класса (одна страница из БД)"""
+    teacher_username, class_id = owner
+    rosters = await get_teacher_class_rosters(teacher_username, class_id)
+    if not rosters:
+        return None
+    roster = rosters[0]
+    start_idx = page * STUDENTS_PER_PAGE
+    if page > 0 and start_idx >= roster.students:
+        return None
     
-    # Проверяем права доступа
-    if not await is_user_teacher(teacher_username):
-        await message.answer("⛔ Только учителя могут просматривать классы")
-        return
+    students = await get_class_students(teacher_username, class_id, limit=STUDENTS_PER_PAGE, offset=start_idx)
+    total_pages = max(1, (roster.students + STUDENTS_PER_PAGE - 1) // STUDENTS_PER_PAGE)
+    has_next = start_idx + len(students) < roster.students
+    rows = join(
+        (
+            CLASS_ROSTER_ROW.render(
+                number=i,
+                username=username,
+                name=f" - {name}" if name else "",
+                pending="" if registered else " ⏳"
+            )
+            for i, (_, username, name, registered) in enumerate(students, start_idx + 1)
+        ),
+        sep=""
+    )
+    response = CLASS_ROSTER_HEADER.render(
+        class_name=roster.class_name,
+        page=page + 1,
+        total_pages=total_pages,
+        students=roster.students,
+        registered=roster.registered
+    ) + (rows or "Нет учеников")
+    if roster.registered < roster.students:
+        response += "\n⏳ - еще не запустил бота"
+    
+    keyboard = []
+    nav_buttons = roster_nav_buttons(RosterAction.STUDENTS, class_id, page, has_next)
+    if nav_buttons:
+        keyboard.append(nav_buttons)
+    if roster.students:
+        keyboard.append([
+            types.InlineKeyboardButton(
+                text="📄 Список файлом",
+                callback_data=RosterCallback(action=RosterAction.DOCUMENT, class_id=class_id).pack()
+            ),
+            types.InlineKeyboardButton(
+                text="📊 Оценки класса",
+                callback_data=RosterCallback(action=RosterAction.GRADES, class_id=class_id).pack()
+            )
+        ])
+    keyboard.append([types.InlineKeyboardButton(
+        text="⬅️ К списку классов",
+        callback_data=RosterCallback(action=RosterAction.CLASSES).pack()
+    )])
+    
+    return RenderedPage(
+        truncate(response, TEXT_LIMIT),
+        types.InlineKeyboardMarkup(inline_keyboard=keyboard),
+        has_next=has_next
+    )
+
+
+CLASS_GRADES_HEADER = Template(
+    "class_grades_header",
+    "📊 <b>Оценки {class_name}</b> (страница {page}/{total_pages})\n"
+    "Средний балл класса: {average}\n\n"
+)
+CLASS_GRADES_ROW = Template(
+    "class_grades_row",
+    "{number}. @{username} {trend} - средний: {average}, оценок: {graded}, последние: {recent}\n"
+)
+CLASS_GRADES_EMPTY_ROW = Template("class_grades_empty_row", "{number}. @{username} - оценок нет\n")
+
+
+def format_class_grades_row(number: int, student: StudentGrades) -> Safe:
+    """Строка ученика: средний балл, тренд и последние оценки"""
+    if not student.graded:
+        return CLASS_GRADES_EMPTY_ROW.render(number=number, username=student.student_username)
+    return CLASS_GRADES_ROW.render(
+        number=number,
+        username=student.student_username,
+        trend=trend_arrow(student),
+        average=f"{student.average:.1f}",
+        graded=student.graded,
+        recent=" ".join(map(str, student.recent))
+    )
+
+
+async def render_class_grades_page(owner: tuple[str, int], page: int) -> Optional[RenderedPage]:
+    """Страница оценок класса: вся таблица считается одним запросом, страница - срез"""
+    teacher_username, class_id = owner
+    class_grades = await get_class_grades(teacher_username, class_id)
+    if class_grades is None:
+        return None
+    class_name, students = class_grades
+    start_idx = page * STUDENTS_PER_PAGE
+    if page > 0 and start_idx >= len(students):
+        return None
     
-    # Получаем и форматируем данные
-    classes = await get_teacher_classes_with_students(teacher_username)
+    graded = [student for student in students if student.graded]
+    class_average = sum(student.average * student.graded for student in graded) / max(1, sum(student.graded for student in graded))
+    total_pages = max(1, (len(students) + STUDENTS_PER_PAGE - 1) // STUDENTS_PER_PAGE)
+    has_next = start_idx + STUDENTS_PER_PAGE < len(students)
+    rows = join(
+        (
+            format_class_grades_row(i, student)
+            for i, student in enumerate(students[start_idx:start_idx + STUDENTS_PER_PAGE], start_idx + 1)
+        ),
+        sep=""
+    )
+    response = CLASS_GRADES_HEADER.render(
+        class_name=class_name,
+        page=page + 1,
+        total_pages=total_pages,
+        average=f"{class_average:.1f}" if graded else "-"
+    ) + (rows or "Нет учеников")
     
-    if not classes:
-        from school_bot.handlers.universal import get_user_menu
+    keyboard = []
+    nav_buttons = roster_nav_buttons(RosterAction.GRADES, class_id, page, has_next)
+    if nav_buttons:
+        keyboard.append(nav_buttons)
+    if graded:
+        keyboard.append([types.InlineKeyboardButton(
+            text="📄 Табель CSV",
+            callback_data=RosterCallback(action=RosterAction.REPORT, class_id=class_id).pack()
+        )])
+    keyboard.append([types.InlineKeyboardButton(
+        text="⬅️ К ученикам класса",
+        callback_data=RosterCallback(action=RosterAction.STUDENTS, class_id=class_id).pack()
+    )])
+    
+    return RenderedPage(
+        truncate(response, TEXT_LIMIT),
+        types.InlineKeyboardMarkup(inline_keyboard=keyboard),
+        has_next=has_next
+    )
+
+
+teacher_classes_pages = Paginator("teacher_classes", render_teacher_classes_page)
+class_roster_pages = Paginator("class_roster", render_class_roster_page)
+class_grades_pages = Paginator("class_grades", render_class_grades_page)
+
+
+@bus.subscribe(StudentEnrolled, inline=True)
+async def invalidate_class_lists(bot: Bot, event: StudentEnrolled) -> None:
+    """В классе новый ученик - список классов и страницы этого класса рендерятся заново"""
+    teacher_classes_pages.invalidate(event.teacher_username)
+    class_id = await get_class_id(event.teacher_username, event.class_name)
+    if class_id is not None:
+        class_roster_pages.invalidate((event.teacher_username, class_id))
+        class_grades_pages.invalidate((event.teacher_username, class_id))
+
+
+def format_roster_csv(students: list[tuple[str, str, Optional[str], bool]]) -> bytes:
+    """Ученики классов в CSV (с BOM, чтобы Excel понял кодировку)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["class", "username", "name", "registered"])
+    for class_name, username, name, registered in students:
+        writer.writerow([class_name, username, name or "", "yes" if registered else "no"])
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+@menu("👥 Мои классы")
+@router.message(Command("view_classes"))
+async def view_classes(message: types.Message, role: str):
+    """Показывает классы учителя постранично; ученики класса - по кнопке"""
+    teacher_username = message.from_user.username
+    
+    # Команда открывает список заново - берем свежие данные
+    teacher_classes_pages.invalidate(teacher_username)
+    shown = await teacher_classes_pages.show(message, teacher_username, 0, edit=False)
+    
+    if not shown:
         await message.answer(
             "У вас пока нет классов.",
-            reply_markup=await get_user_menu(str(message.from_user.username)),
+            reply_markup=get_role_menu(role),
             parse_mode="HTML"
         )
+
+
+@actions(RosterCallback, RosterAction.CLASSES)
+async def show_teacher_classes_page(callback: types.CallbackQuery, callback_data: RosterCallback):
+    """Страница списка классов (и возврат к нему из класса)"""
+    shown = await teacher_classes_pages.show(callback.message, callback.from_user.username, max(callback_data.page, 0))
+    if not shown:
+        await callback.answer("У вас пока нет классов")
+        return
+    await callback.answer()
+
+
+@actions(RosterCallback, RosterAction.STUDENTS)
+async def show_class_roster_page(callback: types.CallbackQuery, callback_data: RosterCallback):
+    """Страница учеников класса"""
+    owner = (callback.from_user.username, callback_data.class_id)
+    page = max(callback_data.page, 0)
+    if page == 0:
+        # Первая страница открывается из списка классов - берем свежие данные
+        class_roster_pages.invalidate(owner)
+    shown = await class_roster_pages.show(callback.message, owner, page)
+    if not shown:
+        await callback.answer("Класс не найден")
+        return
+    await callback.answer()
+
+
+@actions(RosterCallback, RosterAction.DOCUMENT)
+async def send_roster_document(callback: types.CallbackQuery, callback_data: RosterCallback):
+    """Отправляет учеников класса (или всех классов) CSV-файлом - без лимита длины сообщения"""
+    teacher_username = callback.from_user.username
+    class_id = callback_data.class_id or None
+    students = await get_class_students(teacher_username, class_id)
+    if not students:
+        await callback.answer("В классах пока нет учеников")
         return
     
-    response = format_classes_response(classes)
+    filename = "class_roster.csv" if class_id else "classes_roster.csv"
+    caption = f"👥 {students[0][0]}: {len(students)} учеников" if class_id else f"👥 Ученики всех классов: {len(students)}"
+    await callback.message.answer_document(
+        types.BufferedInputFile(format_roster_csv(students), filename=filename),
+        caption=truncate(caption, CAPTION_LIMIT, parse_mode=None)
+    )
+    await callback.answer()
+
+
+@actions(RosterCallback, RosterAction.GRADES)
+async def show_class_grades_page(callback: types.CallbackQuery, callback_data: RosterCallback):
+    """Страница оценок класса: средний балл, тренд и последние оценки учеников"""
+    owner = (callback.from_user.username, callback_data.class_id)
+    page = max(callback_data.page, 0)
+    if page == 0:
+        # Первая страница открывается из класса - берем свежие оценки
+        class_grades_pages.invalidate(owner)
+    shown = await class_grades_pages.show(callback.message, owner, page)
+    if not shown:
+        await callback.answer("Класс не найден")
+        return
+    await callback.answer()
+
+
+@actions(RosterCallback, RosterAction.REPORT)
+@flags.timeout(SLOW_HANDLER_TIMEOUT)
+async def send_class_report_card(callback: types.CallbackQuery, callback_data: RosterCallback):
+    """Отправляет табель класса CSV-файлом: ученики по строкам, задания по столбцам"""
+    teacher_username = callback.from_user.username
+    class_grades = await get_class_grades(teacher_username, callback_data.class_id)
+    if class_grades is None:
+        await callback.answer("Класс не найден")
+        return
     
-    await message.answer(
-        response,
-        parse_mode="HTML",
-        reply_markup=await get_user_menu(str(message.from_user.username))
-    )
\ No newline at end of file
+    class_name, students = class_grades
+    report = await class_report_card(teacher_username, class_name, students)
+    await callback.message.answer_document(
+        types.BufferedInputFile(report, filename="class_report_card.csv"),
+        caption=truncate(f"📄 Табель {class_name}: {len(students)} учеников", CAPTION_LIMIT, parse_mode=None)
+    )
+    await callback.answer()
+
+
+@router.message(Command("export"))
+@flags.timeout(SLOW_HANDLER_TIMEOUT)
+async def export_works(message: types.Message, command: CommandObject):
+    """Выгружает ZIP с работами учеников из локального архива (/export [класс])"""
+    teacher_username = message.from_user.username
+
+    if not ARCHIVE_DIR:
+        await message.answer("⚠️ Локальный архив работ отключен в настройках бота.")
+        return
+    
+    class_name = None
+    if command.args:
+        class_name = await get_original_class_name(teacher_username, command.args)
+        if not class_name:
+            await message.answer(f"Класс '{command.args.strip()}' не найден.")
+            return
+    
+    await message.answer("⏳ Собираю архив работ...")
+    
+    from school_bot.archive import SubmissionArchiver
+    zip_path, missing = await SubmissionArchiver(message.bot, ARCHIVE_DIR).export_zip(teacher_username, class_name)
+    try:
+        caption = f"📦 Работы класса {class_name}" if class_name else "📦 Все работы"
+        if missing:
+            caption += f"\n⚠ Еще не заархивировано файлов: {missing}"
+        await message.answer_document(
+            types.FSInputFile(zip_path, filename=f"works_{class_name or teacher_username}.zip"),
+            caption=caption
+        )
+    except Exception as e:
+        print(f"Ошибка отправки архива: {e}")
+        await message.answer("⚠️ Не удалось отправить архив. Возможно, он слишком большой.")
+    finally:
+        zip_path.unlink(missing_ok=True)
@@ -1,19 +1,29 @@
-from aiogram import types
+from aiogram import types, Router
 from aiogram.filters import Command
-from aiogram import F
 from aiogram.fsm.context import FSMContext
-from aiogram.types import ReplyKeyboardRemove
 
-from school_bot.config import DIRECTOR_USERNAME
 from school_bot.db.controllers import get_active_assignments, register_user
-from school_bot.db.students import is_user_student
-from school_bot.db.teachers import is_user_teacher
 from school_bot.db.database import get_db_connection
-from main import dp
+from school_bot.db.roles import DIRECTOR, GUEST, TEACHER
+from school_bot.keyboards import MenuButtons, get_role_menu, get_student_main_menu, get_teacher_main_menu
+from school_bot.templates import TEXT_LIMIT, Template, join, shorten, truncate
 
 
-@dp.message(Command("start"))
-async def universal_start(message: types.Message):
+router = Router(name="universal")
+menu = MenuButtons(router)
+
+# Команды, закрытые фильтрами ролей в роутерах teacher и student. Если апдейт
+# дошел до universal, у пользователя нет нужной роли - отвечаем, а не молчим.
+ROLE_COMMANDS = (
+    "view_completed", "grade_queue", "bulk_grade", "notifications", "create_class", "add_student", "give_assignment", "view_classes", "export", "db_report",
+    "my_assignments", "my_classes", "grades", "report_card", "submit_assignment", "search",
+)
+
+WELCOME_ASSIGNMENT = Template("welcome_assignment", "{number}. {text} (от {assigned_at})")
+
+
+@router.message(Command("start"))
+async def universal_start(message: types.Message, role: str):
     user = message.from_user
     
     if not user.username:
@@ -21,15 +31,12 @@ async def universal_start(message: types.Message):
         return
     
     async with get_db_connection() as conn:
-        is_teacher = await is_user_teacher(user.username, conn)
-        is_director = user.username == DIRECTOR_USERNAME
-        print(is_teacher, is_director)
+        is_teacher = role == TEACHER
+        is_director = role == DIRECTOR
 
         await register_user(conn, user.username, message.chat.id, is_teacher or is_director)
         
         if is_teacher or is_director:
-            from school_bot.handlers.teacher import get_teacher_main_menu
-            
             role = "директора" if is_director else "учителя"
             await message.answer(
                 f"👔 <b>Панель {role}</b>\n\n"
@@ -47,65 +54,43 @@ async def universal_start(message: types.Message):
     
     if active_assignments:
         welcome_msg += f"🔔 У вас {len(active_assignments)} активных заданий:\n"
-        for i, (_, text, _, assigned_at, _) in enumerate(active_assignments, 1):
-            assignment_text = (text[:30] + '...') if len(text) > 30 else text
-            welcome_msg += f"{i}. {assignment_text} (от {assigned_at[:10]})\n"
-        welcome_msg += "\n"
+        welcome_msg += join(
+            WELCOME_ASSIGNMENT.render(number=i, text=shorten(text, 30), assigned_at=assigned_at[:10])
+            for i, (_, text, _, assigned_at, *_) in enumerate(active_assignments, 1)
+        )
+        welcome_msg += "\n\n"
     
     welcome_msg += "Выберите действие из меню ниже:"
     
-    from school_bot.handlers.student import get_student_main_menu
     await message.answer(
-        welcome_msg,
+        truncate(welcome_msg, TEXT_LIMIT),
         reply_markup=get_student_main_menu(),
         parse_mode="HTML"
     )
 
 
-@dp.message(F.text == "🔄 Обновить")
-async def student_refresh_menu(message: types.Message):
-    await universal_start(message)
-
-
-async def get_user_menu(username: str) -> types.ReplyKeyboardMarkup:
-    """
-    Возвращает соответствующую клавиатуру меню для пользователя
-    с учетом его роли (директор, учитель, ученик)
-    
-    Args:
-        username: Telegram username пользователя (без @)
-        
-    Returns:
-        ReplyKeyboardMarkup: Клавиатура меню или ReplyKeyboardRemove()
-    """
-    if not username:
-        return types.ReplyKeyboardRemove()
-    
-    # Проверяем директора (самый частый случай)
-    if username == DIRECTOR_USERNAME:
-        from school_bot.handlers.teacher import get_teacher_main_menu
-        return get_teacher_main_menu(is_director=True)
-    
-    async with get_db_connection() as conn:
-        # Проверяем учителя (включая директора)
-        is_teacher = await is_user_teacher(username, conn)
-        if is_teacher:
-            from school_bot.handlers.teacher import get_teacher_main_menu
-            return get_teacher_main_menu(is_director=False)
-        
-        # Проверяем ученика
-        is_student = await is_user_student(username, conn)
-        if is_student:
-            from school_bot.handlers.student import get_student_main_menu
-            return get_student_main_menu()
-    
-    return types.ReplyKeyboardRemove()
+@menu("🔄 Обновить")
+async def student_refresh_menu(message: types.Message, role: str):
+    await universal_start(message, role)
 
 
-@dp.message(F.text == "❌ Отмена")
-async def universal_cancel_action(message: types.Message, state: FSMContext):
+@menu("❌ Отмена")
+async def universal_cancel_action(message: types.Message, state: FSMContext, role: str):
     await state.clear()
     await message.answer(
         "Действие отменено.",
-        reply_markup=await get_user_menu(str(message.from_user.username))
-    )
\ No newline at end of file
+        reply_markup=get_role_menu(role)
+    )
+
+
+@router.message(Command(*ROLE_COMMANDS))
+async def role_command_denied(message: types.Message, role: str):
+    if role == GUEST:
+        await message.answer("Сначала зарегистрируйтесь: отправьте /start")
+        return
+    await message.answer("⛔ Эта команда недоступна для вашей роли", reply_markup=get_role_menu(role))
+
+@router.callback_query()
+async def stale_callback(callback: types.CallbackQuery):
+    """Кнопки старого формата или версии (см. school_bot/callbacks.py)"""
+    await callback.answer("Кнопка устарела. Откройте список заново.")
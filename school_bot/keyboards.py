@@ -0,0 +1,129 @@
+from typing import Any, Callable, Union
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.types import KeyboardButton, Message, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from aiogram.utils.keyboard import ReplyKeyboardBuilder
+
+from school_bot.db.roles import DIRECTOR, STUDENT, TEACHER
+
+
+# school_bot/keyboards.py
+
+
+def get_teacher_main_menu(is_director: bool = False) -> ReplyKeyboardMarkup:
+    """Возвращает основное меню учителя или расширенное меню директора"""
+    builder = ReplyKeyboardBuilder()
+    
+    # Общие кнопки для всех учителей
+    builder.row(
+        KeyboardButton(text="📝 Дать задание"),
+        KeyboardButton(text="👥 Мои классы")
+    )
+    builder.row(
+        KeyboardButton(text="📊 Проверка работ"),
+        KeyboardButton(text="🎯 Проверка по очереди")
+    )
+    
+    if is_director:
+        # Дополнительные кнопки только для директора
+        builder.row(
+            KeyboardButton(text="👨‍🏫 Добавить учителя"),
+            KeyboardButton(text="🏫 Управление школой")
+        )
+    else:
+        # Кнопки для обычных учителей
+        builder.row(
+            KeyboardButton(text="➕ Создать класс"),
+            KeyboardButton(text="🎓 Добавить ученика")
+        )
+    builder.row(
+        KeyboardButton(text="📋 Оценки списком"),
+        KeyboardButton(text="🔄 Обновить")
+    )
+    
+    return builder.as_markup(
+        resize_keyboard=True,
+        input_field_placeholder="Выберите действие"
+    )
+
+def get_teacher_cancel_menu() -> ReplyKeyboardMarkup:
+    builder = ReplyKeyboardBuilder()
+    builder.add(KeyboardButton(text="❌ Отмена"))
+    return builder.as_markup(resize_keyboard=True)
+
+
+def get_student_main_menu() -> ReplyKeyboardMarkup:
+    """Главное меню ученика с кнопкой информации о школе"""
+    builder = ReplyKeyboardBuilder()
+    builder.row(
+        KeyboardButton(text="📚 Мои задания"),
+        KeyboardButton(text="🏫 Мои классы")
+    )
+    builder.row(
+        KeyboardButton(text="📤 Отправить работу"),
+        KeyboardButton(text="🏛️ О школе")
+    )
+    builder.row(
+        KeyboardButton(text="📒 Мои оценки"),
+        KeyboardButton(text="📅 Расписание")
+    )
+    builder.row(KeyboardButton(text="🔄 Обновить"))
+    return builder.as_markup(resize_keyboard=True)
+
+
+def get_student_cancel_menu() -> ReplyKeyboardMarkup:
+    builder = ReplyKeyboardBuilder()
+    builder.add(KeyboardButton(text="❌ Отмена"))
+    return builder.as_markup(resize_keyboard=True)
+
+
+def get_role_menu(role: str) -> Union[ReplyKeyboardMarkup, ReplyKeyboardRemove]:
+    """
+    Возвращает клавиатуру главного меню для роли пользователя
+    (роль определяет RoleMiddleware, см. school_bot/roles.py)
+    
+    Args:
+        role: Роль пользователя (director, teacher, student, guest)
+        
+    Returns:
+        ReplyKeyboardMarkup: Клавиатура меню или ReplyKeyboardRemove()
+    """
+    if role in (DIRECTOR, TEACHER):
+        return get_teacher_main_menu(is_director=role == DIRECTOR)
+    if role == STUDENT:
+        return get_student_main_menu()
+    return ReplyKeyboardRemove()
+
+
+class MenuButtons:
+    """Кнопки reply-клавиатуры роутера: один хэндлер и поиск действия по словарю
+
+    Вместо цепочки хэндлеров F.text == "..." (фильтры проверяются по очереди
+    для каждого сообщения) текст кнопки ищется в словаре за O(1). Действие
+    вызывается с теми же аргументами, что и обычный хэндлер (state, role, ...).
+
+    Пример:
+        menu = MenuButtons(router)
+
+        @menu("📚 Мои задания")
+        async def view_assignments(message: Message): ...
+    """
+
+    def __init__(self, router: Router):
+        self._actions: dict[str, CallableObject] = {}
+        router.message.register(self._dispatch, self._match)
+
+    def __call__(self, text: str) -> Callable:
+        def decorator(callback: Callable) -> Callable:
+            self._actions[text] = CallableObject(callback)
+            return callback
+        return decorator
+
+    def _match(self, message: Message) -> Union[bool, dict[str, Any]]:
+        action = self._actions.get(message.text)
+        return {"action_handler": action} if action else False
+
+    @staticmethod
+    async def _dispatch(message: Message, action_handler: CallableObject, **data: Any) -> Any:
+        return await action_handler.call(message, **data)
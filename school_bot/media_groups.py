@@ -0,0 +1,43 @@
+import asyncio
+from typing import Optional
+
+from aiogram.types import Message
+
+
+# Сколько ждать следующих сообщений альбома (секунды)
+MEDIA_GROUP_WINDOW = 1.0
+
+
+class MediaGroupBuffer:
+    """Собирает сообщения одного альбома (media_group_id) в один список
+
+    Telegram присылает каждый файл альбома отдельным апдейтом. Первый апдейт
+    альбома ждет, пока в течение окна перестанут приходить новые сообщения,
+    и получает весь альбом; остальные апдейты получают None и должны
+    завершить обработку.
+    """
+
+    def __init__(self, window: float = MEDIA_GROUP_WINDOW):
+        self.window = window
+        self._groups: dict[tuple[int, str], list[Message]] = {}
+
+    async def collect(self, message: Message) -> Optional[list[Message]]:
+        """Возвращает все сообщения альбома или None, если альбом обрабатывается другим апдейтом"""
+        if not message.media_group_id:
+            return [message]
+
+        key = (message.chat.id, message.media_group_id)
+        if key in self._groups:
+            self._groups[key].append(message)
+            return None
+
+        self._groups[key] = [message]
+        try:
+            seen = 0
+            while seen != len(self._groups[key]):
+                seen = len(self._groups[key])
+                await asyncio.sleep(self.window)
+        finally:
+            messages = self._groups.pop(key)
+
+        return sorted(messages, key=lambda m: m.message_id)
@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних замеров хранить для расчета перцентилей
+SAMPLE_WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelsKey = tuple[tuple[str, str], ...]
+
+
+class Summary:
+    """Счетчик и сумма за все время + скользящее окно для перцентилей"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples: deque[float] = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRegistry:
+    """Простое хранилище метрик в памяти процесса"""
+
+    def __init__(self):
+        self.summaries: Dict[str, Dict[LabelsKey, Summary]] = {}
+        self.counters: Dict[str, Dict[LabelsKey, float]] = {}
+        self.gauges: Dict[str, Dict[LabelsKey, float]] = {}
+        self.help: Dict[str, str] = {}
+
+    @staticmethod
+    def _key(labels: Optional[dict]) -> LabelsKey:
+        return tuple(sorted((labels or {}).items()))
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None) -> None:
+        series = self.summaries.setdefault(name, {})
+        key = self._key(labels)
+        if key not in series:
+            series[key] = Summary()
+        series[key].observe(value)
+
+    def inc(self, name: str, labels: Optional[dict] = None, amount: float = 1) -> None:
+        series = self.counters.setdefault(name, {})
+        key = self._key(labels)
+        series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, labels: Optional[dict] = None) -> None:
+        self.gauges.setdefault(name, {})[self._key(labels)] = value
+
+    def describe(self, name: str, text: str) -> None:
+        self.help[name] = text
+
+    def render_prometheus(self) -> str:
+        """Формирует текст в формате Prometheus exposition"""
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(self.gauges.items()):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(self.summaries.items()):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} summary")
+            for key, summary in sorted(series.items()):
+                for q in QUANTILES:
+                    lines.append(f"{name}{_format_labels(key + (('quantile', str(q)),))} {summary.quantile(q):.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {summary.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {summary.total:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self, limit: int = 10) -> list[str]:
+        """Краткая сводка: самые медленные серии по p95 для каждой метрики"""
+        lines = []
+        for name, series in sorted(self.summaries.items()):
+            slowest = sorted(series.items(), key=lambda item: item[1].quantile(0.95), reverse=True)
+            for key, summary in slowest[:limit]:
+                label = ",".join(f"{k}={v}" for k, v in key) or "-"
+                lines.append(
+                    f"{name}[{label}] n={summary.count} "
+                    f"p50={summary.quantile(0.5) * 1000:.1f}ms "
+                    f"p95={summary.quantile(0.95) * 1000:.1f}ms "
+                    f"p99={summary.quantile(0.99) * 1000:.1f}ms"
+                )
+        for name, series in sorted(self.counters.items()):
+            total = sum(series.values())
+            lines.append(f"{name} total={total:g}")
+        for name, series in sorted(self.gauges.items()):
+            for key, value in sorted(series.items()):
+                label = ",".join(f"{k}={v}" for k, v in key) or "-"
+                lines.append(f"{name}[{label}] {value:g}")
+        return lines
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _format_labels(key: LabelsKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in key) + "}"
+
+
+metrics = MetricsRegistry()
+metrics.describe("bot_update_seconds", "Время обработки апдейта по типу")
+metrics.describe("bot_handler_seconds", "Время работы хэндлера")
+metrics.describe("bot_handler_errors_total", "Исключения в хэндлерах")
+metrics.describe("db_statement_seconds", "Время выполнения SQL-запросов")
+metrics.describe("telegram_api_seconds", "Время запросов к Telegram Bot API")
+metrics.describe("telegram_api_calls_total", "Количество запросов к Telegram Bot API")
+metrics.describe("telegram_api_errors_total", "Ошибки запросов к Telegram Bot API")
+metrics.describe("telegram_api_retry_after_total", "Ответы 429 (flood control) от Telegram")
+metrics.describe("telegram_send_queue_depth", "Запросы, ожидающие отправки, по очередям")
+metrics.describe("telegram_send_wait_seconds", "Время ожидания в очереди отправки")
+metrics.describe("telegram_send_retries_total", "Повторные отправки после retry_after")
+metrics.describe("bot_startup_seconds", "Время этапов запуска бота")
+metrics.describe("pagination_pages_total", "Страницы списков: из кэша (hit) и отрендеренные заново (miss)")
+metrics.describe("pagination_edits_total", "Показ страниц: правка текста, только кнопок, пропуск или новое сообщение")
+metrics.describe("template_renders_total", "Рендер шаблонов сообщений: из кэша (hit) и заново (miss)")
+metrics.describe("grading_queue_grades_total", "Оценки, поставленные в режиме проверки по очереди")
+metrics.describe("grading_queue_batch_size", "Сколько оценок записано в БД одной транзакцией")
+metrics.describe("teacher_digests_total", "Сводки новых работ, отправленные учителям, по результату")
+metrics.describe("domain_events_total", "Опубликованные доменные события по типу")
+metrics.describe("event_bus_queue_depth", "События, ожидающие обработки, по подписчикам")
+metrics.describe("event_bus_handler_seconds", "Время обработки события подписчиком")
+metrics.describe("event_bus_errors_total", "Исключения в подписчиках шины событий")
+metrics.describe("updates_deduplicated_total", "Повторно доставленные апдейты, которые не обрабатывались")
+metrics.describe("update_id_resets_total", "Сбросы отметки update_id: Telegram начал нумерацию апдейтов заново")
+metrics.describe("submission_notifications_total", "Уведомления учителю о сданной работе: отправлено (sent), в сводку (digest), ошибка (failed), повтор (duplicate)")
+metrics.describe("update_wait_seconds", "Ожидание апдейта в очереди своего чата и общего лимита обработки")
+metrics.describe("update_chat_locks", "Чаты, у которых есть апдейты в обработке или в ожидании")
+metrics.describe("bot_handler_timeouts_total", "Хэндлеры, прерванные по таймауту")
+metrics.describe("class_overview_cache_total", "Сводка ученика по классам: из кэша (hit) и из БД (miss)")
+metrics.describe("grade_book_cache_total", "Дневник ученика: из кэша (hit) и из БД (miss)")
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware: общее время обработки каждого апдейта"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            update_type = getattr(event, "event_type", type(event).__name__)
+            metrics.observe("bot_update_seconds", time.perf_counter() - start, {"type": update_type})
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: время и ошибки каждого хэндлера"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # Кнопки меню и inline-кнопки идут через один хэндлер (MenuButtons,
+        # CallbackActions), метка - по действию
+        handler_object = data.get("action_handler") or data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.inc("bot_handler_errors_total", {"handler": name})
+            raise
+        finally:
+            metrics.observe("bot_handler_seconds", time.perf_counter() - start, {"handler": name})
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии: количество, время и ошибки запросов к Bot API"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        metrics.inc("telegram_api_calls_total", {"method": name})
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            metrics.inc("telegram_api_retry_after_total", {"method": name})
+            raise
+        except Exception as e:
+            metrics.inc("telegram_api_errors_total", {"method": name, "error": type(e).__name__})
+            raise
+        finally:
+            metrics.observe("telegram_api_seconds", time.perf_counter() - start, {"method": name})
+
+
+def setup_metrics(dp: Dispatcher, bot: Bot) -> None:
+    """Подключает сбор метрик к диспетчеру и сессии бота"""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    bot.session.middleware(ApiMetricsMiddleware())
+
+
+async def start_metrics_server(host: str, port: int):
+    """Запускает HTTP-эндпоинт /metrics в формате Prometheus"""
+    from aiohttp import web
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics endpoint: http://%s:%s/metrics", host, port)
+    return runner
+
+
+async def log_metrics_periodically(interval: float) -> None:
+    """Периодически пишет в лог сводку p50/p95/p99"""
+    while True:
+        await asyncio.sleep(interval)
+        lines = metrics.summary_lines()
+        if lines:
+            logger.info("Metrics summary:\n%s", "\n".join(lines))
@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from school_bot.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько отправленных страниц помнить для пропуска пустых правок
+MAX_TRACKED_MESSAGES = 10_000
+
+
+def _digest(value: str) -> str:
+    return hashlib.blake2b(value.encode(), digest_size=16).hexdigest()
+
+
+@dataclass(frozen=True)
+class RenderedPage:
+    """Готовая страница: текст, клавиатура и есть ли следующая"""
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+    has_next: bool = False
+
+    def digests(self) -> tuple[str, str]:
+        markup = self.reply_markup.model_dump_json(exclude_none=True) if self.reply_markup else ""
+        return _digest(self.text), _digest(markup)
+
+
+PageRenderer = Callable[[Hashable, int], Awaitable[Optional[RenderedPage]]]
+
+
+class Paginator:
+    """Постраничный вывод списка в одном сообщении
+
+    - страница правится на месте (edit_text, или edit_reply_markup, если
+      поменялись только кнопки) вместо удаления и новой отправки;
+    - по хэшу текста и клавиатуры пропускаются правки, которые ничего
+      не меняют (повторное нажатие той же кнопки);
+    - после показа страницы следующая рендерится в фоне, так что
+      перелистывание - это один запрос к Bot API без ожидания БД.
+
+    render(owner, page) возвращает RenderedPage или None, если страницы нет.
+    owner - ключ владельца списка (например, username учителя); кэш страниц
+    владельца сбрасывается через invalidate() при изменении данных.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        render: PageRenderer,
+        ttl: float = 30.0,
+        cache_size: int = 512,
+        prefetch: bool = True,
+        parse_mode: Optional[str] = "HTML"
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.prefetch = prefetch
+        self.parse_mode = parse_mode
+        self._render = render
+        self._pages: OrderedDict[tuple[Hashable, int], tuple[float, asyncio.Task]] = OrderedDict()
+        self._shown: OrderedDict[tuple[int, int], tuple[str, str]] = OrderedDict()
+
+    def invalidate(self, owner: Hashable) -> None:
+        """Сбрасывает закэшированные страницы владельца"""
+        for key in [key for key in self._pages if key[0] == owner]:
+            del self._pages[key]
+
+    def _fresh(self, key: tuple[Hashable, int]) -> Optional[asyncio.Task]:
+        entry = self._pages.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def _start_render(self, key: tuple[Hashable, int]) -> asyncio.Task:
+        task = asyncio.ensure_future(self._render(*key))
+        task.add_done_callback(lambda done: self._forget_failed(key, done))
+        self._pages[key] = (time.monotonic(), task)
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.cache_size:
+            self._pages.popitem(last=False)
+        return task
+
+    def _forget_failed(self, key: tuple[Hashable, int], task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is not None:
+            if self._pages.get(key, (None, None))[1] is task:
+                del self._pages[key]
+            if not task.cancelled():
+                logger.warning("Page %s of %s failed to render: %s", key, self.name, task.exception())
+
+    async def get_page(self, owner: Hashable, page: int) -> Optional[RenderedPage]:
+        """Возвращает страницу из кэша (или рендерит) и запускает предзагрузку следующей"""
+        key = (owner, page)
+        task = self._fresh(key)
+        if task is None:
+            metrics.inc("pagination_pages_total", {"paginator": self.name, "result": "miss"})
+            task = self._start_render(key)
+        else:
+            metrics.inc("pagination_pages_total", {"paginator": self.name, "result": "hit"})
+            self._pages.move_to_end(key)
+
+        rendered = await asyncio.shield(task)
+        if rendered is not None and rendered.has_next and self.prefetch and self._fresh((owner, page + 1)) is None:
+            self._start_render((owner, page + 1))
+        return rendered
+
+    def _remember(self, message: Message, digests: tuple[str, str]) -> None:
+        key = (message.chat.id, message.message_id)
+        self._shown[key] = digests
+        self._shown.move_to_end(key)
+        while len(self._shown) > MAX_TRACKED_MESSAGES:
+            self._shown.popitem(last=False)
+
+    def _displayed(self, message: Message) -> Optional[tuple[str, str]]:
+        """Хэши того, что сейчас показано в сообщении"""
+        shown = self._shown.get((message.chat.id, message.message_id))
+        if shown is None and message.text is not None:
+            # Сообщение отправлено до перезапуска - сравниваем с ним самим
+            page = RenderedPage(message.html_text, message.reply_markup)
+            shown = page.digests()
+        return shown
+
+    async def show(self, message: Message, owner: Hashable, page: int, edit: bool = True) -> Optional[RenderedPage]:
+        """Показывает страницу: правит message (edit=True) или отправляет новое сообщение
+
+        Сообщения без текста (работа с файлом) править через edit_text нельзя -
+        для них отправляется новое сообщение, а старое удаляется.
+        """
+        rendered = await self.get_page(owner, page)
+        if rendered is None:
+            return None
+        digests = rendered.digests()
+
+        if edit and message.text is not None:
+            shown = self._displayed(message)
+            if shown == digests:
+                metrics.inc("pagination_edits_total", {"paginator": self.name, "result": "skipped"})
+                return rendered
+            try:
+                if shown is not None and shown[0] == digests[0]:
+                    await message.edit_reply_markup(reply_markup=rendered.reply_markup)
+                    result = "markup"
+                else:
+                    await message.edit_text(
+                        rendered.text,
+                        reply_markup=rendered.reply_markup,
+                        parse_mode=self.parse_mode
+                    )
+                    result = "text"
+            except TelegramBadRequest as e:
+                if "message is not modified" not in str(e):
+                    raise
+                result = "skipped"
+            metrics.inc("pagination_edits_total", {"paginator": self.name, "result": result})
+            self._remember(message, digests)
+            return rendered
+
+        if edit:
+            try:
+                await message.delete()
+            except TelegramBadRequest as e:
+                logger.debug("Could not delete message %s: %s", message.message_id, e)
+        sent = await message.answer(rendered.text, reply_markup=rendered.reply_markup, parse_mode=self.parse_mode)
+        metrics.inc("pagination_edits_total", {"paginator": self.name, "result": "sent"})
+        self._remember(sent, digests)
+        return rendered
@@ -1,9 +1,6 @@
 import re
 from typing import Dict, List, Optional
 
-import httpx
-from bs4 import BeautifulSoup
-
 from school_bot.config import SCHOOL_URL
 
 
@@ -17,6 +14,9 @@ async def parse_school_info() -> Dict[str, Optional[str]]:
         'email': None,
         'description': None
     }
+    # httpx и bs4 нужны только здесь - не тянем их при старте бота
+    import httpx
+    from bs4 import BeautifulSoup
     
     try:
         async with httpx.AsyncClient(timeout=10.0) as client:
@@ -91,6 +91,9 @@ async def parse_school_info() -> Dict[str, Optional[str]]:
 
 async def parse_school_schedule() -> List[Dict[str, str]]:
     """Парсит все PDF с расписанием с сайта школы"""
+    import httpx
+    from bs4 import BeautifulSoup
+
     try:
         async with httpx.AsyncClient(timeout=20.0) as client:  # Увеличиваем таймаут для загрузки файлов
             # Получаем страницу с расписанием
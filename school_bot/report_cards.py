@@ -0,0 +1,92 @@
+import asyncio
+import csv
+import io
+from typing import Optional
+
+from school_bot.db.gradebook import (
+    GradeStats,
+    StudentGrades,
+    get_class_report_rows,
+    get_student_grade_book,
+    get_student_report_rows,
+)
+
+
+# На сколько баллов последние оценки должны отличаться от среднего, чтобы считаться трендом
+TREND_THRESHOLD = 0.3
+
+
+def trend_arrow(stats: GradeStats) -> str:
+    """↑ - последние оценки выше среднего, ↓ - ниже, → - без изменений"""
+    if stats.trend > TREND_THRESHOLD:
+        return "↑"
+    if stats.trend < -TREND_THRESHOLD:
+        return "↓"
+    return "→"
+
+
+def _number(value: Optional[float]) -> str:
+    return "" if value is None else f"{value:.2f}"
+
+
+def _stats_columns(stats: GradeStats) -> list:
+    return [stats.graded, _number(stats.average), _number(stats.recent_average), trend_arrow(stats) if stats.graded else ""]
+
+
+def _encode(buffer: io.StringIO) -> bytes:
+    # BOM - чтобы Excel понял кодировку
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+def build_student_report_card(rows: list[tuple], grade_book: tuple) -> bytes:
+    """Табель ученика: все оценки по порядку, ниже - итоги по классам"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["class", "teacher", "assignment", "submitted_at", "grade"])
+    for class_name, teacher_username, text, submitted_at, grade in rows:
+        writer.writerow([class_name or "", teacher_username, text, submitted_at, grade])
+    writer.writerow([])
+    writer.writerow(["class", "teacher", "graded", "average", "recent_average", "trend"])
+    for subject in grade_book:
+        writer.writerow([subject.class_name or "", subject.teacher_username, *_stats_columns(subject)])
+    return _encode(buffer)
+
+
+def build_class_report_card(students: list[StudentGrades], rows: list[tuple[str, int, str, str, int]]) -> bytes:
+    """Табель класса: ученики по строкам, задания по столбцам, итоги в конце строки"""
+    # class_assignment_id -> (столбец, текст, дата выдачи)
+    assignments: dict[int, tuple[int, str, str]] = {}
+    grades: dict[tuple[str, int], int] = {}
+    for username, class_assignment_id, text, assigned_at, grade in rows:
+        column, _, _ = assignments.setdefault(class_assignment_id, (len(assignments), text, assigned_at))
+        grades[username, column] = grade
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([
+        "username", "name",
+        *(f"{text} ({assigned_at[:10]})" for _, text, assigned_at in assignments.values()),
+        "graded", "average", "recent_average", "trend"
+    ])
+    for student in students:
+        writer.writerow([
+            student.student_username, student.student_name or "",
+            *(grades.get((student.student_username, column), "") for column in range(len(assignments))),
+            *_stats_columns(student)
+        ])
+    return _encode(buffer)
+
+
+async def student_report_card(student_username: str) -> Optional[bytes]:
+    """CSV-табель ученика (None - оценок пока нет); файл собирается в отдельном потоке"""
+    rows = await get_student_report_rows(student_username)
+    if not rows:
+        return None
+    grade_book = await get_student_grade_book(student_username)
+    return await asyncio.to_thread(build_student_report_card, rows, grade_book)
+
+
+async def class_report_card(teacher_username: str, class_name: str, students: list[StudentGrades]) -> bytes:
+    """CSV-табель класса; файл собирается в отдельном потоке"""
+    rows = await get_class_report_rows(teacher_username, class_name)
+    return await asyncio.to_thread(build_class_report_card, students, rows)
@@ -0,0 +1,48 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.filters import BaseFilter
+from aiogram.types import TelegramObject
+
+from school_bot.db.roles import GUEST, get_user_role
+
+
+logger = logging.getLogger(__name__)
+
+
+class RoleMiddleware(BaseMiddleware):
+    """Определяет роль пользователя один раз на апдейт и кладет ее в data["role"]
+
+    Хэндлеры и фильтры роутеров получают роль аргументом `role` и не ходят
+    в БД сами.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        try:
+            data["role"] = await get_user_role(user.username if user else None)
+        except Exception as e:
+            logger.warning("Failed to resolve role for %s: %s", user and user.username, e)
+            data["role"] = GUEST
+        return await handler(event, data)
+
+
+class RoleFilter(BaseFilter):
+    """Пропускает апдейт, если роль пользователя входит в перечисленные"""
+
+    def __init__(self, *roles: str):
+        self.roles = frozenset(roles)
+
+    async def __call__(self, event: TelegramObject, role: str = GUEST) -> bool:
+        return role in self.roles
+
+
+def setup_roles(dp: Dispatcher) -> None:
+    """Подключает определение роли пользователя к диспетчеру"""
+    dp.update.outer_middleware(RoleMiddleware())
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.flags import extract_flags_from_object
+from aiogram.types import CallbackQuery, Message, TelegramObject, Update
+
+from school_bot.config import HANDLER_TIMEOUT, UPDATE_CONCURRENCY
+from school_bot.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_REPLY = "⏳ Запрос выполнялся слишком долго и был прерван. Попробуйте позже."
+
+
+class ChatSerializerMiddleware(BaseMiddleware):
+    """Внешний middleware: апдейты одного чата по очереди, разных чатов - параллельно
+
+    - у каждого чата свой asyncio.Lock - номер задания и следующий за ним
+      ответ не гоняются за состояние FSM;
+    - замки лежат в WeakValueDictionary: запись живет, пока у чата есть
+      апдейты в обработке или в ожидании, и исчезает сама;
+    - одновременно обрабатывается не больше concurrency апдейтов; место
+      занимается уже после замка чата, так что очередь одного чата не
+      отнимает места у других;
+    - сообщения альбома не сериализуются: первое из них ждет остальные
+      (см. MediaGroupBuffer).
+    """
+
+    def __init__(self, concurrency: int = UPDATE_CONCURRENCY):
+        self._locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+        self._slots = asyncio.Semaphore(concurrency)
+
+    @staticmethod
+    def _key(event: Update, data: Dict[str, Any]) -> Optional[int]:
+        if event.message is not None and event.message.media_group_id:
+            return None
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        return chat.id if chat else (user.id if user else None)
+
+    def _lock(self, key: int) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        key = self._key(event, data) if isinstance(event, Update) else None
+        start = time.perf_counter()
+        if key is None:
+            async with self._slots:
+                return await self._run(handler, event, data, start)
+
+        lock = self._lock(key)
+        metrics.set("update_chat_locks", len(self._locks))
+        async with lock:
+            async with self._slots:
+                return await self._run(handler, event, data, start)
+
+    async def _run(self, handler, event: TelegramObject, data: Dict[str, Any], start: float) -> Any:
+        metrics.observe("update_wait_seconds", time.perf_counter() - start)
+        return await handler(event, data)
+
+
+class HandlerTimeoutMiddleware(BaseMiddleware):
+    """Внутренний middleware: хэндлер прерывается через timeout секунд
+
+    Свой лимит задается флагом хэндлера:
+
+        @menu("📅 Расписание")
+        @flags.timeout(120)
+        async def send_schedule(message: Message): ...
+
+    Для кнопок меню и inline-кнопок флаг берется с самого действия.
+    """
+
+    def __init__(self, timeout: float = HANDLER_TIMEOUT):
+        self.timeout = timeout
+
+    def _timeout(self, data: Dict[str, Any]) -> tuple[str, float]:
+        handler_object = data.get("action_handler") or data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        flags = getattr(handler_object, "flags", None) or extract_flags_from_object(callback)
+        return getattr(callback, "__name__", "unknown"), flags.get("timeout", self.timeout)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        name, timeout = self._timeout(data)
+        try:
+            return await asyncio.wait_for(handler(event, data), timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("bot_handler_timeouts_total", {"handler": name})
+            logger.warning("Handler %s timed out after %ss", name, timeout)
+            await self._reply(event)
+            return None
+
+    @staticmethod
+    async def _reply(event: TelegramObject) -> None:
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer(TIMEOUT_REPLY)
+            elif isinstance(event, Message):
+                await event.answer(TIMEOUT_REPLY)
+        except Exception as e:
+            logger.debug("Could not report handler timeout: %s", e)
+
+
+def setup_scheduling(dp: Dispatcher) -> None:
+    """Подключает очередность апдейтов по чатам и таймауты хэндлеров"""
+    dp.update.outer_middleware(ChatSerializerMiddleware())
+    dp.message.middleware(HandlerTimeoutMiddleware())
+    dp.callback_query.middleware(HandlerTimeoutMiddleware())
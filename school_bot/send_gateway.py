@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject
+
+from school_bot.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Методы, на которые распространяются лимиты Telegram на отправку
+_LIMITED_PREFIXES = ("Send", "Copy", "Forward", "Edit")
+_UNLIMITED_METHODS = {"SendChatAction"}
+# Правки на месте (страницы, очередь проверки) идут только по общему лимиту:
+# лимит чата рассчитан на новые сообщения, а шаг листания - одна дешевая правка
+_CHAT_EXEMPT_PREFIXES = ("Edit",)
+
+# Сколько ведер для отдельных чатов держать в памяти
+MAX_CHAT_BUCKETS = 10_000
+
+# Чат, апдейт которого сейчас обрабатывается: ответы в него - интерактивные
+_current_chat: ContextVar[Optional[int]] = ContextVar("current_chat", default=None)
+
+
+class TokenBucket:
+    """Ведро токенов с резервированием: reserve() сразу возвращает задержку
+
+    Токены могут уходить в минус - так следующие вызовы получают задержку
+    с учетом уже выданных, и порядок отправки сохраняется.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= cost
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def delay(self) -> float:
+        """Через сколько секунд в ведре появится целый токен"""
+        self._refill(time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Запрещает отправку на seconds секунд (после retry_after)"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+class SendGateway(BaseRequestMiddleware):
+    """Middleware сессии, через которое проходят все отправки сообщений
+
+    - общий лимит на бота и отдельный лимит на каждый чат (ведра токенов);
+      правки сообщений (Edit*) - только по общему, ответы на кнопки - без лимита;
+    - две очереди: ответы в чат, чей апдейт сейчас обрабатывается
+      (interactive), обслуживаются раньше уведомлений в другие чаты (bulk);
+    - на TelegramRetryAfter чат ставится на паузу, запрос повторяется;
+    - глубина очередей и время ожидания пишутся в метрики.
+
+    Подключать до ApiMetricsMiddleware, чтобы метрики API видели каждую
+    попытку отдельно, а не время в очереди.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 28.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_retries: int = 3
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets: OrderedDict[Any, TokenBucket] = OrderedDict()
+        self._lanes: Dict[str, deque[tuple[asyncio.Future, int]]] = {INTERACTIVE: deque(), BULK: deque()}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._scheduler: Optional[asyncio.Task] = None
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        if not name.startswith(_LIMITED_PREFIXES) or name in _UNLIMITED_METHODS:
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        lane = INTERACTIVE if chat_id is not None and chat_id == _current_chat.get() else BULK
+        cost = len(getattr(method, "media", None) or ()) or 1
+        chat_limited = not name.startswith(_CHAT_EXEMPT_PREFIXES)
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id if chat_limited else None, lane, cost)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                metrics.inc("telegram_send_retries_total", {"method": name})
+                logger.warning("Flood control for chat %s: retry after %ss", chat_id, e.retry_after)
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).pause(e.retry_after)
+                if not chat_limited:
+                    # Правку ведро чата не задерживает - ждем сами
+                    await asyncio.sleep(e.retry_after)
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            if len(self._chat_buckets) > MAX_CHAT_BUCKETS:
+                self._evict_idle_buckets()
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def _evict_idle_buckets(self) -> None:
+        # Полное ведро ничем не отличается от нового, его можно забыть
+        for chat_id in list(self._chat_buckets)[:len(self._chat_buckets) // 2]:
+            if self._chat_buckets[chat_id].idle:
+                del self._chat_buckets[chat_id]
+
+    async def _acquire(self, chat_id: Any, lane: str, cost: int) -> None:
+        start = time.perf_counter()
+        if chat_id is not None:
+            delay = self._chat_bucket(chat_id).reserve(cost)
+            if delay:
+                await asyncio.sleep(delay)
+
+        if self._scheduler is None or self._scheduler.done():
+            self._wakeup = asyncio.Event()
+            self._scheduler = asyncio.create_task(self._schedule())
+
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[lane].append((future, cost))
+        self._report_depth()
+        self._wakeup.set()
+        try:
+            await future
+        finally:
+            metrics.observe("telegram_send_wait_seconds", time.perf_counter() - start, {"lane": lane})
+
+    def _next_waiter(self) -> Optional[tuple[asyncio.Future, int]]:
+        for lane in (INTERACTIVE, BULK):
+            queue = self._lanes[lane]
+            while queue:
+                future, cost = queue.popleft()
+                if not future.done():
+                    return future, cost
+        return None
+
+    async def _schedule(self) -> None:
+        """Выдает разрешения на отправку по общему лимиту, interactive - первыми"""
+        while True:
+            # Сначала ждем токен, потом выбираем получателя: пока ждали,
+            # в interactive могли прийти запросы, которые должны пройти раньше
+            delay = self.global_bucket.delay()
+            if delay:
+                await asyncio.sleep(delay)
+            waiter = self._next_waiter()
+            self._report_depth()
+            if waiter is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            future, cost = waiter
+            self.global_bucket.reserve(cost)
+            future.set_result(None)
+
+    def _report_depth(self) -> None:
+        for lane, queue in self._lanes.items():
+            metrics.set("telegram_send_queue_depth", len(queue), {"lane": lane})
+
+
+class CurrentChatMiddleware(BaseMiddleware):
+    """Запоминает чат текущего апдейта, чтобы отличать ответы от рассылок"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        chat = data.get("event_chat")
+        token = _current_chat.set(chat.id if chat else None)
+        try:
+            return await handler(event, data)
+        finally:
+            _current_chat.reset(token)
+
+
+def setup_send_gateway(dp: Dispatcher, bot: Bot, **limits: Any) -> SendGateway:
+    """Подключает шлюз отправки к сессии бота (вызывать до setup_metrics)"""
+    gateway = SendGateway(**limits)
+    dp.update.outer_middleware(CurrentChatMiddleware())
+    bot.session.middleware(gateway)
+    return gateway
@@ -10,6 +10,7 @@ class TeacherStates(StatesGroup):
     waiting_for_assignment_file = State()
     viewing_student_work = State()
     waiting_for_new_teacher_username = State()
+    waiting_for_bulk_grades = State()
 
 class StudentStates(StatesGroup):
     waiting_for_assignment_number = State()
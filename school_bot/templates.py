@@ -0,0 +1,175 @@
+import html
+import re
+import string
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional
+
+from school_bot.config import RENDER_CACHE_SIZE
+from school_bot.metrics import metrics
+
+
+# Лимиты Telegram: длина текста сообщения и подписи к файлу.
+# Считаются в UTF-16 после разбора HTML-разметки (теги не входят, сущность - один символ)
+TEXT_LIMIT = 4096
+CAPTION_LIMIT = 1024
+ELLIPSIS = "…"
+
+# Теги и HTML-сущности в тексте с parse_mode="HTML"
+_MARKUP = re.compile(r"<(/?)([a-zA-Z][\w-]*)[^>]*>|&#?\w+;")
+
+
+class Safe(str):
+    """Строка с готовой HTML-разметкой - при подстановке в шаблон не экранируется"""
+    __slots__ = ()
+
+
+def escape(value: Any) -> Safe:
+    """Экранирует значение для parse_mode="HTML" (готовую разметку Safe оставляет как есть)"""
+    if isinstance(value, Safe):
+        return value
+    return Safe(html.escape(str(value), quote=False))
+
+
+def join(items: Iterable[Any], sep: str = "\n") -> Safe:
+    """Склеивает строки, экранируя все, что не Safe"""
+    return Safe(sep.join(escape(item) for item in items))
+
+
+def shorten(text: Optional[str], width: int, placeholder: str = "...") -> str:
+    """Обрезает сырой (еще не экранированный) текст до width символов"""
+    text = text or ""
+    return text if len(text) <= width else text[:width] + placeholder
+
+
+def _utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _cut(text: str, units: int) -> str:
+    """Начало строки длиной не больше units единиц UTF-16"""
+    used = 0
+    for i, char in enumerate(text):
+        used += 2 if ord(char) > 0xFFFF else 1
+        if used > units:
+            return text[:i]
+    return text
+
+
+def visible_length(text: str) -> int:
+    """Длина текста, как ее считает Telegram после разбора HTML-разметки"""
+    length, pos = 0, 0
+    for match in _MARKUP.finditer(text):
+        length += _utf16_len(text[pos:match.start()])
+        if not match.group(2):  # сущность вроде &lt; - один символ
+            length += 1
+        pos = match.end()
+    return length + _utf16_len(text[pos:])
+
+
+def truncate(text: str, limit: int = TEXT_LIMIT, parse_mode: Optional[str] = "HTML") -> str:
+    """Обрезает текст до лимита Telegram, не разрывая теги и сущности
+
+    Обрезанный текст заканчивается многоточием, открытые теги закрываются.
+    """
+    # В UTF-16 символ занимает не больше двух единиц - короткий текст не считаем
+    if len(text) * 2 <= limit:
+        return text
+    if parse_mode != "HTML":
+        if _utf16_len(text) <= limit:
+            return text
+        return _cut(text, limit - len(ELLIPSIS)) + ELLIPSIS
+    if _utf16_len(text) <= limit or visible_length(text) <= limit:
+        return text
+
+    budget = limit - len(ELLIPSIS)
+    parts, open_tags, pos = [], [], 0
+    for match in _MARKUP.finditer(text):
+        plain = text[pos:match.start()]
+        if _utf16_len(plain) > budget:
+            parts.append(_cut(plain, budget))
+            break
+        parts.append(plain)
+        budget -= _utf16_len(plain)
+
+        tag = match.group(2)
+        if tag is None:
+            if budget < 1:
+                break
+            budget -= 1
+        elif match.group(1):
+            if open_tags and open_tags[-1] == tag.lower():
+                open_tags.pop()
+        else:
+            open_tags.append(tag.lower())
+        parts.append(match.group(0))
+        pos = match.end()
+    else:
+        parts.append(_cut(text[pos:], budget))
+
+    return "".join(parts) + ELLIPSIS + "".join(f"</{tag}>" for tag in reversed(open_tags))
+
+
+class Template:
+    """Шаблон сообщения, разобранный один раз при импорте модуля
+
+    Синтаксис - как у str.format, но только простые имена полей: "{name}",
+    "{count:d}". Значения при подстановке экранируются для HTML, кроме Safe
+    (вложенные шаблоны, join()). render() возвращает Safe.
+
+    Пример:
+        WORK = Template("work", "<b>{title}</b>\\nОценка: {grade}")
+        text = WORK.render(title=work["assignment"], grade=work["grade"])
+    """
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source = source
+        # Разбор один раз: (текст перед полем, поле, формат); у хвоста поле None
+        parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if field is not None and (not field.isidentifier() or conversion):
+                raise ValueError(f"Шаблон {name}: поле {{{field}}} не поддерживается")
+            parts.append((literal, field, spec or ""))
+        self._parts: tuple[tuple[str, Optional[str], str], ...] = tuple(parts)
+        self.fields = tuple(field for _, field, _ in parts if field is not None)
+
+    def render(self, **values: Any) -> Safe:
+        parts = []
+        for literal, field, spec in self._parts:
+            parts.append(literal)
+            if field is not None:
+                value = values[field]
+                parts.append(escape(format(value, spec) if spec else value))
+        return Safe("".join(parts))
+
+    def render_cached(self, key: Hashable, version: Hashable, **values: Any) -> Safe:
+        """render() с кэшем по (шаблон, key, version)
+
+        key - id строки (например, работы), version - то, что меняется вместе
+        со строкой (оценка, время отправки). Пока версия та же, повторный
+        показ строки не форматирует ее заново.
+        """
+        cache_key = (self.name, key, version)
+        rendered = _render_cache.get(cache_key)
+        if rendered is not None:
+            _render_cache.move_to_end(cache_key)
+            metrics.inc("template_renders_total", {"template": self.name, "result": "hit"})
+            return rendered
+
+        metrics.inc("template_renders_total", {"template": self.name, "result": "miss"})
+        rendered = self.render(**values)
+        _render_cache[cache_key] = rendered
+        if len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+        return rendered
+
+    def __repr__(self) -> str:
+        return f"Template({self.name!r})"
+
+
+# (шаблон, ключ строки, версия) -> готовый текст, самые старые вытесняются первыми
+_render_cache: OrderedDict[tuple[str, Hashable, Hashable], Safe] = OrderedDict()
+
+
+def clear_render_cache() -> None:
+    _render_cache.clear()